@@ -0,0 +1,63 @@
+# Benchmark: memory per node and build time of expression trees made of (slotted) node
+# objects vs the struct-of-arrays Arena, and type checking / evaluation on both.
+# Run from the repository root with: python -m benchmarks.bench_arena
+import time
+import tracemalloc
+
+from files import *
+
+LEAVES = 20000
+
+
+def build_tree(leaves):
+    # A balanced tree of Pairs over leaves (λx: Int. if x > 5 then x * 2 else x + 1) i
+    level = []
+    for i in range(leaves):
+        body = If(BinOp(Var('x'), '>', IntValue(5)),
+                  BinOp(Var('x'), '*', IntValue(2)),
+                  BinOp(Var('x'), '+', IntValue(1)))
+        level.append(App(Abs('x', IntType(), body), IntValue(i % 100)))
+    while len(level) > 1:
+        level = [Pair(level[i], level[i + 1]) if i + 1 < len(level) else level[i]
+                 for i in range(0, len(level), 2)]
+    return level[0]
+
+
+def measured(fn, *args):
+    """Run fn twice: once for the time, once under tracemalloc for the memory."""
+    result, elapsed = timed(fn, *args)
+    del result
+    tracemalloc.start()
+    result = fn(*args)
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, elapsed, size
+
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - start
+
+
+if __name__ == "__main__":
+    tree, t_tree, m_tree = measured(build_tree, LEAVES)
+    (arena, root), t_arena, m_arena = measured(arena_from_expr, tree)
+    nodes = len(arena)
+    print(f"{nodes} nodes")
+    print(f"node objects: {m_tree / nodes:6.1f} bytes/node, built in {t_tree:.3f}s")
+    print(f"arena:        {m_arena / nodes:6.1f} bytes/node, converted in {t_arena:.3f}s "
+          f"(node arrays: {arena.nbytes() / nodes:.1f} bytes/node)")
+
+    _, t_back = timed(arena.to_expr, root)
+    print(f"arena back to node objects: {t_back:.3f}s")
+
+    typ, t_check = timed(type_check, tree, TypeContext())
+    arena_typ, t_check_arena = timed(type_check_arena, arena, root, TypeContext())
+    assert typ is arena_typ
+    print(f"type_check: {t_check:.3f}s, type_check_arena: {t_check_arena:.3f}s")
+
+    value, t_eval = timed(eval_expr, tree, Env())
+    arena_value, t_eval_arena = timed(eval_arena, arena, root, Env())
+    assert repr(value) == repr(arena_value)
+    print(f"eval_expr: {t_eval:.3f}s, eval_arena: {t_eval_arena:.3f}s")
@@ -0,0 +1,47 @@
+# Benchmark: scoring one function over many inputs, one eval_expr call per input vs
+# eval_batch over a NumPy column. Requires NumPy.
+# Run from the repository root with: python -m benchmarks.bench_batch
+import time
+
+from files import *
+
+N = 20000
+N_BATCH = 2000000
+
+# λx: Int. if x > 5 then (x * 3) / (x - 10) else x + 1
+func = Abs('x', IntType(),
+           If(BinOp(Var('x'), '>', IntValue(5)),
+              BinOp(BinOp(Var('x'), '*', IntValue(3)), '/', BinOp(Var('x'), '-', IntValue(10))),
+              BinOp(Var('x'), '+', IntValue(1))))
+
+
+def scalar(xs):
+    results = []
+    for x in xs:
+        try:
+            results.append(eval_expr(App(func, IntValue(x)), Env()).value)
+        except ZeroDivisionError:
+            results.append(None)
+    return results
+
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - start
+
+
+if __name__ == "__main__":
+    xs = [i % 50 for i in range(N)]
+    expected, t_scalar = timed(scalar, xs)
+    result, t_batch = timed(eval_batch, func, xs)
+    got = [None if error else value for value, error in zip(result.values.tolist(), result.errors.tolist())]
+    assert got == expected
+    print(f"eval_expr:  {N / t_scalar:,.0f} rows/s")
+    print(f"eval_batch: {N / t_batch:,.0f} rows/s on {N} rows")
+
+    import numpy as np
+    column = np.arange(N_BATCH) % 50
+    result, t_big = timed(eval_batch, func, column)
+    print(f"eval_batch: {N_BATCH / t_big:,.0f} rows/s on {N_BATCH} rows "
+          f"({int(result.errors.sum())} divisions by zero)")
@@ -0,0 +1,60 @@
+# Benchmark: programs compiled to Python by compile_python vs eval_expr, compile_expr,
+# and the same computation written by hand in Python: a tail-recursive countdown (a
+# loop), naive Fibonacci (non-tail recursion) and a large arithmetic expression.
+# Compilation is timed separately from running.
+# Run from the repository root with: python -m benchmarks.bench_codegen
+import time
+
+from files import *
+from benchmarks.bench_fix import countdown
+from benchmarks.workloads import arith_tree
+
+COUNT = 10 ** 6
+FIB = 20
+
+
+def fib(n):
+    # fix (λf: Int → Int. λn: Int. if n < 2 then n else f (n - 1) + f (n - 2)) n
+    return parse("(fix(λf: Int -> Int. λn: Int. if n < 2 then n else f (n - 1) + f (n - 2))) "
+                 + str(n))
+
+
+def handwritten_countdown(n):
+    while n != 0:
+        n = n - 1
+    return 0
+
+
+def handwritten_fib(n):
+    return n if n < 2 else handwritten_fib(n - 1) + handwritten_fib(n - 2)
+
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - start
+
+
+if __name__ == "__main__":
+    tree = arith_tree(14)
+    cases = [
+        (f"countdown {COUNT}", countdown(COUNT), lambda: handwritten_countdown(COUNT)),
+        (f"fib {FIB}", fib(FIB), lambda: handwritten_fib(FIB)),
+        ("arith_tree 14", tree, None),
+    ]
+    for name, expr, handwritten in cases:
+        type_check(expr, TypeContext())
+        expected, t_eval = timed(eval_expr, expr, Env())
+        compiled, t_compile = timed(compile_expr, expr)
+        result, t_compiled = timed(compiled, Env())
+        assert repr(result) == repr(expected)
+        program, t_generate = timed(compile_python, expr)
+        result, t_python = timed(program, Env())
+        assert repr(result) == repr(expected)
+        print(f"{name}:")
+        print(f"  eval_expr      {t_eval:.4f}s")
+        print(f"  compile_expr   {t_compiled:.4f}s  ({t_eval / t_compiled:.1f}x, compiling took {t_compile:.4f}s)")
+        print(f"  compile_python {t_python:.4f}s  ({t_eval / t_python:.1f}x, generating took {t_generate:.4f}s)")
+        if handwritten is not None:
+            _, t_hand = timed(handwritten)
+            print(f"  handwritten    {t_hand:.4f}s  (compile_python is {t_python / t_hand:.2f}x its time)")
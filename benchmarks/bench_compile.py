@@ -0,0 +1,45 @@
+# Benchmark: repeated application of one function, eval_expr vs compile_expr.
+# Run from the repository root with: python -m benchmarks.bench_compile
+import time
+
+from files import *
+from files.compiler import compile_expr
+
+N = 20000
+
+# λx: Int. if x > 5 then (x * 2) + 1 else x - 1
+body = If(BinOp(Var('x'), '>', IntValue(5)),
+          BinOp(BinOp(Var('x'), '*', IntValue(2)), '+', IntValue(1)),
+          BinOp(Var('x'), '-', IntValue(1)))
+func = Abs('x', IntType(), body)
+programs = [App(func, IntValue(i)) for i in range(N)]
+for program in programs[:10]:
+    type_check(program, TypeContext())
+
+
+def bench_eval():
+    return [eval_expr(program, Env()).value for program in programs]
+
+
+def bench_compiled():
+    # Compile the function once and apply it to every argument
+    closure = compile_expr(func)(Env())
+    results = []
+    for i in range(N):
+        results.append(closure.code(closure.new_frame(IntValue(i))).value)
+    return results
+
+
+def timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return result, time.perf_counter() - start
+
+
+if __name__ == "__main__":
+    expected, t_eval = timed(bench_eval)
+    got, t_compiled = timed(bench_compiled)
+    assert got == expected
+    print(f"eval_expr:    {t_eval:.4f}s  ({N / t_eval:,.0f} applications/s)")
+    print(f"compile_expr: {t_compiled:.4f}s  ({N / t_compiled:,.0f} applications/s)")
+    print(f"speedup:      {t_eval / t_compiled:.2f}x")
@@ -0,0 +1,37 @@
+# Benchmark: a tail-recursive countdown written with fix, run for 10^7 iterations on
+# each engine, in constant stack space. Reports iterations (recursive calls) per second.
+# Run from the repository root with: python -m benchmarks.bench_fix [iterations]
+import sys
+import time
+
+from files import *
+
+ITERATIONS = 10 ** 7
+
+
+def countdown(n):
+    # fix (λf: Int → Int. λn: Int. if n == 0 then 0 else f (n - 1)) n
+    int_type = IntType()
+    loop = Abs('f', FuncType(int_type, int_type), Abs('n', int_type,
+        If(BinOp(Var('n'), '==', IntValue(0)),
+           IntValue(0),
+           App(Var('f'), BinOp(Var('n'), '-', IntValue(1))))))
+    return App(Fix(loop), IntValue(n))
+
+
+def run_arena(expr, env):
+    arena, root = arena_from_expr(expr)
+    return eval_arena(arena, root, env)
+
+
+if __name__ == "__main__":
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else ITERATIONS
+    expr = countdown(iterations)
+    assert type_check(expr, TypeContext()) == IntType()
+    for name, engine in [("run_compiled", run_compiled), ("eval_machine", eval_machine),
+                         ("eval_arena", run_arena), ("eval_expr", eval_expr)]:
+        start = time.perf_counter()
+        result = engine(expr, Env())
+        elapsed = time.perf_counter() - start
+        assert result.value == 0
+        print(f"{name}: {iterations} iterations in {elapsed:.2f}s, {iterations / elapsed:,.0f} steps/s")
@@ -0,0 +1,57 @@
+# Benchmark: eval_lazy vs eval_expr on programs where call-by-need skips or shares work
+# (an unused argument, the unused half of a pair, a value used many times through a
+# let), and on a tail-recursive loop where it can only add overhead.
+# Run from the repository root with: python -m benchmarks.bench_lazy
+import time
+
+from files import *
+from benchmarks.bench_fix import countdown
+
+WORK = 100000  # Iterations of the expensive subterm
+
+
+def repeat(var, times):
+    # var + var + ... + var
+    expr = Var(var)
+    for _ in range(times - 1):
+        expr = BinOp(expr, '+', Var(var))
+    return expr
+
+
+def cases():
+    int_type = IntType()
+    expensive = countdown(WORK)
+    yield "unused argument: (λx: Int. 1) e", App(Abs('x', int_type, IntValue(1)), expensive)
+    yield "first projection: fst((1, e))", Fst(Pair(IntValue(1), expensive))
+    # A proof term passing evidence it never inspects: (λp: Int ∧ Int. λq: Int. q) (e, e) 1
+    proof = Abs('p', AndType(int_type, int_type), Abs('q', int_type, Var('q')))
+    yield "discarded pair argument", App(App(proof, Pair(expensive, expensive)), IntValue(1))
+    # An argument used in only one branch
+    choose = Abs('x', int_type, If(BoolValue(False), Var('x'), IntValue(0)))
+    yield "argument used in a dead branch", App(choose, expensive)
+    yield "let, used 5 times: let x = e in x + ... + x", Let('x', expensive, repeat('x', 5))
+    yield "loop (no work to skip): e", expensive
+
+
+def timed(engine, expr):
+    start = time.perf_counter()
+    result = engine(expr, Env())
+    return result, time.perf_counter() - start
+
+
+if __name__ == "__main__":
+    for name, expr in cases():
+        type_check(expr, TypeContext())
+        strict, t_strict = timed(eval_expr, expr)
+        lazy, t_lazy = timed(eval_lazy, expr)
+        assert repr(strict) == repr(lazy), (strict, lazy)
+        print(f"{name}: eval_expr {t_strict:.4f}s, eval_lazy {t_lazy:.4f}s ({t_strict / t_lazy:.1f}x)")
+
+    # Without let, sharing a value means writing it out at each use
+    unshared = countdown(WORK)
+    for _ in range(4):
+        unshared = BinOp(unshared, '+', countdown(WORK))
+    _, t_unshared = timed(eval_expr, unshared)
+    _, t_shared = timed(eval_expr, Let('x', countdown(WORK), repeat('x', 5)))
+    print(f"e + e + e + e + e vs let x = e in x + ... + x (eval_expr): "
+          f"{t_unshared:.4f}s vs {t_shared:.4f}s ({t_unshared / t_shared:.1f}x)")
@@ -0,0 +1,67 @@
+# Benchmark: eval_machine vs eval_expr on shallow terms, and eval_machine on terms far
+# deeper than Python's recursion limit.
+# Run from the repository root with: python -m benchmarks.bench_machine
+import sys
+import time
+
+from files import *
+from files.machine import eval_machine
+
+DEPTH = 200000
+
+
+def deep_binop(depth):
+    # ((((0 + 1) + 1) + 1) ... )
+    expr = IntValue(0)
+    for _ in range(depth):
+        expr = BinOp(expr, '+', IntValue(1))
+    return expr
+
+
+def deep_app(depth):
+    # (λx: Int. x + 1) ((λx: Int. x + 1) ( ... 0))
+    inc = Abs('x', IntType(), BinOp(Var('x'), '+', IntValue(1)))
+    expr = IntValue(0)
+    for _ in range(depth):
+        expr = App(inc, expr)
+    return expr
+
+
+def deep_pair(depth):
+    # fst(fst(...fst((...((0, true), true)..., true))))
+    expr = IntValue(0)
+    for _ in range(depth):
+        expr = Pair(expr, BoolValue(True))
+    for _ in range(depth):
+        expr = Fst(expr)
+    return expr
+
+
+def deep_binders(depth):
+    # (λx0: Int. (λx1: Int. ... (let y = x0 in y) ... 1) 0), looking x0 up through every binder
+    expr = Let('y', Var('x0'), Var('y'))
+    for i in reversed(range(depth)):
+        expr = App(Abs(f'x{i}', IntType(), expr), IntValue(i))
+    return expr
+
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - start
+
+
+if __name__ == "__main__":
+    # Shallow enough for eval_expr: compare per-node overhead
+    shallow = deep_binop(sys.getrecursionlimit() // 4)
+    expected, t_eval = timed(lambda: [eval_expr(shallow, Env()) for _ in range(50)])
+    got, t_machine = timed(lambda: [eval_machine(shallow, Env()) for _ in range(50)])
+    assert [v.value for v in got] == [v.value for v in expected]
+    print(f"shallow BinOp chain: eval_expr {t_eval:.4f}s, eval_machine {t_machine:.4f}s "
+          f"({t_eval / t_machine:.2f}x)")
+
+    for name, build in [("BinOp", deep_binop), ("App", deep_app), ("Pair/Fst", deep_pair),
+                        ("App(Abs) binder", deep_binders)]:
+        expr = build(DEPTH)
+        result, elapsed = timed(eval_machine, expr, Env())
+        print(f"{name} chain of depth {DEPTH}: {result} in {elapsed:.4f}s")
@@ -0,0 +1,63 @@
+# Benchmark: eval_expr against an ApplicationCache on programs that call the same
+# helpers with the same few arguments over and over: a loop that calls an expensive
+# helper on i mod 16, naive recursive Fibonacci, and a loop over pairs of small ints.
+# Reports times, hit rates and evictions, with a cache large enough for every result
+# and with one too small for the working set, and with memoization restricted to the
+# helper.
+# Run from the repository root with: python -m benchmarks.bench_memo
+import sys
+import time
+
+from files import *
+
+# weight n: a loop of about 30 + 20n steps, called on n = i mod 16 for i up to 3000
+HELPER = parse("λn: Int. fix(λg: Int → Int → Int. λk: Int. λacc: Int. "
+               "if k == 0 then acc else g (k - 1) (acc + k * n)) (n * 4) 0")
+LOOP = parse("fix(λf: Int → Int → Int. λi: Int. λacc: Int. "
+             "if i == 0 then acc else f (i - 1) (acc + weight (i - (i / 16) * 16))) 3000 0")
+HELPER_LOOP = Let('weight', HELPER, LOOP)
+
+FIB = parse("fix(λf: Int → Int. λn: Int. if n < 2 then n else f (n - 1) + f (n - 2)) 22")
+
+# dist over pairs (a, b) with a, b < 8, for i up to 3000
+PAIRS = parse("let dist = λp: Int ∧ Int. fix(λg: Int → Int → Int. λk: Int. λacc: Int. "
+              "if k == 0 then acc else g (k - 1) (acc + fst(p) * snd(p))) (fst(p) + snd(p)) 0 in "
+              "fix(λf: Int → Int → Int. λi: Int. λacc: Int. "
+              "if i == 0 then acc else f (i - 1) (acc + dist ((i / 8) - (i / 64) * 8, i - (i / 8) * 8))) 3000 0")
+
+
+def best(run, repeat=3):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = run()
+        times.append(time.perf_counter() - start)
+    return min(times), result
+
+
+def memoized(expr, **options):
+    """Seconds and cache of a run with a new ApplicationCache(**options)."""
+    def run():
+        cache = ApplicationCache(**options)
+        return cache, cache.eval_expr(expr, Env())
+    seconds, (cache, value) = best(run)
+    return seconds, cache, value
+
+
+if __name__ == "__main__":
+    sys.setrecursionlimit(20000)
+    cases = [
+        ("helper on i mod 16, 3000 calls", HELPER_LOOP, HELPER),
+        ("fib 22", FIB, FIB.func.func.body),
+        ("helper on pairs of ints < 8, 3000 calls", PAIRS, PAIRS.value),
+    ]
+    for name, expr, helper in cases:
+        type_check(expr, TypeContext())
+        plain, expected = best(lambda: eval_expr(expr, Env()))
+        print(f"{name}: eval_expr {plain:.4f}s")
+        for label, options in [("every application", {}),
+                               ("every application, max_size=8", {'max_size': 8}),
+                               ("only the helper", {'functions': [helper]})]:
+            seconds, cache, value = memoized(expr, **options)
+            assert value.value == expected.value
+            print(f"  {label}: {seconds:.4f}s ({plain / seconds:.1f}x); {cache.summary()}")
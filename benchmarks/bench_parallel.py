@@ -0,0 +1,57 @@
+# Benchmark: speedup of ParallelEvaluator over sequential evaluation on wide Pair and
+# BinOp trees whose leaves are loops of a few hundred thousand steps, for 1 to N worker
+# processes, and the cost of planning (the probes). Workers are started before timing.
+# On a machine with fewer cores than workers, the extra workers only add overhead.
+# Run from the repository root with: python -m benchmarks.bench_parallel
+import os
+import time
+
+from files import *
+
+LEAVES = 16
+
+
+def loop(n):
+    """Sum of i * i mod 7 for i from n down to 1: a tail-recursive loop of about 10n steps."""
+    return parse(f"fix(λf: Int → Int → Int. λn: Int. λacc: Int. "
+                 f"if n == 0 then acc else f (n - 1) (acc + (n * n - (n * n / 7) * 7))) {n} 0")
+
+
+def tree(combine, leaves, low=0):
+    """A balanced tree over leaves loops of different lengths, joined by combine."""
+    if leaves == 1:
+        return loop(20_000 + 100 * low)
+    half = leaves // 2
+    return combine(tree(combine, half, low), tree(combine, leaves - half, low + half))
+
+
+def best(run, repeat=3):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = run()
+        times.append(time.perf_counter() - start)
+    return min(times), result
+
+
+if __name__ == "__main__":
+    cases = [
+        (f"Pair tree of {LEAVES} loops", tree(Pair, LEAVES)),
+        (f"BinOp tree of {LEAVES} loops", tree(lambda left, right: BinOp(left, '+', right), LEAVES)),
+    ]
+    workers = sorted({1, 2, 4, os.cpu_count() or 1})
+    print(f"{os.cpu_count()} CPUs")
+    for name, expr in cases:
+        type_check(expr, TypeContext())
+        sequential, expected = best(lambda: eval_unboxed(expr))
+        eval_time, _ = best(lambda: eval_expr(expr, Env()), repeat=1)
+        print(f"{name}: eval_expr {eval_time:.3f}s, eval_unboxed {sequential:.3f}s")
+        for n in workers:
+            with ParallelEvaluator(workers=n) as evaluator:
+                plan_time, plan = best(lambda: evaluator.plan(expr))
+                evaluator.evaluate(expr, plan=plan)  # Start the workers
+                seconds, value = best(lambda: evaluator.evaluate(expr, plan=plan))
+            assert unbox(value) == expected
+            print(f"  {n} workers: {len(plan.farmed)} subterms farmed, plan {plan_time:.3f}s "
+                  f"({plan.probes} probes, {plan.probe_steps:,} steps), evaluate {seconds:.3f}s, "
+                  f"speedup {sequential / seconds:.2f}x ({sequential / (seconds + plan_time):.2f}x with planning)")
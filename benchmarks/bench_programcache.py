@@ -0,0 +1,59 @@
+# Benchmark: a stream of submissions that repeats a few distinct programs, each parsed
+# anew, type-checked and compiled every time vs served from a ProgramCache (in memory,
+# then from its directory in a fresh cache, as a restarted process would).
+# Run from the repository root with: python -m benchmarks.bench_programcache
+import random
+import tempfile
+import time
+
+from files import *
+from benchmarks.workloads import WORKLOADS
+
+SUBMISSIONS = 100
+DISTINCT = 10
+
+
+def programs():
+    # Distinct texts: large to check and compile, cheap to run
+    generate, args, _ = WORKLOADS['pair_tree']
+    return [format_expr(generate(args[0] // 4 + i)) for i in range(DISTINCT)]
+
+
+def uncached(text):
+    expr = parse(text)
+    type_check(expr, TypeContext())
+    return compile_expr(expr)(Env())
+
+
+def timed(fn, stream):
+    start = time.perf_counter()
+    results = [fn(text) for text in stream]
+    return results, time.perf_counter() - start
+
+
+if __name__ == "__main__":
+    texts = programs()
+    rng = random.Random(0)
+    stream = [rng.choice(texts) for _ in range(SUBMISSIONS)]
+
+    expected, t_uncached = timed(uncached, stream)
+    print(f"{SUBMISSIONS} submissions of {DISTINCT} programs, check + compile each: {t_uncached:.4f}s")
+
+    cache = ProgramCache()
+    results, t_cached = timed(lambda text: cache.run(parse(text)), stream)
+    assert [repr(r) for r in results] == [repr(r) for r in expected]
+    print(f"ProgramCache in memory: {t_cached:.4f}s ({t_uncached / t_cached:.1f}x), {cache.stats()}")
+
+    # Parsing is paid either way
+    _, t_parse = timed(parse, stream)
+    print(f"  parsing alone: {t_parse:.4f}s; excluding it, {t_uncached - t_parse:.4f}s vs "
+          f"{t_cached - t_parse:.4f}s ({(t_uncached - t_parse) / (t_cached - t_parse):.1f}x)")
+
+    with tempfile.TemporaryDirectory() as directory:
+        for text in texts:
+            ProgramCache(directory=directory).get(parse(text))
+        restarted = ProgramCache(directory=directory)
+        results, t_disk = timed(lambda text: restarted.run(parse(text)), stream)
+        assert [repr(r) for r in results] == [repr(r) for r in expected]
+        print(f"fresh ProgramCache on a filled directory: {t_disk:.4f}s "
+              f"({t_uncached / t_disk:.1f}x), {restarted.stats()}")
@@ -0,0 +1,137 @@
+# Benchmark: prove a corpus of intuitionistic tautologies with prove, checking every
+# term with type_check, first with empty tables and then again with the tables the
+# first pass filled. Reports each formula's size in connectives and the proof's size.
+# Run from the repository root with: python -m benchmarks.bench_proofsearch
+import time
+
+from files import *
+from files.arena import _children
+
+INT, BOOL, TRUE, FALSE = IntType(), BoolType(), TrueType(), FalseType()
+
+
+def variable(i):
+    # The language has three atoms, Int, Bool and True, so the i-th propositional
+    # variable is X1 → ... → Xk → True with the Xs spelling i + 1 in binary as Int and
+    # Bool. A substitution instance of a tautology is still one.
+    typ = TRUE
+    i += 1
+    while i > 1:
+        typ = FuncType(INT if i & 1 else BOOL, typ)
+        i >>= 1
+    return typ
+
+
+def conjunction(types):
+    result = types[-1]
+    for typ in reversed(types[:-1]):
+        result = AndType(typ, result)
+    return result
+
+
+def disjunction(types):
+    result = types[-1]
+    for typ in reversed(types[:-1]):
+        result = OrType(typ, result)
+    return result
+
+
+def negation(typ):
+    return FuncType(typ, FALSE)
+
+
+def iff(left, right):
+    return AndType(FuncType(left, right), FuncType(right, left))
+
+
+def chain(n):
+    """p0 ∧ (p0 → p1) ∧ ... ∧ (pn-1 → pn) → pn"""
+    p = [variable(i) for i in range(n + 1)]
+    return FuncType(conjunction([p[0]] + [FuncType(p[i], p[i + 1]) for i in range(n)]), p[n])
+
+
+def curry(n):
+    """(p1 ∧ ... ∧ pn → q) ↔ (p1 → ... → pn → q)"""
+    p = [variable(i) for i in range(n + 1)]
+    curried = p[n]
+    for typ in reversed(p[:n]):
+        curried = FuncType(typ, curried)
+    return iff(FuncType(conjunction(p[:n]), p[n]), curried)
+
+
+def distribution(n):
+    """p0 ∧ (p1 ∨ ... ∨ pn) → (p0 ∧ p1) ∨ ... ∨ (p0 ∧ pn)"""
+    p = [variable(i) for i in range(n + 1)]
+    return FuncType(AndType(p[0], disjunction(p[1:])), disjunction([AndType(p[0], q) for q in p[1:]]))
+
+
+def commutation(n):
+    """p1 ∨ ... ∨ pn → pn ∨ ... ∨ p1"""
+    p = [variable(i) for i in range(n)]
+    return FuncType(disjunction(p), disjunction(p[::-1]))
+
+
+def de_bruijn(n):
+    """((p1 ↔ p2) → c) ∧ ... ∧ ((pn ↔ p1) → c) → c, where c = p1 ∧ ... ∧ pn, for odd n"""
+    p = [variable(i) for i in range(n)]
+    c = conjunction(p)
+    return FuncType(conjunction([FuncType(iff(p[i], p[(i + 1) % n]), c) for i in range(n)]), c)
+
+
+def excluded_middles(n):
+    """¬¬((p1 ∨ ¬p1) ∧ ... ∧ (pn ∨ ¬pn))"""
+    p = [variable(i) for i in range(n)]
+    return negation(negation(conjunction([OrType(q, negation(q)) for q in p])))
+
+
+def peirce(n):
+    """¬¬(((p1 → p2) → p1) → p1) ∧ ... for n different pairs of variables"""
+    p = [variable(i) for i in range(n + 1)]
+    return conjunction([negation(negation(FuncType(FuncType(FuncType(p[i], p[i + 1]), p[i]), p[i])))
+                        for i in range(n)])
+
+
+def connectives(typ):
+    if isinstance(typ, FuncType):
+        return 1 + connectives(typ.param_type) + connectives(typ.return_type)
+    elif isinstance(typ, (AndType, OrType)):
+        return 1 + connectives(typ.left) + connectives(typ.right)
+    return 0
+
+
+def term_size(expr):
+    size, stack = 0, [expr]
+    while stack:
+        node = stack.pop()
+        size += 1
+        stack.extend(_children(node))
+    return size
+
+
+CORPUS = [
+    ("chain, n = 150", chain(150)),
+    ("curry, n = 80", curry(80)),
+    ("distribution, n = 60", distribution(60)),
+    ("commutation, n = 80", commutation(80)),
+    ("de Bruijn, n = 15", de_bruijn(15)),
+    # G4ip needs exponentially many sequents for this one
+    ("excluded middles, n = 8", excluded_middles(8)),
+    ("peirce, n = 50", peirce(50)),
+]
+
+
+if __name__ == "__main__":
+    search = ProofSearch()
+    for run in ("empty tables", "filled tables"):
+        print(f"{run}:")
+        total = 0.0
+        for name, proposition in CORPUS:
+            start = time.perf_counter()
+            proof = prove(proposition, search=search)
+            elapsed = time.perf_counter() - start
+            total += elapsed
+            assert proof is not None, name
+            assert type_check(proof, TypeContext()) is proposition, name
+            print(f"  {name}: {connectives(proposition)} connectives, proof of "
+                  f"{term_size(proof)} nodes in {elapsed:.4f}s")
+        print(f"  total {total:.4f}s, {search.stats()}")
@@ -0,0 +1,54 @@
+# Benchmark: variable access under deep nesting, Env parent-chain lookup (eval_expr)
+# vs lexically addressed flat frames (compile_expr).
+# Run from the repository root with: python -m benchmarks.bench_resolver
+import time
+
+from files import *
+
+DEPTH = 60
+REPEAT = 500
+
+
+def nested_program(depth):
+    # (λx0. λx1. ... λx{d-1}. x0 + x0 + ... + x0) 0 1 ... d-1
+    body = Var('x0')
+    for _ in range(depth):
+        body = BinOp(body, '+', Var('x0'))
+    for i in reversed(range(depth)):
+        body = Abs(f'x{i}', IntType(), body)
+    for i in range(depth):
+        body = App(body, IntValue(i))
+    return body
+
+
+def env_chain_length(env):
+    length = 0
+    while env is not None:
+        length += 1
+        env = env.parent
+    return length
+
+
+def timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return result, time.perf_counter() - start
+
+
+if __name__ == "__main__":
+    program = nested_program(DEPTH)
+    type_check(program, TypeContext())
+    run = compile_expr(program)
+
+    expected, t_eval = timed(lambda: [eval_expr(program, Env()) for _ in range(REPEAT)])
+    got, t_compiled = timed(lambda: [run(Env()) for _ in range(REPEAT)])
+    assert [v.value for v in got] == [v.value for v in expected]
+    print(f"depth {DEPTH}: eval_expr {t_eval:.4f}s, compile_expr {t_compiled:.4f}s "
+          f"({t_eval / t_compiled:.2f}x)")
+
+    # What the innermost closure keeps alive
+    partial = program.func
+    reference = eval_expr(partial, Env())
+    flat = compile_expr(partial)(Env())
+    print(f"closure after {DEPTH - 1} applications: eval_expr keeps {env_chain_length(reference.env)} Envs, "
+          f"compile_expr keeps {len(flat.captured)} captured values")
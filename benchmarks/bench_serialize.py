@@ -0,0 +1,64 @@
+# Benchmark: storing and loading a large program as Python constructor code, as text
+# (parse/format_expr) and in the binary format (save_program/load_program).
+# Run from the repository root with: python -m benchmarks.bench_serialize
+import os
+import tempfile
+import time
+
+from files import *
+from benchmarks.bench_arena import build_tree
+
+LEAVES = 70000  # About a million nodes
+
+
+def constructor_source(expr):
+    # The Python code one would otherwise generate, e.g. App(Abs('x', IntType(), ...), IntValue(5))
+    if isinstance(expr, Var):
+        return f"Var({expr.name!r})"
+    elif isinstance(expr, IntValue):
+        return f"IntValue({expr.value})"
+    elif isinstance(expr, BoolValue):
+        return f"BoolValue({expr.value})"
+    elif isinstance(expr, Abs):
+        return f"Abs({expr.param_name!r}, IntType(), {constructor_source(expr.body)})"
+    elif isinstance(expr, App):
+        return f"App({constructor_source(expr.func)}, {constructor_source(expr.arg)})"
+    elif isinstance(expr, BinOp):
+        return f"BinOp({constructor_source(expr.left)}, {expr.op!r}, {constructor_source(expr.right)})"
+    elif isinstance(expr, If):
+        return (f"If({constructor_source(expr.condition)}, {constructor_source(expr.then_branch)}, "
+                f"{constructor_source(expr.else_branch)})")
+    elif isinstance(expr, Pair):
+        return f"Pair({constructor_source(expr.left)}, {constructor_source(expr.right)})"
+    raise TypeError(expr)
+
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - start
+
+
+if __name__ == "__main__":
+    program = build_tree(LEAVES)
+    directory = tempfile.mkdtemp()
+
+    source = "from files import *\nprogram = " + constructor_source(program) + "\n"
+    _, t_exec = timed(lambda: exec(compile(source, "generated.py", "exec"), {}))
+    print(f"Python constructor code: {len(source) / 1e6:.1f} MB, compile+exec {t_exec:.3f}s")
+
+    text, t_format = timed(format_expr, program)
+    parsed, t_parse = timed(parse, text)
+    print(f"text: {len(text) / 1e6:.1f} MB, format_expr {t_format:.3f}s, parse {t_parse:.3f}s")
+
+    path = os.path.join(directory, "program.stlc")
+    _, t_save = timed(save_program, program, path)
+    (arena, root), t_load = timed(load_program, path)
+    print(f"binary: {os.path.getsize(path) / 1e6:.1f} MB for {len(arena)} nodes, "
+          f"save {t_save:.3f}s, load {t_load * 1000:.2f}ms")
+
+    typ, t_check = timed(type_check_arena, arena, root, TypeContext())
+    print(f"type_check_arena on the mapped file: {t_check:.3f}s")
+    _, t_decode = timed(arena.to_expr, root)
+    print(f"full decode to node objects: {t_decode:.3f}s")
+    assert format_expr(parsed) == text
@@ -0,0 +1,63 @@
+# Benchmark: the evaluation service under a mix of many short programs and a few that
+# loop until they run out of fuel. Reports the latency percentiles of the short
+# programs when each program runs to its end before the next starts (one slice as large
+# as the fuel) and when programs take turns in slices, and the overhead of fuel
+# counting over eval_machine.
+# Run from the repository root with: python -m benchmarks.bench_service
+import asyncio
+import time
+
+from files import *
+from files.service import EvaluationService
+from files.cli import _percentile
+
+SHORT = "(λn: Int. n * n + 1) 12"
+LOOP = "fix(λf: Int → Int. λn: Int. f (n + 1)) 0"
+FUEL = 300_000
+N_SHORT = 500
+N_LOOP = 8
+
+
+async def mixed(slice_steps):
+    """Submit the loops and then the short programs; returns the short ones' latencies and the stats."""
+    async with EvaluationService(workers=4, slice_steps=slice_steps, fuel=FUEL) as service:
+        loops = [asyncio.create_task(service.submit(LOOP)) for _ in range(N_LOOP)]
+        await asyncio.sleep(0)
+        shorts = [asyncio.create_task(service.submit(SHORT)) for _ in range(N_SHORT)]
+        depth = 0
+        while not all(task.done() for task in shorts):
+            depth = max(depth, service.stats()['queue_depth'])
+            await asyncio.sleep(0.001)
+        responses = await asyncio.gather(*shorts, *loops)
+        assert [r['status'] for r in responses] == ['ok'] * N_SHORT + ['out_of_fuel'] * N_LOOP
+        return sorted(r['seconds'] for r in responses[:N_SHORT]), depth, service.stats()
+
+
+def best(run, repeat=3):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = run()
+        times.append(time.perf_counter() - start)
+    return min(times), result
+
+
+def overhead():
+    expr = parse(LOOP.replace("f (n + 1)", "if n == 100000 then n else f (n + 1)"))
+    machine, expected = best(lambda: eval_machine(expr, Env()))
+    fuel, value = best(lambda: eval_fuel(expr, Env(), 10_000_000))
+    assert value.value == expected.value
+    return machine, fuel
+
+
+if __name__ == "__main__":
+    print(f"{N_SHORT} short programs submitted behind {N_LOOP} loops of {FUEL} steps each:")
+    for name, slice_steps in [("run to the end", FUEL), ("slices of 10000 steps", 10_000),
+                              ("slices of 1000 steps", 1_000)]:
+        latencies, depth, stats = asyncio.run(mixed(slice_steps))
+        print(f"  {name}: short programs p50 {_percentile(latencies, 0.5) * 1000:.1f}ms, "
+              f"p99 {_percentile(latencies, 0.99) * 1000:.1f}ms; largest queue depth {depth}; "
+              f"all programs p99 {stats['latency']['p99'] * 1000:.1f}ms")
+    machine, fuel = overhead()
+    print(f"counting to 100000 with fix: eval_machine {machine:.3f}s, eval_fuel {fuel:.3f}s "
+          f"({fuel / machine:.2f}x)")
@@ -0,0 +1,81 @@
+# Benchmark: programs that repeat identical closed subterms, as generated code does,
+# run as built (a tree), hash-consed into a DAG (share) and rewritten by cse. Reports
+# the number of nodes and the bytes they take, and the time of type checking (plain on
+# the tree, with a TypeCache on the DAG) and of evaluation (eval_expr on the tree,
+# eval_shared on the DAG, eval_expr on the cse output).
+# Run from the repository root with: python -m benchmarks.bench_sharing
+import sys
+import time
+
+from files import *
+from files.sharing import _postorder
+from benchmarks.workloads import arith_tree, pair_tree
+
+INT = IntType()
+
+
+def summed(copies, build):
+    """build() + build() + ...: copies separately built, structurally equal subterms."""
+    expr = build()
+    for _ in range(copies - 1):
+        expr = BinOp(expr, '+', build())
+    return expr
+
+
+def repeated_arithmetic(copies):
+    return summed(copies, lambda: arith_tree(10))
+
+
+def repeated_pairs(copies):
+    return summed(copies, lambda: pair_tree(64))
+
+
+def repeated_function(depth):
+    """f (f (... 0)) with f = λx: Int. x + t built anew at each level, t a closed arith_tree."""
+    expr = IntValue(0)
+    for _ in range(depth):
+        expr = App(Abs('x', INT, BinOp(Var('x'), '+', arith_tree(8))), expr)
+    return expr
+
+
+def nodes(expr):
+    return _postorder(expr)[0]
+
+
+def node_bytes(expr):
+    return sum(sys.getsizeof(node) for node in nodes(expr))
+
+
+def best(run, repeat=3):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = run()
+        times.append(time.perf_counter() - start)
+    return min(times), result
+
+
+if __name__ == "__main__":
+    cases = [
+        ("arith_tree(10) summed 100 times", repeated_arithmetic(100)),
+        ("pair_tree(64) summed 100 times", repeated_pairs(100)),
+        ("λx. x + arith_tree(8) applied 200 deep", repeated_function(200)),
+    ]
+    for name, tree in cases:
+        share_time, dag = best(lambda: share(tree))
+        cse_time, rewritten = best(lambda: cse(tree))
+        print(f"{name}:")
+        print(f"  nodes: tree {len(nodes(tree))} ({node_bytes(tree):,} bytes), "
+              f"shared {len(nodes(dag))} ({node_bytes(dag):,} bytes), cse {len(nodes(rewritten))}; "
+              f"share {share_time:.4f}s, cse {cse_time:.4f}s")
+        check_tree, typ = best(lambda: type_check(tree, TypeContext()))
+        check_dag, dag_typ = best(lambda: type_check(dag, TypeContext(), TypeCache()))
+        assert typ is dag_typ
+        print(f"  type_check: tree {check_tree:.4f}s, shared with TypeCache {check_dag:.4f}s")
+        eval_tree, value = best(lambda: eval_expr(tree, Env()))
+        eval_dag, dag_value = best(lambda: eval_shared(dag))
+        eval_cse, cse_value = best(lambda: eval_expr(rewritten, Env()))
+        assert value.value == dag_value.value == cse_value.value
+        print(f"  evaluation: eval_expr {eval_tree:.4f}s, eval_shared {eval_dag:.4f}s "
+              f"({eval_tree / eval_dag:.1f}x), eval_expr after cse {eval_cse:.4f}s "
+              f"({eval_tree / eval_cse:.1f}x)")
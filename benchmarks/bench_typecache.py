@@ -0,0 +1,60 @@
+# Benchmark: re-type-checking a large program after a small edit, from scratch vs with
+# a TypeCache shared across checks.
+# Run from the repository root with: python -m benchmarks.bench_typecache
+import time
+
+from files import *
+
+DEPTH = 12  # The program is a complete binary tree of Pairs with 2**DEPTH leaves
+
+
+def leaf(i):
+    # (λx: Int. if x > 5 then x * 2 else x + 1) i
+    body = If(BinOp(Var('x'), '>', IntValue(5)),
+              BinOp(Var('x'), '*', IntValue(2)),
+              BinOp(Var('x'), '+', IntValue(1)))
+    return App(Abs('x', IntType(), body), IntValue(i))
+
+
+def tree(depth, start=0):
+    if depth == 0:
+        return leaf(start)
+    return Pair(tree(depth - 1, start), tree(depth - 1, start + 2 ** (depth - 1)))
+
+
+def edit(expr, path, new_leaf):
+    """Replace the leaf at path (a string of 'l'/'r'), rebuilding only the spine."""
+    if not path:
+        return new_leaf
+    if path[0] == 'l':
+        return Pair(edit(expr.left, path[1:], new_leaf), expr.right)
+    return Pair(expr.left, edit(expr.right, path[1:], new_leaf))
+
+
+def timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return result, time.perf_counter() - start
+
+
+if __name__ == "__main__":
+    program = tree(DEPTH)
+    cache = TypeCache()
+    expected, t_first = timed(lambda: type_check(program, TypeContext(), cache))
+    print(f"first check with cache: {t_first:.4f}s ({cache.misses} subterms checked)")
+
+    edits = 100
+    t_scratch = t_cached = 0.0
+    for i in range(edits):
+        path = format(i * 37 % 2 ** DEPTH, f'0{DEPTH}b').replace('0', 'l').replace('1', 'r')
+        program = edit(program, path, leaf(i))
+        full, elapsed = timed(lambda: type_check(program, TypeContext()))
+        t_scratch += elapsed
+        misses = cache.misses
+        incremental, elapsed = timed(lambda: type_check(program, TypeContext(), cache))
+        t_cached += elapsed
+        assert incremental is full
+    print(f"{edits} re-checks after one-leaf edits: from scratch {t_scratch:.4f}s, "
+          f"with cache {t_cached:.4f}s ({t_scratch / t_cached:.1f}x)")
+    print(f"subterms re-checked by the last edit: {cache.misses - misses} "
+          f"(hits {cache.hits}, misses {cache.misses})")
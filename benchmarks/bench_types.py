@@ -0,0 +1,50 @@
+# Benchmark: type checking proof terms with large propositional types.
+# Run from the repository root with: python -m benchmarks.bench_types
+import time
+
+from files import *
+
+SIZE = 250
+REPEAT = 200
+
+
+def big_type(size):
+    # ((...((A ∧ B) ∨ C) -> D) ∧ B) ∨ C) -> D ...
+    atoms = [IntType(), BoolType()]
+    typ = IntType()
+    for i in range(size):
+        kind = i % 3
+        if kind == 0:
+            typ = AndType(typ, atoms[i % 2])
+        elif kind == 1:
+            typ = OrType(typ, atoms[i % 2])
+        else:
+            typ = FuncType(typ, atoms[i % 2])
+    return typ
+
+
+def proof_term(size, repeat):
+    # λf: T -> T. λp: T. f (f (... (f p)))   with T built twice, independently
+    typ = big_type(size)
+    body = Var('p')
+    for _ in range(repeat):
+        body = App(Var('f'), body)
+    return Abs('f', FuncType(big_type(size), big_type(size)), Abs('p', typ, body))
+
+
+def timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return result, time.perf_counter() - start
+
+
+if __name__ == "__main__":
+    (left, right), t_build = timed(lambda: (big_type(SIZE), big_type(SIZE)))
+    print(f"building two types of {SIZE} connectives: {t_build:.4f}s")
+    same, t_eq = timed(lambda: [left == right for _ in range(REPEAT)])
+    assert all(same)
+    print(f"{REPEAT} equality checks: {t_eq:.6f}s, same object: {left is right}")
+
+    term = proof_term(SIZE, REPEAT)
+    typ, t_check = timed(lambda: type_check(term, TypeContext()))
+    print(f"type_check of a proof term with {REPEAT} applications at that type: {t_check:.4f}s")
@@ -0,0 +1,105 @@
+# Benchmark: eval_expr, with its values boxed in Value objects and its environments in
+# Env objects, against eval_unboxed on arithmetic-heavy programs. Reports the time, the
+# objects of the value and environment classes allocated (counted by their __init__
+# calls: the ints themselves, and the tuples of unboxed pairs, are not counted), the
+# peak memory traced during evaluation, and the memory held by a result made of pairs.
+# Run from the repository root with: python -m benchmarks.bench_unboxed
+import sys
+import time
+import tracemalloc
+
+from files import *
+from files.unboxed import Binding
+from benchmarks.workloads import arith_tree, app_chain, pair_tree
+
+# Loops summing squares with an accumulator: tail calls, so constant stack in both
+SUM_SQUARES = parse("fix(λf: Int → Int → Int. λn: Int. λacc: Int. "
+                    "if n == 0 then acc else f (n - 1) (acc + n * n)) 20000 0")
+COUNT_EVEN = parse("fix(λf: Int → Int → Int. λn: Int. λevens: Int. "
+                   "if n < 1 then evens else f (n - 1) (if (n / 2) * 2 == n && n > 0 then evens + 1 else evens)) 20000 0")
+
+CLASSES = (IntValue, BoolValue, Closure, Pair, InlValue, InrValue, Env,
+           UnboxedClosure, UnboxedInl, UnboxedInr, Binding)
+
+
+def pairs(leaves, low=0):
+    """A balanced tree of pairs whose leaves are (1000 + i) * 3 for i in low .. low+leaves-1."""
+    if leaves == 1:
+        return BinOp(IntValue(1000 + low), '*', IntValue(3))
+    half = leaves // 2
+    return Pair(pairs(half, low), pairs(leaves - half, low + half))
+
+
+def allocations(run):
+    """Objects of CLASSES constructed by run(), by class name."""
+    codes = {cls.__init__.__code__: cls.__name__ for cls in CLASSES}
+    counts = {}
+
+    def profile(frame, event, arg):
+        if event == 'call':
+            name = codes.get(frame.f_code)
+            if name is not None:
+                counts[name] = counts.get(name, 0) + 1
+
+    sys.setprofile(profile)
+    try:
+        run()
+    finally:
+        sys.setprofile(None)
+    return counts
+
+
+def peak_memory(run):
+    """Peak bytes traced while run() runs, and the bytes still held by its result."""
+    tracemalloc.start()
+    try:
+        result = run()
+        current, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return peak, current, result
+
+
+def best(run, repeat=3):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = run()
+        times.append(time.perf_counter() - start)
+    return min(times), result
+
+
+def describe(counts):
+    return ', '.join(f"{name} {n:,}" for name, n in sorted(counts.items())) or "none"
+
+
+if __name__ == "__main__":
+    sys.setrecursionlimit(10000)
+    cases = [
+        ("arith_tree(16)", arith_tree(16)),
+        ("app_chain(2000)", app_chain(2000)),
+        ("sum of squares to 20000", SUM_SQUARES),
+        ("count evens to 20000", COUNT_EVEN),
+        ("pair_tree(4096)", pair_tree(4096)),
+    ]
+    for name, expr in cases:
+        type_check(expr, TypeContext())
+        boxed_time, boxed = best(lambda: eval_expr(expr, Env()))
+        unboxed_time, unboxed = best(lambda: eval_unboxed(expr))
+        assert repr(box(unboxed)) == repr(boxed)
+        boxed_counts = allocations(lambda: eval_expr(expr, Env()))
+        unboxed_counts = allocations(lambda: eval_unboxed(expr))
+        boxed_peak, _, _ = peak_memory(lambda: eval_expr(expr, Env()))
+        unboxed_peak, _, _ = peak_memory(lambda: eval_unboxed(expr))
+        print(f"{name}: eval_expr {boxed_time:.4f}s, eval_unboxed {unboxed_time:.4f}s "
+              f"({boxed_time / unboxed_time:.2f}x)")
+        print(f"  allocated: eval_expr {sum(boxed_counts.values()):,} ({describe(boxed_counts)})")
+        print(f"             eval_unboxed {sum(unboxed_counts.values()):,} ({describe(unboxed_counts)})")
+        print(f"  peak memory: eval_expr {boxed_peak:,} bytes, eval_unboxed {unboxed_peak:,} bytes")
+
+    # The memory held by a result: a balanced tree of pairs of computed ints
+    expr = pairs(4096)
+    _, boxed_bytes, boxed = peak_memory(lambda: eval_expr(expr, Env()))
+    _, unboxed_bytes, unboxed = peak_memory(lambda: eval_unboxed(expr))
+    print(f"result of pairs(4096): eval_expr {boxed_bytes:,} bytes, eval_unboxed {unboxed_bytes:,} bytes "
+          f"({boxed_bytes / unboxed_bytes:.1f}x)")
@@ -0,0 +1,94 @@
+# Harness: the optimizer must preserve the type and the value of every program.
+# Generates random well-typed programs full of foldable constants, immediately applied
+# abstractions, lets, projections of pairs and cases on injections, then checks that
+# type_check and eval_expr agree on the original and the optimized program.
+# Run from the repository root with: python -m benchmarks.check_optimizer
+import random
+import time
+
+from files import *
+
+PROGRAMS = 2000
+SEED = 2520
+
+INT, BOOL = IntType(), BoolType()
+
+
+def gen(rng, typ, scope, depth):
+    """A random expression of type typ (Int or Bool) using the variables in scope."""
+    names = [name for name, t in scope.items() if t == typ]
+    if depth == 0 or rng.random() < 0.15:
+        if names and rng.random() < 0.6:
+            return Var(rng.choice(names))
+        return IntValue(rng.randint(-5, 5)) if typ == INT else BoolValue(rng.random() < 0.5)
+
+    other = rng.choice([INT, BOOL])
+    kind = rng.randrange(8)
+    if kind == 0:
+        if typ == INT:
+            op = rng.choice(['+', '-', '*', '/'])
+            return BinOp(gen(rng, INT, scope, depth - 1), op, gen(rng, INT, scope, depth - 1))
+        if rng.random() < 0.5:
+            return BinOp(gen(rng, BOOL, scope, depth - 1), rng.choice(['&&', '||']), gen(rng, BOOL, scope, depth - 1))
+        return BinOp(gen(rng, INT, scope, depth - 1), rng.choice(['==', '<', '>']), gen(rng, INT, scope, depth - 1))
+    elif kind == 1:
+        return If(gen(rng, BOOL, scope, depth - 1), gen(rng, typ, scope, depth - 1), gen(rng, typ, scope, depth - 1))
+    elif kind == 2:
+        # (λx: T. body) arg
+        name = rng.choice(['x', 'y', 'z', 'w'])
+        body = gen(rng, typ, {**scope, name: other}, depth - 1)
+        return App(Abs(name, other, body), gen(rng, other, scope, depth - 1))
+    elif kind == 3:
+        pair = Pair(gen(rng, typ, scope, depth - 1), gen(rng, other, scope, depth - 1))
+        return Fst(pair) if rng.random() < 0.5 else Snd(Pair(pair.right, pair.left))
+    elif kind == 4:
+        # case inl(v) of (t1, t2): the branches do not use a or b, see optimizer.py
+        or_type = OrType(other, other)
+        injection = (Inl if rng.random() < 0.5 else Inr)(gen(rng, other, scope, depth - 1), or_type)
+        return Case(injection, gen(rng, typ, scope, depth - 1), gen(rng, typ, scope, depth - 1))
+    elif kind == 5:
+        # A function applied twice: (λf: T -> typ. f e1 op f e2) (λv: T. body)
+        func_type = FuncType(other, typ)
+        body = gen(rng, typ, {**scope, 'v': other}, depth - 1)
+        call = lambda: App(Var('f'), gen(rng, other, scope, depth - 1))
+        combined = BinOp(call(), '+', call()) if typ == INT else BinOp(call(), '||', call())
+        return App(Abs('f', func_type, combined), Abs('v', other, body))
+    elif kind == 6:
+        # let x = e in body
+        name = rng.choice(['x', 'y', 'z', 'w'])
+        value = gen(rng, other, scope, depth - 1)
+        return Let(name, value, gen(rng, typ, {**scope, name: other}, depth - 1))
+    else:
+        return gen(rng, typ, scope, depth - 1)
+
+
+def outcome(expr):
+    try:
+        return repr(eval_expr(expr, Env()))
+    except ZeroDivisionError as e:
+        return f"error: {e}"
+
+
+if __name__ == "__main__":
+    rng = random.Random(SEED)
+    total = OptimizerStats()
+    t_original = t_optimized = 0.0
+    for _ in range(PROGRAMS):
+        program = gen(rng, rng.choice([INT, BOOL]), {}, 6)
+        optimized, stats = optimize(program)
+        assert type_check(optimized, TypeContext()) is type_check(program, TypeContext()), program
+
+        start = time.perf_counter()
+        expected = outcome(program)
+        t_original += time.perf_counter() - start
+        start = time.perf_counter()
+        got = outcome(optimized)
+        t_optimized += time.perf_counter() - start
+        assert got == expected, (program, optimized, expected, got)
+
+        for field in vars(total):
+            setattr(total, field, getattr(total, field) + getattr(stats, field))
+
+    print(f"{PROGRAMS} programs: optimized and original agree on type and value")
+    print(total)
+    print(f"eval_expr: original {t_original:.4f}s, optimized {t_optimized:.4f}s")
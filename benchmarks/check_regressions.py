@@ -0,0 +1,201 @@
+# Harness: programs that engines once got wrong, checked against eval_expr. Each check
+# is a function named check_*; all of them run in order, with the default recursion limit.
+# Run from the repository root with: python -m benchmarks.check_regressions
+import asyncio
+import json
+import tempfile
+import time
+
+from files import *
+from files.cli import run_program
+from files.service import EvaluationService
+
+
+def accumulate(n, step="acc + n"):
+    """Sum of 1..n by a loop that accumulates step, the next acc, in an argument."""
+    return parse(f"fix(λf: Int → Int → Int. λn: Int. λacc: Int. "
+                 f"if n == 0 then acc else f (n - 1) ({step})) {n} 0")
+
+
+def shared_body():
+    """(λx. x - y) 5 and (λy. x - y) 5, with x = y = 1, where both Abs nodes share one body node."""
+    body = BinOp(Var('x'), '-', Var('y'))
+    f, g = Abs('x', IntType(), body), Abs('y', IntType(), body)
+    pair = Pair(App(f, IntValue(5)), App(g, IntValue(5)))
+    return f, g, Let('y', IntValue(1), Let('x', IntValue(1), pair))
+
+
+def check_machine_deep_binders():
+    # x0 is looked up through 100000 environments, one per binder
+    expr = Var('x0')
+    for i in reversed(range(100_000)):
+        expr = App(Abs(f'x{i}', IntType(), expr), IntValue(i)) if i % 2 else Let(f'x{i}', IntValue(i), expr)
+    assert eval_machine(expr, Env()).value == 0
+
+
+def check_nbe_fix_on_open_pair():
+    # The argument is a pair of neutral terms, not a neutral term: fix must stay stuck
+    loop = parse("fix (λf: (Int ∧ Int) → Int. λp: Int ∧ Int. "
+                 "if fst(p) == 0 then 0 else f (fst(p) - 1, snd(p)))")
+    proposition = type_check(loop, TypeContext())
+    assert type_check(normalize(loop), TypeContext()) is proposition
+    # On a closed pair it is unfolded
+    assert normalize(App(loop, Pair(IntValue(3), IntValue(4)))).value == 0
+
+
+def check_nbe_division_by_zero_stays():
+    # Normalizing does not run the division; it stays in the normal form
+    for text in ("λx: Int. 1 / 0", "λb: Bool. if b then 1 / 0 else 0"):
+        program = parse(text)
+        assert type_check(normalize(program), TypeContext()) is type_check(program, TypeContext())
+
+
+def check_nbe_shared_node_two_types():
+    # After share, one node `if c then x else x` is both a Bool and an Int ∧ Int
+    program = share(parse("λc: Bool. ((λx: Bool. if c then x else x), (λx: Int ∧ Int. if c then x else x))"))
+    proposition = type_check(program, TypeContext())
+    assert type_check(normalize(program), TypeContext()) is proposition
+
+
+def check_lazy_deep_accumulator():
+    # The accumulator is a chain of n thunks for the step, forced when the loop ends
+    for step in ("acc + n", "(n * 1) + acc", "(λy: Int. y + n) acc"):
+        for n in (1000, 20_000):
+            assert eval_lazy(accumulate(n, step), Env()).value == n * (n + 1) // 2, step
+
+
+def check_compile_python_curried_tail_calls():
+    # f (n - 1) (acc + n) is a self tail call with both arguments: a loop, not recursion
+    assert compile_python(accumulate(10_000))(Env()).value == 50005000
+
+
+def check_cli_unprintable_result():
+    # 10 ** (2 ** 14) has more digits than repr may convert: an error row, not a crash
+    status, typ, result, _ = run_program(
+        "fix(λf: Int → Int → Int. λn: Int. λx: Int. if n == 0 then x else f (n - 1) (x * x)) 14 10")
+    assert (status, typ) == ('error', 'Int') and result.startswith('ValueError'), result
+
+
+def check_memo_shared_body():
+    # The two closures capture equal values under different names
+    _, _, program = shared_body()
+    assert repr(eval_memo(program, Env())) == repr(eval_expr(program, Env())) == "(4, -4)"
+    program = share(parse("let y = 1 in let x = 1 in ((λx: Int. x - y) 5, (λy: Int. x - y) 5)"))
+    assert repr(eval_memo(program, Env())) == "(4, -4)"
+
+
+def check_memo_tail_calls():
+    # Every step of the countdown is a memoized tail call
+    countdown = parse("fix(λf: Int → Int. λn: Int. if n == 0 then 0 else f (n - 1)) 3000")
+    assert eval_memo(countdown, Env()).value == 0
+    assert eval_memo(accumulate(20_000), Env()).value == 200010000
+
+
+def check_parallel_error_with_diverging_sibling():
+    # The left component raises after 30000 steps; the right one, farmed out, never ends
+    countdown = parse("fix(λf: Int → Int. λn: Int. if n == 0 then 1 / 0 else f (n - 1)) 30000")
+    forever = parse("fix(λf: Int → Int. λn: Int. f n) 0")
+    try:
+        eval_parallel(Pair(countdown, forever), workers=2, threshold=1000)
+    except ZeroDivisionError:
+        pass
+    else:
+        raise AssertionError("expected ZeroDivisionError")
+
+
+def check_profiler_labels_shared_body():
+    f, g, program = shared_body()
+    profiler = Profiler()
+    profiler.label(f, 'f')
+    profiler.label(g, 'g')
+    assert repr(profiler.eval_expr(program, Env())) == repr(eval_expr(program, Env()))
+    assert profiler.eval_stats.calls == {'f': 1, 'g': 1}, profiler.eval_stats.calls
+
+
+def check_programcache_damaged_files():
+    # Every single-byte change to a cache file is a miss, or still gives the same program
+    text = "let x = (1, true) in if snd(x) then fst(x) + 2 else 0"
+    with tempfile.TemporaryDirectory() as directory:
+        entry = ProgramCache(directory=directory).get(parse(text))
+        fresh = ProgramCache(directory=directory)
+        assert fresh.get(parse(text)).size == entry.size and fresh.disk_hits == 1
+        path = fresh._path(entry.key)
+        with open(path, 'rb') as f:
+            data = f.read()
+        for position in range(len(data)):
+            damaged = bytearray(data)
+            damaged[position] ^= 0x55
+            with open(path, 'wb') as f:
+                f.write(damaged)
+            loaded = ProgramCache(directory=directory)._load(entry.key)
+            assert loaded is None or (structural_hash(loaded.expr).hex() == entry.key
+                                      and loaded.type is entry.type), position
+
+
+def check_programcache_shared_dag():
+    # 2 ** 23 pairs as a tree, 24 distinct nodes: hashed and type-checked once per node
+    expr = IntValue(1)
+    for _ in range(23):
+        expr = Pair(expr, expr)
+    start = time.perf_counter()
+    entry = ProgramCache().get(expr)
+    assert entry.size == 24 and time.perf_counter() - start < 1
+    # Sharing does not change the key
+    one = IntValue(1)
+    pair = Pair(one, one)
+    assert structural_hash(Pair(pair, pair)) == structural_hash(parse("((1, 1), (1, 1))"))
+
+
+def check_service_bad_requests():
+    # Malformed requests are answered as rejected, and the service keeps serving
+    lines = [{'cancel': [1]}, {'id': [1], 'program': "1"}, {'id': 1, 'program': "1", 'fuel': True},
+             {'id': 2, 'program': 5}, {'id': 3, 'program': "1 + 1"}]
+
+    async def serve():
+        reader = asyncio.StreamReader()
+        for line in lines:
+            reader.feed_data((json.dumps(line) + '\n').encode('utf-8'))
+        reader.feed_eof()
+        written = []
+        async with EvaluationService(workers=1) as service:
+            await service.handle(reader, written.append)
+        return [json.loads(line) for line in written]
+
+    responses = asyncio.run(serve())
+    assert [response['status'] for response in responses] == ['rejected'] * 4 + ['ok'], responses
+
+
+def check_service_unprintable_result():
+    # 10 ** (2 ** 14) has more digits than repr may convert: an error, and the worker lives on
+    big = "fix(λf: Int → Int → Int. λn: Int. λx: Int. if n == 0 then x else f (n - 1) (x * x)) 14 10"
+
+    async def serve():
+        async with EvaluationService(workers=1) as service:
+            return [await service.submit(text) for text in (big, "1 + 1")]
+
+    responses = asyncio.run(serve())
+    assert [response['status'] for response in responses] == ['error', 'ok'], responses
+
+
+def check_service_squaring_loop():
+    # Squaring without end: the Int cap stops it long before its deadline, where an
+    # unbounded multiplication would hold the GIL past any deadline
+    squaring = "fix(λf: Int → Int. λn: Int. f (n * n)) 3"
+
+    async def serve():
+        async with EvaluationService(workers=1) as service:
+            return await service.submit(squaring, deadline=1)
+
+    response = asyncio.run(serve())
+    assert response['status'] == 'error' and response['seconds'] < 1, response
+    assert response['result'].startswith('OverflowError'), response
+    # Without the cap, run itself stops at its deadline
+    forever = Evaluation(parse("fix(λf: Int → Int. λn: Int. f n) 0"))
+    assert not forever.run(None, time.monotonic() + 0.1) and forever.steps > 0
+
+
+if __name__ == "__main__":
+    for name, check in list(globals().items()):
+        if name.startswith('check_'):
+            check()
+            print(f"{name}: ok")
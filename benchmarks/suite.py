@@ -0,0 +1,204 @@
+# Reproducible benchmark suite: every workload of benchmarks/workloads.py on every
+# engine, best and median time per call over several samples, saved as JSON and
+# compared with a baseline.
+#
+#     python -m benchmarks.suite --out baseline.json
+#     python -m benchmarks.suite --baseline baseline.json --out new.json
+#
+# The exit status is 1 when a result is slower than its baseline by more than the
+# threshold (default 10%), so the suite can gate changes in CI.
+# Run from the repository root with: python -m benchmarks.suite
+import argparse
+import datetime
+import gc
+import json
+import platform
+import statistics
+import sys
+import time
+
+from files import *
+from benchmarks.workloads import WORKLOADS
+
+# name -> (prepare, run): prepare(expr) builds the engine's input once, outside the
+# timed region, and run(prepared) is what is timed
+ENGINES = {
+    'type_check': (lambda expr: expr, lambda expr: type_check(expr, TypeContext())),
+    'eval_expr': (lambda expr: expr, lambda expr: eval_expr(expr, Env())),
+    'eval_machine': (lambda expr: expr, lambda expr: eval_machine(expr, Env())),
+    'run_compiled': (compile_expr, lambda code: code(Env())),
+    'eval_arena': (arena_from_expr, lambda stored: eval_arena(*stored, Env())),
+    'eval_lazy': (lambda expr: expr, lambda expr: eval_lazy(expr, Env())),
+    'eval_unboxed': (lambda expr: expr, eval_unboxed),
+    'compile_python': (compile_python, lambda program: program(Env())),
+    'eval_memo': (lambda expr: expr, lambda expr: eval_memo(expr, Env())),
+    'eval_shared': (share, lambda expr: eval_shared(expr, Env())),
+    'eval_fuel': (lambda expr: expr, lambda expr: eval_fuel(expr, Env(), sys.maxsize)),
+}
+
+
+def _too_deep(error):
+    """Whether error is the engine running out of Python stack, possibly reported as another error."""
+    while error is not None:
+        if isinstance(error, RecursionError):
+            return True
+        error = error.__cause__
+    return False
+
+
+def measure(run, prepared, repeat, min_time):
+    """
+    Seconds per call of run(prepared), one figure per sample for repeat samples. Like
+    timeit, each sample loops over enough calls to take at least min_time seconds, with
+    the garbage collector off.
+    """
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        return _samples(run, prepared, repeat, min_time)
+    finally:
+        if enabled:
+            gc.enable()
+
+
+def _samples(run, prepared, repeat, min_time):
+    number = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(number):
+            run(prepared)
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time:
+            break
+        number *= 10 if elapsed < min_time / 10 else 2
+    times = [elapsed / number]
+    for _ in range(repeat - 1):
+        start = time.perf_counter()
+        for _ in range(number):
+            run(prepared)
+        times.append((time.perf_counter() - start) / number)
+    return times, number
+
+
+def run_suite(names=None, engines=None, repeat=5, quick=False, min_time=0.05):
+    """
+    Results keyed 'workload/engine': {'min', 'median', 'loops'} in seconds per call, or
+    {'error'} when the engine ran out of Python stack on a workload too deep for it. Any
+    other error is an engine bug, and is raised.
+    quick runs each workload at its smaller size, for a smoke test.
+    """
+    results = {}
+    for name, (generate, args, quick_args) in WORKLOADS.items():
+        if names and name not in names:
+            continue
+        expr = generate(*(quick_args if quick else args))
+        type_check(expr, TypeContext())
+        for engine, (prepare, run) in ENGINES.items():
+            if engines and engine not in engines:
+                continue
+            key = f"{name}/{engine}"
+            try:
+                times, number = measure(run, prepare(expr), repeat, min_time)
+            except Exception as e:
+                if not _too_deep(e):
+                    raise
+                results[key] = {'error': f"{type(e).__name__}: {str(e)[:200]}"}
+                continue
+            results[key] = {'min': min(times), 'median': statistics.median(times), 'loops': number}
+    return results
+
+
+def compare(results, baseline, threshold):
+    """
+    Lines comparing the best times of results with a baseline, and whether any result
+    is slower than its baseline by more than threshold (a fraction). A result that now
+    fails where the baseline has a time, or a baseline result missing from results,
+    counts as a regression too.
+    """
+    lines = []
+    regressed = False
+    for key, result in results.items():
+        old = baseline.get(key)
+        if 'error' in result:
+            flag = ''
+            if old is not None and 'error' not in old:
+                flag = '  REGRESSION'
+                regressed = True
+            lines.append(f"{key:<32}  {result['error']}{flag}")
+            continue
+        if old is None or 'error' in old:
+            lines.append(f"{key:<32}{'':>12}{result['min']:>12.6f}  (no baseline)")
+            continue
+        ratio = result['min'] / old['min']
+        flag = ''
+        if ratio > 1 + threshold:
+            flag = 'REGRESSION'
+            regressed = True
+        elif ratio < 1 - threshold:
+            flag = 'faster'
+        lines.append(f"{key:<32}{old['min']:>12.6f}{result['min']:>12.6f}{ratio:>8.2f}x  {flag}")
+    for key in baseline:
+        if key not in results:
+            lines.append(f"{key:<32}  missing from this run  REGRESSION")
+            regressed = True
+    return lines, regressed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog='python -m benchmarks.suite',
+        description="Time the synthetic workloads on every engine and compare with a baseline.")
+    parser.add_argument('--out', help="write the results to this JSON file")
+    parser.add_argument('--baseline', help="JSON file of an earlier run to compare with")
+    parser.add_argument('--threshold', type=float, default=0.10,
+                        help="slowdown of the best time counted as a regression (default: 0.10)")
+    parser.add_argument('--workload', action='append', choices=sorted(WORKLOADS),
+                        help="run only this workload (repeatable)")
+    parser.add_argument('--engine', action='append', choices=sorted(ENGINES),
+                        help="run only this engine (repeatable)")
+    parser.add_argument('--repeat', type=int, default=5, help="timed samples per result (default: 5)")
+    parser.add_argument('--min-time', type=float, default=0.05,
+                        help="seconds each sample runs for at least (default: 0.05)")
+    parser.add_argument('--quick', action='store_true', help="smaller workloads, for a smoke test")
+    args = parser.parse_args(argv)
+
+    results = run_suite(args.workload, args.engine, args.repeat, args.quick, args.min_time)
+    report = {
+        'meta': {
+            'python': platform.python_version(),
+            'implementation': platform.python_implementation(),
+            'platform': platform.platform(),
+            'timestamp': datetime.datetime.now(datetime.timezone.utc).isoformat(timespec='seconds'),
+            'repeat': args.repeat,
+            'min_time': args.min_time,
+            'quick': args.quick,
+        },
+        'results': results,
+    }
+    if args.out:
+        with open(args.out, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2, sort_keys=True)
+
+    if not args.baseline:
+        for key, result in results.items():
+            if 'min' in result:
+                print(f"{key:<32}{result['min']:>12.6f}{result['median']:>12.6f}")
+            else:
+                print(f"{key:<32}  {result['error']}")
+        return 0
+    with open(args.baseline, encoding='utf-8') as f:
+        baseline = json.load(f)
+    if baseline['meta'].get('quick') != args.quick:
+        print("warning: the baseline was run with a different --quick setting", file=sys.stderr)
+    print(f"{'result':<32}{'baseline s':>12}{'new s':>12}{'ratio':>9}")
+    # Only the workloads and engines this run was asked for can be missing from it
+    selected = {key: result for key, result in baseline['results'].items()
+                if (not args.workload or key.split('/')[0] in args.workload)
+                and (not args.engine or key.split('/')[1] in args.engine)}
+    lines, regressed = compare(results, selected, args.threshold)
+    print('\n'.join(lines))
+    return 1 if regressed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,104 @@
+# Generators of closed, well-typed programs of adjustable shape and size, for the
+# benchmark suite (benchmarks/suite.py). Every generator is deterministic: the same
+# arguments (and seed) always give the same program.
+import random
+
+from files import *
+
+INT, BOOL = IntType(), BoolType()
+
+
+def app_chain(depth):
+    """(λx: Int. x + 1) ((λx: Int. x + 1) (... 0)): applications nested depth deep."""
+    inc = Abs('x', INT, BinOp(Var('x'), '+', IntValue(1)))
+    expr = IntValue(0)
+    for _ in range(depth):
+        expr = App(inc, expr)
+    return expr
+
+
+def curried_chain(arity):
+    """(λx1: Int. ... λxn: Int. x1 + ... + xn) 1 ... n: a spine of arity applications."""
+    body = Var('x1')
+    for i in range(2, arity + 1):
+        body = BinOp(body, '+', Var(f'x{i}'))
+    func = body
+    for i in range(arity, 0, -1):
+        func = Abs(f'x{i}', INT, func)
+    expr = func
+    for i in range(1, arity + 1):
+        expr = App(expr, IntValue(i))
+    return expr
+
+
+def pair_tree(leaves):
+    """let p = (balanced tree of pairs over 0 .. leaves-1) in the sum of every leaf, by projections."""
+    def build(low, high, path):
+        # The subtree over low .. high-1, and the sum of its leaves read out of p along path
+        if high - low == 1:
+            return IntValue(low), path(Var('p'))
+        middle = (low + high) // 2
+        left, left_sum = build(low, middle, lambda e: Fst(path(e)))
+        right, right_sum = build(middle, high, lambda e: Snd(path(e)))
+        return Pair(left, right), BinOp(left_sum, '+', right_sum)
+
+    tree, total = build(0, leaves, lambda e: e)
+    return Let('p', tree, total)
+
+
+def nested_case(depth):
+    """Cases on Int ∨ Int nested depth deep in scrutinee position, flipping the injection each time."""
+    or_type = OrType(INT, INT)
+    expr = Inl(IntValue(0), or_type)
+    for k in range(depth):
+        # The branches do not use a or b: eval_expr binds them to the whole injection
+        expr = Case(expr, Inr(IntValue(k), or_type), Inl(IntValue(k), or_type))
+    return Case(expr, IntValue(0), IntValue(1))
+
+
+def arith_tree(depth, seed=0):
+    """(λx: Int. t) 3 where t is a random balanced tree of +, -, *, < and if, depth levels deep."""
+    rng = random.Random(seed)
+
+    def build(level):
+        if level == 0:
+            return Var('x') if rng.random() < 0.5 else IntValue(rng.randint(0, 9))
+        kind = rng.random()
+        if kind < 0.1 and level > 1:
+            condition = BinOp(build(level - 2), '<', build(level - 2))
+            return If(condition, build(level - 1), build(level - 1))
+        return BinOp(build(level - 1), rng.choice(['+', '-', '*']), build(level - 1))
+
+    return App(Abs('x', INT, build(depth)), IntValue(3))
+
+
+def church(base, power):
+    """
+    Church numerals at T = (Int → Int) → Int → Int: base multiplied by itself power
+    times with mul = λm: T. λn: T. λf: Int → Int. m (n f), then applied to succ and 0,
+    so evaluation makes base ** power calls of succ through higher-order functions.
+    """
+    func_type = FuncType(INT, INT)
+    numeral_type = FuncType(func_type, func_type)
+    body = Var('x')
+    for _ in range(base):
+        body = App(Var('f'), body)
+    numeral = Abs('f', func_type, Abs('x', INT, body))
+    mul = Abs('m', numeral_type, Abs('n', numeral_type, Abs('f', func_type,
+              App(Var('m'), App(Var('n'), Var('f'))))))
+    product = Var('num')
+    for _ in range(power - 1):
+        product = App(App(Var('mul'), Var('num')), product)
+    succ = Abs('y', INT, BinOp(Var('y'), '+', IntValue(1)))
+    return Let('mul', mul, Let('num', numeral, App(App(product, succ), IntValue(0))))
+
+
+# name -> (generator, default arguments, arguments for a quick smoke test)
+WORKLOADS = {
+    'app_chain': (app_chain, (200,), (50,)),
+    'curried_chain': (curried_chain, (150,), (40,)),
+    'pair_tree': (pair_tree, (2048,), (256,)),
+    'nested_case': (nested_case, (200,), (50,)),
+    'arith_tree': (arith_tree, (12,), (8,)),
+    'church': (church, (3, 5), (3, 3)),  # eval_lazy keeps a chain of 3 ** 5 thunks deep
+}
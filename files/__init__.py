@@ -6,3 +6,24 @@ from .value import *
 from .logicaltypes import *
 from .conjuntiontypes import *
 from .disjunctions import *
+from .recursion import *
+from .letbinding import *
+from .compiler import *
+from .machine import *
+from .resolver import *
+from .batch import *
+from .optimizer import *
+from .arena import *
+from .parser import *
+from .serialize import *
+from .lazy import *
+from .profiler import *
+from .programcache import *
+from .codegen import *
+from .nbe import *
+from .proofsearch import *
+from .sharing import *
+from .fuel import *
+from .unboxed import *
+from .parallel import *
+from .memo import *
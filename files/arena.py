@@ -0,0 +1,446 @@
+# Struct-of-arrays representation of expression trees for very large programs.
+#
+# Node i of an Arena is described by ops[i] (an opcode) and up to three integer fields
+# first[i], second[i], third[i], whose meaning depends on the opcode:
+#
+#     OP_VAR    name
+#     OP_ABS    name, type, body
+#     OP_APP    func, arg
+#     OP_INT    constant
+#     OP_BOOL   0 or 1
+#     OP_BINOP  left, operator name, right
+#     OP_IF     condition, then_branch, else_branch
+#     OP_PAIR   left, right
+#     OP_FST    pair
+#     OP_SND    pair
+#     OP_INL    value, type
+#     OP_INR    value, type
+#     OP_CASE   expr, left_case, right_case
+#     OP_FIX    func
+#     OP_LET    name, value, body
+#
+# Children, names, constants and types are indices into the node arrays and into the
+# arena's tables of interned names, integer constants and types. Children are always
+# added before their parents.
+from array import array
+
+from .expressions import *
+from .value import *
+from .ifcondition import *
+from .binop import *
+from .conjuntiontypes import *
+from .disjunctions import *
+from .recursion import *
+from .letbinding import *
+from .typechecker import *
+from .interpreter import Env
+from .machine import apply_binop
+
+OP_VAR, OP_ABS, OP_APP, OP_INT, OP_BOOL, OP_BINOP, OP_IF, OP_PAIR, OP_FST, OP_SND, OP_INL, OP_INR, OP_CASE, OP_FIX, OP_LET = range(15)
+
+
+class Arena:
+    """Struct-of-arrays storage for expression trees, see the module comment."""
+    def __init__(self):
+        self.ops = array('B')
+        self.first = array('i')
+        self.second = array('i')
+        self.third = array('i')
+        self.names = []      # Interned variable names and operators
+        self.consts = []     # Interned integer constants
+        self.types = []      # Interned types
+        self._index = {}     # (table tag, item) -> index into names, consts or types
+
+    def __len__(self):
+        return len(self.ops)
+
+    def nbytes(self):
+        """Bytes used by the node arrays (the interned tables are not counted)."""
+        return sum(a.itemsize * len(a) for a in (self.ops, self.first, self.second, self.third))
+
+    def _intern(self, table, tag, item):
+        key = (tag, item)
+        index = self._index.get(key)
+        if index is None:
+            index = self._index[key] = len(table)
+            table.append(item)
+        return index
+
+    def add(self, op, first=0, second=0, third=0):
+        """Append a node and return its index."""
+        self.ops.append(op)
+        self.first.append(first)
+        self.second.append(second)
+        self.third.append(third)
+        return len(self.ops) - 1
+
+    def add_expr(self, expr):
+        """Store an expression tree and return the index of its root. Shared subtrees are stored once."""
+        done = {}  # node -> index, so a DAG stays a DAG
+        stack = [expr]
+        while stack:
+            node = stack[-1]
+            if node in done:
+                stack.pop()
+                continue
+            pending = [child for child in _children(node) if child not in done]
+            if pending:
+                stack.extend(pending)
+                continue
+            stack.pop()
+            done[node] = self._add_node(node, done)
+        return done[expr]
+
+    def _add_node(self, node, done):
+        if isinstance(node, Var):
+            return self.add(OP_VAR, self._intern(self.names, 'n', node.name))
+        elif isinstance(node, Abs):
+            return self.add(OP_ABS, self._intern(self.names, 'n', node.param_name),
+                            self._intern(self.types, 't', node.param_type), done[node.body])
+        elif isinstance(node, App):
+            return self.add(OP_APP, done[node.func], done[node.arg])
+        elif isinstance(node, BoolValue):
+            return self.add(OP_BOOL, 1 if node.value else 0)
+        elif isinstance(node, IntValue):
+            return self.add(OP_INT, self._intern(self.consts, 'c', node.value))
+        elif isinstance(node, BinOp):
+            return self.add(OP_BINOP, done[node.left], self._intern(self.names, 'n', node.op), done[node.right])
+        elif isinstance(node, If):
+            return self.add(OP_IF, done[node.condition], done[node.then_branch], done[node.else_branch])
+        elif isinstance(node, Pair):
+            return self.add(OP_PAIR, done[node.left], done[node.right])
+        elif isinstance(node, Fst):
+            return self.add(OP_FST, done[node.pair])
+        elif isinstance(node, Snd):
+            return self.add(OP_SND, done[node.pair])
+        elif isinstance(node, Inl):
+            return self.add(OP_INL, done[node.value], self._intern(self.types, 't', node.typ))
+        elif isinstance(node, Inr):
+            return self.add(OP_INR, done[node.value], self._intern(self.types, 't', node.typ))
+        elif isinstance(node, Case):
+            return self.add(OP_CASE, done[node.expr], done[node.left_case], done[node.right_case])
+        elif isinstance(node, Fix):
+            return self.add(OP_FIX, done[node.func])
+        elif isinstance(node, Let):
+            return self.add(OP_LET, self._intern(self.names, 'n', node.name), done[node.value], done[node.body])
+        else:
+            raise TypeError(f"Unknown expression type: {node}")
+
+    def to_expr(self, root):
+        """Rebuild the expression tree rooted at node root. Shared nodes stay shared."""
+        ops, first, second, third = self.ops, self.first, self.second, self.third
+        names, consts, types = self.names, self.consts, self.types
+        built = {}
+        # Children have smaller indices than their parents, so build in index order
+        for i in sorted(_reachable(self, root)):
+            op = ops[i]
+            if op == OP_VAR:
+                built[i] = Var(names[first[i]])
+            elif op == OP_ABS:
+                built[i] = Abs(names[first[i]], types[second[i]], built[third[i]])
+            elif op == OP_APP:
+                built[i] = App(built[first[i]], built[second[i]])
+            elif op == OP_INT:
+                built[i] = IntValue(consts[first[i]])
+            elif op == OP_BOOL:
+                built[i] = BoolValue(bool(first[i]))
+            elif op == OP_BINOP:
+                built[i] = BinOp(built[first[i]], names[second[i]], built[third[i]])
+            elif op == OP_IF:
+                built[i] = If(built[first[i]], built[second[i]], built[third[i]])
+            elif op == OP_PAIR:
+                built[i] = Pair(built[first[i]], built[second[i]])
+            elif op == OP_FST:
+                built[i] = Fst(built[first[i]])
+            elif op == OP_SND:
+                built[i] = Snd(built[first[i]])
+            elif op == OP_INL:
+                built[i] = Inl(built[first[i]], types[second[i]])
+            elif op == OP_INR:
+                built[i] = Inr(built[first[i]], types[second[i]])
+            elif op == OP_CASE:
+                built[i] = Case(built[first[i]], built[second[i]], built[third[i]])
+            elif op == OP_FIX:
+                built[i] = Fix(built[first[i]])
+            elif op == OP_LET:
+                built[i] = Let(names[first[i]], built[second[i]], built[third[i]])
+        return built[root]
+
+
+def _children(expr):
+    if isinstance(expr, Abs):
+        return (expr.body,)
+    elif isinstance(expr, App):
+        return (expr.func, expr.arg)
+    elif isinstance(expr, (Pair, BinOp)):
+        return (expr.left, expr.right)
+    elif isinstance(expr, If):
+        return (expr.condition, expr.then_branch, expr.else_branch)
+    elif isinstance(expr, (Fst, Snd)):
+        return (expr.pair,)
+    elif isinstance(expr, Fix):
+        return (expr.func,)
+    elif isinstance(expr, Let):
+        return (expr.value, expr.body)
+    elif isinstance(expr, (Inl, Inr)):
+        return (expr.value,)
+    elif isinstance(expr, Case):
+        return (expr.expr, expr.left_case, expr.right_case)
+    return ()
+
+
+# Which of first, second, third hold child indices, per opcode
+_CHILD_FIELDS = {
+    OP_VAR: (), OP_INT: (), OP_BOOL: (),
+    OP_ABS: (2,), OP_APP: (0, 1), OP_BINOP: (0, 2), OP_IF: (0, 1, 2), OP_PAIR: (0, 1),
+    OP_FST: (0,), OP_SND: (0,), OP_INL: (0,), OP_INR: (0,), OP_CASE: (0, 1, 2), OP_FIX: (0,),
+    OP_LET: (1, 2),
+}
+
+def _reachable(arena, root):
+    fields = (arena.first, arena.second, arena.third)
+    seen = {root}
+    stack = [root]
+    while stack:
+        i = stack.pop()
+        for field in _CHILD_FIELDS[arena.ops[i]]:
+            child = fields[field][i]
+            if child not in seen:
+                seen.add(child)
+                stack.append(child)
+    return seen
+
+
+def arena_from_expr(expr):
+    """Store an expression in a new Arena. Returns the arena and the index of the root."""
+    arena = Arena()
+    return arena, arena.add_expr(expr)
+
+
+# Type checking and evaluation directly on an arena, following type_check and eval_expr
+
+_INT = IntType()
+_BOOL = BoolType()
+
+def type_check_arena(arena, index, context):
+    """Type-check the node at index given a type context, like type_check."""
+    op = arena.ops[index]
+    first, second, third = arena.first[index], arena.second[index], arena.third[index]
+
+    if op == OP_VAR:
+        return context.lookup(arena.names[first])
+
+    elif op == OP_INT:
+        return _INT
+
+    elif op == OP_BOOL:
+        return _BOOL
+
+    elif op == OP_ABS:
+        param_type = arena.types[second]
+        body_type = type_check_arena(arena, third, context.extend(arena.names[first], param_type))
+        return FuncType(param_type, body_type)
+
+    elif op == OP_APP:
+        func_type = type_check_arena(arena, first, context)
+        arg_type = type_check_arena(arena, second, context)
+        if isinstance(func_type, FuncType):
+            if func_type.param_type == arg_type or isinstance(func_type.param_type, OrType):
+                return func_type.return_type
+            raise TypeError(f"Type mismatch: expected {func_type.param_type} but got {arg_type}")
+        raise TypeError(f"Expected a function, but got {func_type}")
+
+    elif op == OP_PAIR:
+        return AndType(type_check_arena(arena, first, context), type_check_arena(arena, second, context))
+
+    elif op == OP_FST or op == OP_SND:
+        pair_type = type_check_arena(arena, first, context)
+        if isinstance(pair_type, AndType):
+            return pair_type.left if op == OP_FST else pair_type.right
+        raise TypeError(f"{'fst' if op == OP_FST else 'snd'} can only be applied to a conjunction (A ∧ B).")
+
+    elif op == OP_INL or op == OP_INR:
+        value_type = type_check_arena(arena, first, context)
+        typ = arena.types[second]
+        side = 'left' if op == OP_INL else 'right'
+        if isinstance(typ, OrType) and value_type == getattr(typ, side):
+            return typ
+        raise TypeError(f"The value for {'inl' if op == OP_INL else 'inr'} must match the {side} type of the disjunction.")
+
+    elif op == OP_CASE:
+        disjunction_type = type_check_arena(arena, first, context)
+        if not isinstance(disjunction_type, OrType):
+            raise TypeError("Case expression must be applied to a disjunction (A ∨ B).")
+        case_context = context.extend('a', disjunction_type.left).extend('b', disjunction_type.right)
+        left_type = type_check_arena(arena, second, case_context)
+        right_type = type_check_arena(arena, third, case_context)
+        if left_type == right_type:
+            return left_type
+        raise TypeError("Both branches of the case expression must return the same type.")
+
+    elif op == OP_IF:
+        condition_type = type_check_arena(arena, first, context)
+        if condition_type is not _BOOL:
+            raise TypeError(f"Condition in if must be Bool, but got {condition_type}")
+        then_type = type_check_arena(arena, second, context)
+        else_type = type_check_arena(arena, third, context)
+        if then_type != else_type:
+            raise TypeError(f"Type mismatch in branches: {then_type} vs {else_type}")
+        return then_type
+
+    elif op == OP_BINOP:
+        left_type = type_check_arena(arena, first, context)
+        right_type = type_check_arena(arena, third, context)
+        operator = arena.names[second]
+        if operator in ['+', '-', '*', '/']:
+            if left_type is _INT and right_type is _INT:
+                return _INT
+            raise TypeError(f"Arithmetic operations require Int types, but got {left_type} and {right_type}")
+        elif operator in ['&&', '||']:
+            if left_type is _BOOL and right_type is _BOOL:
+                return _BOOL
+            raise TypeError(f"Boolean operations require Bool types, but got {left_type} and {right_type}")
+        elif operator in ['==', '<', '>']:
+            if left_type is _INT and right_type is _INT:
+                return _BOOL
+            raise TypeError(f"Comparison operations require Int types, but got {left_type} and {right_type}")
+        raise TypeError(f"Unknown binary operation: {operator}")
+
+    elif op == OP_FIX:
+        func_type = type_check_arena(arena, first, context)
+        if (isinstance(func_type, FuncType) and isinstance(func_type.param_type, FuncType)
+                and func_type.param_type == func_type.return_type):
+            return func_type.return_type
+        raise TypeError(f"fix requires a function of type (A → B) → (A → B), but got {func_type}")
+
+    elif op == OP_LET:
+        value_type = type_check_arena(arena, second, context)
+        return type_check_arena(arena, third, context.extend(arena.names[first], value_type))
+
+    else:
+        raise TypeError(f"Unknown opcode: {op}")
+
+
+class ArenaClosure(Value):
+    """A closure over a function body stored in an arena."""
+    __slots__ = ('param_name', 'param_type', 'arena', 'body', 'env')
+    def __init__(self, param_name, param_type, arena, body, env):
+        self.param_name = param_name
+        self.param_type = param_type
+        self.arena = arena
+        self.body = body  # Index of the body in the arena
+        self.env = env
+
+    def __repr__(self):
+        return f"<closure λ{self.param_name}: {self.param_type}. {self.arena.to_expr(self.body)}>"
+
+
+def eval_arena(arena, index, env):
+    """
+    Evaluate the node at index in a given environment, like eval_expr.
+
+    As in eval_expr, calls in tail position continue the loop instead of recursing.
+    """
+    while True:
+        op = arena.ops[index]
+        first, second, third = arena.first[index], arena.second[index], arena.third[index]
+
+        if op == OP_VAR:
+            return env.lookup(arena.names[first])
+
+        elif op == OP_INT:
+            return IntValue(arena.consts[first])
+
+        elif op == OP_BOOL:
+            return BoolValue(bool(first))
+
+        elif op == OP_ABS:
+            return ArenaClosure(arena.names[first], arena.types[second], arena, third, env)
+
+        elif op == OP_APP:
+            func = eval_arena(arena, first, env)
+            arg = eval_arena(arena, second, env)
+            while isinstance(func, ArenaFixpoint):
+                func = _fix_arena(func.func)
+            if not isinstance(func, ArenaClosure):
+                raise TypeError(f"Expected a function, but got {func}")
+            env = Env(func.env)
+            env.extend(func.param_name, arg)
+            arena, index = func.arena, func.body
+
+        elif op == OP_BINOP:
+            return apply_binop(arena.names[second], eval_arena(arena, first, env), eval_arena(arena, third, env))
+
+        elif op == OP_IF:
+            condition_value = eval_arena(arena, first, env)
+            if not isinstance(condition_value, BoolValue):
+                raise TypeError(f"Condition must evaluate to a Bool, but got {condition_value}")
+            index = second if condition_value.value else third
+
+        elif op == OP_PAIR:
+            return Pair(eval_arena(arena, first, env), eval_arena(arena, second, env))
+
+        elif op == OP_FST or op == OP_SND:
+            pair_value = eval_arena(arena, first, env)
+            if not isinstance(pair_value, Pair):
+                raise TypeError(f"{'fst' if op == OP_FST else 'snd'} can only be applied to a pair.")
+            return pair_value.left if op == OP_FST else pair_value.right
+
+        elif op == OP_INL:
+            return InlValue(eval_arena(arena, first, env))
+
+        elif op == OP_INR:
+            return InrValue(eval_arena(arena, first, env))
+
+        elif op == OP_CASE:
+            disjunction_value = eval_arena(arena, first, env)
+            env = Env(env)
+            if isinstance(disjunction_value, InlValue):
+                env.extend('a', disjunction_value)
+                index = second
+            elif isinstance(disjunction_value, InrValue):
+                env.extend('b', disjunction_value)
+                index = third
+            else:
+                raise TypeError("Expected a disjunction (Inl or Inr).")
+
+        elif op == OP_LET:
+            value = eval_arena(arena, second, env)
+            env = Env(env)
+            env.extend(arena.names[first], value)
+            index = third
+
+        elif op == OP_FIX:
+            func = eval_arena(arena, first, env)
+            if not isinstance(func, ArenaClosure):
+                raise TypeError(f"fix expects a function, but got {func}")
+            return _fix_arena(func)
+
+        else:
+            raise TypeError(f"Unknown opcode: {op}")
+
+
+class ArenaFixpoint(Value):
+    """
+    The fixed point of an ArenaClosure whose body is not an abstraction. It is unfolded
+    (the body is evaluated again) each time it is applied.
+    """
+    __slots__ = ('func',)
+    def __init__(self, func):
+        self.func = func
+
+    def __repr__(self):
+        return f"<fix {self.func}>"
+
+
+def _fix_arena(func):
+    """The fixed point of an ArenaClosure, as in eval_expr."""
+    arena, body = func.arena, func.body
+    env = Env(func.env)
+    if arena.ops[body] == OP_ABS:
+        closure = ArenaClosure(arena.names[arena.first[body]], arena.types[arena.second[body]],
+                               arena, arena.third[body], env)
+        env.extend(func.param_name, closure)
+        return closure
+    env.extend(func.param_name, ArenaFixpoint(func))
+    return eval_arena(arena, body, env)
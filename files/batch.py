@@ -0,0 +1,141 @@
+# Batch evaluation: apply one function of Int/Bool arguments to whole columns of inputs
+# at once, with NumPy arrays in place of IntValue/BoolValue.
+from .expressions import *
+from .types import *
+from .value import *
+from .ifcondition import *
+from .binop import *
+from .typechecker import *
+from .letbinding import *
+
+try:
+    import numpy as np
+except ImportError:  # NumPy is only needed for batch evaluation
+    np = None
+
+
+class BatchResult:
+    """The results of a batch evaluation, one element per input row."""
+    def __init__(self, values, errors):
+        self.values = values  # Array of results; undefined where errors is set
+        self.errors = errors  # Boolean array, True where the row divided by zero
+
+    def __len__(self):
+        return len(self.values)
+
+    def __repr__(self):
+        return f"BatchResult(values={self.values}, errors={self.errors})"
+
+    def to_values(self):
+        """Convert to a list of IntValue/BoolValue, with a ZeroDivisionError for failed rows."""
+        wrap = BoolValue if self.values.dtype == np.bool_ else IntValue
+        return [ZeroDivisionError("Division by zero") if error else wrap(value.item())
+                for value, error in zip(self.values, self.errors)]
+
+
+def _column(values, typ):
+    """Turn a column of Python or IntValue/BoolValue inputs into an array."""
+    if isinstance(values, np.ndarray):
+        column = values
+    else:
+        column = np.array([v.value if isinstance(v, (IntValue, BoolValue)) else v for v in values])
+    return column.astype(np.bool_ if typ == BoolType() else np.int64)
+
+
+def _divide(left, right):
+    # Rows dividing by zero are flagged; the divisor is replaced so NumPy does not warn
+    zero = right == 0
+    return np.floor_divide(left, np.where(zero, 1, right)), zero
+
+
+# Operator table: op -> elementwise function on arrays ('/' is handled by _divide)
+BATCH_BINOPS = {} if np is None else {
+    '+': np.add,
+    '-': np.subtract,
+    '*': np.multiply,
+    '&&': np.logical_and,
+    '||': np.logical_or,
+    '==': np.equal,
+    '<': np.less,
+    '>': np.greater,
+}
+
+
+def _eval_batch(expr, columns):
+    """Evaluate expr elementwise. Returns (values, errors); either may be a scalar."""
+
+    if isinstance(expr, Var):
+        return columns[expr.name], False
+
+    elif isinstance(expr, IntValue):
+        return np.int64(expr.value), False
+
+    elif isinstance(expr, BoolValue):
+        return np.bool_(expr.value), False
+
+    elif isinstance(expr, BinOp):
+        left, left_errors = _eval_batch(expr.left, columns)
+        right, right_errors = _eval_batch(expr.right, columns)
+        if expr.op == '/':
+            values, zero = _divide(left, right)
+            return values, left_errors | right_errors | zero
+        return BATCH_BINOPS[expr.op](left, right), left_errors | right_errors
+
+    elif isinstance(expr, If):
+        # Both branches are computed for every row, then the condition selects per row.
+        # Errors in the branch that a row does not take are masked out.
+        condition, condition_errors = _eval_batch(expr.condition, columns)
+        then_values, then_errors = _eval_batch(expr.then_branch, columns)
+        else_values, else_errors = _eval_batch(expr.else_branch, columns)
+        values = np.where(condition, then_values, else_values)
+        errors = condition_errors | np.where(condition, then_errors, else_errors)
+        return values, errors
+
+    elif isinstance(expr, App) and isinstance(expr.func, Abs):
+        # An immediately applied abstraction binds a new column
+        arg, arg_errors = _eval_batch(expr.arg, columns)
+        values, errors = _eval_batch(expr.func.body, {**columns, expr.func.param_name: arg})
+        return values, errors | arg_errors
+
+    elif isinstance(expr, Let):
+        value, value_errors = _eval_batch(expr.value, columns)
+        values, errors = _eval_batch(expr.body, {**columns, expr.name: value})
+        return values, errors | value_errors
+
+    else:
+        raise TypeError(f"Batch evaluation does not support {expr}")
+
+
+def eval_batch(func, *inputs):
+    """
+    Apply a closed function of Int/Bool arguments to columns of inputs.
+
+    func is a curried abstraction λx1: T1. ... λxn: Tn. body with each Ti Int or Bool,
+    and body built from variables, literals, BinOp, If, Let and immediately applied
+    abstractions. inputs holds one column per argument (a list or an array); row i of
+    the result is func applied to row i of every column. Ints are 64-bit, as in NumPy.
+    """
+    if np is None:
+        raise ImportError("eval_batch requires NumPy")
+
+    func_type = type_check(func, TypeContext())
+    columns = {}
+    expr = func
+    for column in inputs:
+        if not isinstance(expr, Abs) or expr.param_type not in (IntType(), BoolType()):
+            raise TypeError(f"Expected a function of Int or Bool arguments, but got {func_type}")
+        columns[expr.param_name] = _column(column, expr.param_type)
+        expr = expr.body
+        func_type = func_type.return_type
+    if func_type not in (IntType(), BoolType()):
+        raise TypeError(f"Expected an Int or Bool result, but got {func_type}")
+
+    size = len(next(iter(columns.values()))) if columns else 1
+    if any(len(column) != size for column in columns.values()):
+        raise ValueError("All input columns must have the same length")
+
+    values, errors = _eval_batch(expr, columns)
+    dtype = np.bool_ if func_type == BoolType() else np.int64
+    values = np.broadcast_to(np.asarray(values, dtype=dtype), (size,)).copy()
+    errors = np.broadcast_to(np.asarray(errors, dtype=np.bool_), (size,)).copy()
+    return BatchResult(values, errors)
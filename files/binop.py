@@ -2,6 +2,7 @@ from .expressions import *
 
 class BinOp(Expr):
     """Represents a binary operation (e.g., x + y)."""
+    __slots__ = ('left', 'op', 'right')
     def __init__(self, left, op, right):
         self.left = left   # The left operand
         self.op = op       # The operation ('+', '-', '*', '/', '&&', '||', '==', '<', '>')
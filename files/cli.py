@@ -0,0 +1,236 @@
+# Command-line batch runner: type-check and evaluate a stream of programs, one per line
+# in the syntax of parser.py, across a pool of worker processes.
+#
+#     python -m files programs.txt --workers 4 --timeout 2 --format json
+#
+# Results are written in input order as soon as every earlier program has finished.
+import argparse
+import json
+import os
+import signal
+import sys
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from .interpreter import *
+from .typechecker import *
+from .parser import *
+from .lazy import evaluate
+
+
+class _Timeout(BaseException):
+    """Raised by the alarm signal handler. Not an Exception, so evaluation cannot catch it."""
+
+
+def _alarm(signum, frame):
+    raise _Timeout()
+
+
+def _install_alarm():
+    """Install the timeout handler, returning the handler it replaces (None if it cannot be installed)."""
+    if hasattr(signal, 'setitimer') and threading.current_thread() is threading.main_thread():
+        return signal.signal(signal.SIGALRM, _alarm)
+    return None
+
+
+def _check_and_eval(text, strategy):
+    """Returns (status, type, result) for one program."""
+    try:
+        expr = parse(text)
+    except ParseError as e:
+        return 'parse_error', None, str(e)
+    try:
+        typ = type_check(expr, TypeContext())
+    except (TypeError, RecursionError) as e:
+        return 'type_error', None, str(e)
+    try:
+        # repr can fail too, on an Int over the int-to-str digit limit
+        result = repr(evaluate(expr, Env(), strategy))
+    except Exception as e:
+        return 'error', str(typ), f"{type(e).__name__}: {e}"
+    return 'ok', str(typ), result
+
+
+def run_program(text, timeout=None, strategy='strict'):
+    """
+    Type-check and evaluate one program given as text, with the evaluation strategy
+    'strict' (eval_expr) or 'lazy' (eval_lazy).
+
+    Returns (status, type, result, seconds), where status is 'ok', 'parse_error',
+    'type_error', 'error' (evaluation raised) or 'timeout'. The timeout uses SIGALRM and
+    only applies while the handler installed by run_programs (or by the worker processes)
+    is in place, so not in other threads, and not on Windows.
+    """
+    timed = timeout and hasattr(signal, 'setitimer') and signal.getsignal(signal.SIGALRM) is _alarm
+    start = time.perf_counter()
+    try:
+        if timed:
+            signal.setitimer(signal.ITIMER_REAL, timeout)
+        try:
+            status, typ, result = _check_and_eval(text, strategy)
+        finally:
+            if timed:
+                signal.setitimer(signal.ITIMER_REAL, 0)
+    except _Timeout:
+        status, typ, result = 'timeout', None, f"Timed out after {timeout}s"
+    return status, typ, result, time.perf_counter() - start
+
+
+def _run_chunk(chunk, timeout, strategy):
+    return [(lineno, *run_program(text, timeout, strategy)) for lineno, text in chunk]
+
+
+def _crashed(chunk, error):
+    return [(lineno, 'error', None, f"{type(error).__name__}: {error}", 0.0) for lineno, _ in chunk]
+
+
+def _chunks(lines, size):
+    """Group the non-blank, non-comment lines into lists of (line number, text)."""
+    chunk = []
+    for lineno, line in enumerate(lines, 1):
+        text = line.strip()
+        if not text or text.startswith('#'):
+            continue
+        chunk.append((lineno, text))
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def run_programs(lines, workers=None, timeout=None, chunk_size=64, strategy='strict'):
+    """
+    Run every program in an iterable of lines and yield
+    (line number, status, type, result, seconds) in input order.
+
+    Chunks of chunk_size programs are sent to a pool of worker processes; at most two
+    chunks per worker are outstanding, so the input is read only as fast as it is
+    processed. With workers=1 the programs are run in this process, and the timeout
+    handler is installed only for the duration of the run, when there is a timeout.
+
+    If a worker process dies, the pool is replaced: the chunk whose result was due is
+    run again on its own, and reported as 'error' rows if it kills its worker again; the
+    other outstanding chunks are resubmitted.
+    """
+    workers = workers or os.cpu_count() or 1
+    chunks = _chunks(lines, chunk_size)
+    if workers == 1:
+        previous = _install_alarm() if timeout else None
+        try:
+            for chunk in chunks:
+                yield from _run_chunk(chunk, timeout, strategy)
+        finally:
+            if previous is not None:
+                signal.signal(signal.SIGALRM, previous)
+        return
+
+    pool = ProcessPoolExecutor(workers, initializer=_install_alarm)
+    pending = deque()  # (chunk, future) in input order
+
+    def submit(chunk):
+        try:
+            future = pool.submit(_run_chunk, chunk, timeout, strategy)
+        except BrokenProcessPool as e:  # Broken by a chunk that has not been collected yet
+            future = Future()
+            future.set_exception(e)
+        pending.append((chunk, future))
+
+    def collect():
+        nonlocal pool
+        chunk, future = pending.popleft()
+        try:
+            return future.result()
+        except BrokenProcessPool:
+            pass
+        pool.shutdown(wait=False)
+        pool = ProcessPoolExecutor(workers, initializer=_install_alarm)
+        try:
+            rows = pool.submit(_run_chunk, chunk, timeout, strategy).result()
+        except BrokenProcessPool as e:
+            rows = _crashed(chunk, e)
+            pool.shutdown(wait=False)
+            pool = ProcessPoolExecutor(workers, initializer=_install_alarm)
+        for _ in range(len(pending)):
+            submit(pending.popleft()[0])
+        return rows
+
+    try:
+        for chunk in chunks:
+            submit(chunk)
+            if len(pending) >= 2 * workers:
+                yield from collect()
+        while pending:
+            yield from collect()
+    finally:
+        pool.shutdown(cancel_futures=True)
+
+
+def _percentile(ordered, fraction):
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def _report(latencies, statuses, seconds):
+    """Throughput and latency summary of a run."""
+    count = len(latencies)
+    if not count:
+        return "0 programs"
+    ordered = sorted(latencies)
+    counts = ', '.join(f"{status} {n}" for status, n in sorted(statuses.items()))
+    return (f"{count} programs in {seconds:.3f}s: {count / seconds:.1f} programs/s, "
+            f"latency p50 {_percentile(ordered, 0.5) * 1000:.3f}ms, "
+            f"p99 {_percentile(ordered, 0.99) * 1000:.3f}ms ({counts})")
+
+
+def _format(lineno, status, typ, result, seconds, output_format):
+    if output_format == 'json':
+        return json.dumps({'line': lineno, 'status': status, 'type': typ, 'result': result,
+                           'seconds': round(seconds, 6)}, ensure_ascii=False)
+    if status == 'ok':
+        return f"{lineno}\tok\t{result} : {typ}"
+    return f"{lineno}\t{status}\t{result}"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog='python -m files',
+        description="Type-check and evaluate programs, one per line, in parallel.")
+    parser.add_argument('input', nargs='?', default='-',
+                        help="file of programs, one per line ('-' for stdin, the default)")
+    parser.add_argument('-j', '--workers', type=int, default=None,
+                        help="number of worker processes (default: one per CPU)")
+    parser.add_argument('-t', '--timeout', type=float, default=None,
+                        help="seconds allowed per program (default: no limit)")
+    parser.add_argument('-f', '--format', choices=('text', 'json'), default='text',
+                        help="output format: tab-separated text or JSON lines")
+    parser.add_argument('-s', '--strategy', choices=('strict', 'lazy'), default='strict',
+                        help="evaluation strategy: call-by-value or call-by-need")
+    parser.add_argument('--chunk-size', type=int, default=64,
+                        help="programs sent to a worker at a time (default: 64)")
+    parser.add_argument('-q', '--quiet', action='store_true',
+                        help="do not print the throughput report to stderr")
+    args = parser.parse_args(argv)
+    if args.workers is not None and args.workers < 1:
+        parser.error("--workers must be at least 1")
+    if args.chunk_size < 1:
+        parser.error("--chunk-size must be at least 1")
+
+    source = sys.stdin if args.input == '-' else open(args.input, encoding='utf-8')
+    latencies = []
+    statuses = {}
+    start = time.perf_counter()
+    try:
+        for lineno, status, typ, result, seconds in run_programs(
+                source, args.workers, args.timeout, args.chunk_size, args.strategy):
+            print(_format(lineno, status, typ, result, seconds, args.format))
+            latencies.append(seconds)
+            statuses[status] = statuses.get(status, 0) + 1
+    finally:
+        if source is not sys.stdin:
+            source.close()
+    if not args.quiet:
+        print(_report(latencies, statuses, time.perf_counter() - start), file=sys.stderr)
+    return 0 if statuses.keys() <= {'ok'} else 1
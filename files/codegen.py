@@ -0,0 +1,379 @@
+# Python code generation backend: translate a type-checked program into a Python `ast`
+# module and compile it with compile(), so that it runs as ordinary Python bytecode.
+#
+# Values are native Python objects: Int and Bool are int and bool, a pair is a 2-tuple,
+# inl v and inr v are the tagged tuples ('inl', v) and ('inr', v), and a function is a
+# Python function. The type checker has already ruled out the errors that eval_expr
+# checks for at run time, so the generated code does no isinstance checks.
+#
+# An abstraction becomes a lambda, or a def when its body needs statements (let, case).
+# fix (λf. λx. e) becomes `def f(x)`, and when e calls f in tail position and creates
+# no closures, the call is turned into a jump: the body runs in a `while True` loop,
+# so tail-recursive loops run in constant stack space. A curried fix (λf. λx. λy. e)
+# whose e makes such calls with all of x and y, as loops with an accumulator do, gets
+# a `def f_loop(x, y)` holding the loop, and f is `def f(x): return lambda y:
+# f_loop(x, y)`. Other recursion uses the Python stack, like handwritten Python would,
+# and may raise RecursionError where eval_expr does not.
+import ast
+
+from .expressions import *
+from .value import *
+from .ifcondition import *
+from .binop import *
+from .conjuntiontypes import *
+from .disjunctions import *
+from .recursion import *
+from .letbinding import *
+from .interpreter import Env, eval_expr
+from .resolver import free_vars
+from .arena import _children
+
+_OPERATORS = {
+    '+': ast.Add, '-': ast.Sub, '*': ast.Mult, '/': ast.FloorDiv,
+    # Both operands are always evaluated, as in eval_expr; on bools & and | give bools
+    '&&': ast.BitAnd, '||': ast.BitOr,
+}
+_COMPARISONS = {'==': ast.Eq, '<': ast.Lt, '>': ast.Gt}
+
+
+class NativeFunction(Value):
+    """A function value produced by generated code."""
+    __slots__ = ('func',)
+    def __init__(self, func):
+        self.func = func
+
+    def __repr__(self):
+        return f"<python function {self.func.__name__}>"
+
+
+def _fix(func):
+    """fix for functions whose body is not itself an abstraction, unfolding on each call."""
+    def unfolded(arg):
+        return func(unfolded)(arg)
+    return func(unfolded)
+
+
+def to_native(value):
+    """Convert a value of the interpreter into the representation used by generated code."""
+    cls = type(value)
+    if cls is IntValue or cls is BoolValue:
+        return value.value
+    elif isinstance(value, Pair):
+        return (to_native(value.left), to_native(value.right))
+    elif isinstance(value, InlValue):
+        return ('inl', to_native(value.value))
+    elif isinstance(value, InrValue):
+        return ('inr', to_native(value.value))
+    elif isinstance(value, NativeFunction):
+        return value.func
+    elif isinstance(value, Closure):
+        def call(arg):
+            extended_env = Env(value.env)
+            extended_env.extend(value.param_name, from_native(arg))
+            return to_native(eval_expr(value.body, extended_env))
+        return call
+    raise TypeError(f"Cannot pass {value} to generated code")
+
+
+def from_native(value):
+    """Convert a value computed by generated code into a value of the interpreter."""
+    if type(value) is bool:
+        return BoolValue(value)
+    elif type(value) is int:
+        return IntValue(value)
+    elif type(value) is tuple:
+        if value[0] == 'inl':
+            return InlValue(from_native(value[1]))
+        elif value[0] == 'inr':
+            return InrValue(from_native(value[1]))
+        return Pair(from_native(value[0]), from_native(value[1]))
+    elif callable(value):
+        return NativeFunction(value)
+    raise TypeError(f"Unexpected value from generated code: {value!r}")
+
+
+def _load(name):
+    return ast.Name(name, ast.Load())
+
+
+def _assign(name, value):
+    return ast.Assign([ast.Name(name, ast.Store())], value)
+
+
+def _arguments(*params):
+    return ast.arguments(posonlyargs=[], args=[ast.arg(param) for param in params], vararg=None,
+                         kwonlyargs=[], kw_defaults=[], kwarg=None, defaults=[])
+
+
+def _creates_closures(expr):
+    stack = [expr]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, (Abs, Fix)):
+            return True
+        stack.extend(_children(node))
+    return False
+
+
+class _Function:
+    """The Python function being generated, for turning self tail calls into jumps."""
+    def __init__(self, name=None, params=(), loopable=False):
+        self.name = name          # Python name of the function, if it can call itself
+        self.params = params      # Python names of the parameters a self call passes
+        self.loopable = loopable  # Whether a self tail call may reassign the parameters
+        self.looped = False       # Whether one did
+
+
+def _self_call_args(expr, scope, function):
+    """The arguments of expr if it applies the function being generated to all its parameters, else None."""
+    args = []
+    while isinstance(expr, App) and len(args) < len(function.params):
+        args.append(expr.arg)
+        expr = expr.func
+    if len(args) == len(function.params) and isinstance(expr, Var) and scope.get(expr.name) == function.name:
+        return args[::-1]
+    return None
+
+
+class _Generator:
+    def __init__(self):
+        self.count = 0
+
+    def fresh(self, name):
+        """A Python name for a binder, unique in the whole module."""
+        self.count += 1
+        base = name if name.isidentifier() and name.isascii() else 'v'
+        return f"{base}_{self.count}"
+
+    # Expressions: each gives (statements to run first, Python expression)
+
+    def expr(self, expr, scope):
+        if isinstance(expr, Var):
+            if expr.name not in scope:
+                raise NameError(f"Variable '{expr.name}' is not instantiated in the environment")
+            return [], _load(scope[expr.name])
+
+        elif isinstance(expr, (IntValue, BoolValue)):
+            return [], ast.Constant(expr.value)
+
+        elif isinstance(expr, Abs):
+            param = self.fresh(expr.param_name)
+            inner = {**scope, expr.param_name: param}
+            stmts, body = self.expr(expr.body, inner)
+            if not stmts:
+                return [], ast.Lambda(_arguments(param), body)
+            name = self.fresh('_lambda')
+            return [ast.FunctionDef(name, _arguments(param), stmts + [ast.Return(body)], [], None, None)], _load(name)
+
+        elif isinstance(expr, App):
+            stmts, (func, arg) = self.sequence([expr.func, expr.arg], scope)
+            return stmts, ast.Call(func, [arg], [])
+
+        elif isinstance(expr, BinOp):
+            stmts, (left, right) = self.sequence([expr.left, expr.right], scope)
+            if expr.op in _OPERATORS:
+                return stmts, ast.BinOp(left, _OPERATORS[expr.op](), right)
+            elif expr.op in _COMPARISONS:
+                return stmts, ast.Compare(left, [_COMPARISONS[expr.op]()], [right])
+            raise TypeError(f"Unknown binary operation: {expr.op}")
+
+        elif isinstance(expr, Pair):
+            stmts, parts = self.sequence([expr.left, expr.right], scope)
+            return stmts, ast.Tuple(parts, ast.Load())
+
+        elif isinstance(expr, (Fst, Snd)):
+            stmts, pair = self.expr(expr.pair, scope)
+            return stmts, ast.Subscript(pair, ast.Constant(0 if isinstance(expr, Fst) else 1), ast.Load())
+
+        elif isinstance(expr, (Inl, Inr)):
+            stmts, value = self.expr(expr.value, scope)
+            tag = 'inl' if isinstance(expr, Inl) else 'inr'
+            return stmts, ast.Tuple([ast.Constant(tag), value], ast.Load())
+
+        elif isinstance(expr, If):
+            stmts, condition = self.expr(expr.condition, scope)
+            then_stmts, then_branch = self.expr(expr.then_branch, scope)
+            else_stmts, else_branch = self.expr(expr.else_branch, scope)
+            if not then_stmts and not else_stmts:
+                return stmts, ast.IfExp(condition, then_branch, else_branch)
+            result = self.fresh('_if')
+            stmts.append(ast.If(condition, then_stmts + [_assign(result, then_branch)],
+                                else_stmts + [_assign(result, else_branch)]))
+            return stmts, _load(result)
+
+        elif isinstance(expr, Case):
+            stmts, test, left_scope, right_scope = self.case(expr, scope)
+            left_stmts, left = self.expr(expr.left_case, left_scope)
+            right_stmts, right = self.expr(expr.right_case, right_scope)
+            if not left_stmts and not right_stmts:
+                return stmts, ast.IfExp(test, left, right)
+            result = self.fresh('_case')
+            stmts.append(ast.If(test, left_stmts + [_assign(result, left)],
+                                right_stmts + [_assign(result, right)]))
+            return stmts, _load(result)
+
+        elif isinstance(expr, Let):
+            stmts, value = self.expr(expr.value, scope)
+            name = self.fresh(expr.name)
+            stmts.append(_assign(name, value))
+            body_stmts, body = self.expr(expr.body, {**scope, expr.name: name})
+            return stmts + body_stmts, body
+
+        elif isinstance(expr, Fix):
+            func = expr.func
+            if isinstance(func, Abs) and isinstance(func.body, Abs):
+                name = self.fresh(func.param_name)
+                curried = self.curried_loop(name, func, scope)
+                if curried is not None:
+                    return curried, _load(name)
+                # fix (λf. λx. e): a def named f
+                param = self.fresh(func.body.param_name)
+                inner = {**scope, func.param_name: name, func.body.param_name: param}
+                body = func.body.body
+                function = _Function(name, (param,), loopable=not _creates_closures(body))
+                return [self.function(name, body, inner, function)], _load(name)
+            stmts, func_code = self.expr(func, scope)
+            return stmts, ast.Call(_load('_fix'), [func_code], [])
+
+        else:
+            raise TypeError(f"Unknown expression type: {expr}")
+
+    def sequence(self, exprs, scope):
+        """Code for exprs evaluated left to right: (statements, Python expressions)."""
+        stmts = []
+        codes = []
+        for expr in exprs:
+            expr_stmts, code = self.expr(expr, scope)
+            if expr_stmts:
+                # The earlier operands must be evaluated before these statements run
+                for i, earlier in enumerate(codes):
+                    if not isinstance(earlier, (ast.Name, ast.Constant)):
+                        temporary = self.fresh('_t')
+                        stmts.append(_assign(temporary, earlier))
+                        codes[i] = _load(temporary)
+                stmts.extend(expr_stmts)
+            codes.append(code)
+        return stmts, codes
+
+    def case(self, expr, scope):
+        """The scrutinee in a variable, the test for inl, and the scopes of the two branches."""
+        stmts, value = self.expr(expr.expr, scope)
+        if isinstance(value, ast.Name):
+            name = value.id
+        else:
+            name = self.fresh('_s')
+            stmts.append(_assign(name, value))
+        # 'a' and 'b' are bound to the whole injection, as in eval_expr
+        test = ast.Compare(ast.Subscript(_load(name), ast.Constant(0), ast.Load()),
+                           [ast.Eq()], [ast.Constant('inl')])
+        return stmts, test, {**scope, 'a': name}, {**scope, 'b': name}
+
+    # Statements for an expression in tail position, ending in return (or a jump)
+
+    def tail(self, expr, scope, function):
+        if isinstance(expr, If):
+            stmts, condition = self.expr(expr.condition, scope)
+            # The then branch ends in return, so the else branch needs no extra nesting
+            stmts.append(ast.If(condition, self.tail(expr.then_branch, scope, function), []))
+            return stmts + self.tail(expr.else_branch, scope, function)
+
+        elif isinstance(expr, Case):
+            stmts, test, left_scope, right_scope = self.case(expr, scope)
+            stmts.append(ast.If(test, self.tail(expr.left_case, left_scope, function), []))
+            return stmts + self.tail(expr.right_case, right_scope, function)
+
+        elif isinstance(expr, Let):
+            stmts, value = self.expr(expr.value, scope)
+            name = self.fresh(expr.name)
+            stmts.append(_assign(name, value))
+            return stmts + self.tail(expr.body, {**scope, expr.name: name}, function)
+
+        elif isinstance(expr, App) and function.loopable:
+            args = _self_call_args(expr, scope, function)
+            if args is not None:
+                # A self tail call: rebind the parameters and go round the loop
+                stmts, codes = self.sequence(args, scope)
+                function.looped = True
+                targets = ast.Tuple([ast.Name(param, ast.Store()) for param in function.params], ast.Store())
+                return stmts + [ast.Assign([targets], ast.Tuple(codes, ast.Load())), ast.Continue()]
+
+        stmts, code = self.expr(expr, scope)
+        return stmts + [ast.Return(code)]
+
+    def function(self, name, body, scope, function):
+        stmts = self.tail(body, scope, function)
+        if function.looped:
+            stmts = [ast.While(ast.Constant(True), stmts, [])]
+        return ast.FunctionDef(name, _arguments(*function.params), stmts, [], None, None)
+
+    def curried_loop(self, name, func, scope):
+        """
+        Statements defining name as fix func, for func = λf. λx1. ... λxn. e with n > 1,
+        where e creates no closures and calls f with n arguments in tail position: a
+        def of all the parameters holding the loop, and def name(x1) currying it. None
+        for any other func.
+        """
+        names = []
+        body = func.body
+        while isinstance(body, Abs):
+            names.append(body.param_name)
+            body = body.body
+        if len(names) < 2 or _creates_closures(body):
+            return None
+        params = [self.fresh(param_name) for param_name in names]
+        inner = {**scope, func.param_name: name, **dict(zip(names, params))}
+        loop = self.fresh(func.param_name + '_loop')
+        function = _Function(name, params, loopable=True)
+        definition = self.function(loop, body, inner, function)
+        if not function.looped:
+            return None
+        call = ast.Call(_load(loop), [_load(param) for param in params], [])
+        for param in reversed(params[1:]):
+            call = ast.Lambda(_arguments(param), call)
+        return [definition, ast.FunctionDef(name, _arguments(params[0]), [ast.Return(call)], [], None, None)]
+
+
+class PythonProgram:
+    """
+    A program compiled to Python. Calling it with an Env gives the same result as
+    eval_expr(expr, env), with function values as NativeFunction.
+    """
+    def __init__(self, module, free_names):
+        self.module = module            # The generated ast.Module
+        self.free_names = free_names    # Free variables, in the order of the parameters
+        namespace = {'_fix': _fix}
+        exec(compile(module, '<stlc>', 'exec'), namespace)
+        self.function = namespace['_program']  # The program, as a function of its free variables
+
+    @property
+    def source(self):
+        """The generated code as Python source."""
+        return ast.unparse(self.module)
+
+    def __call__(self, env):
+        return from_native(self.function(*[to_native(env.lookup(name)) for name in self.free_names]))
+
+
+def compile_python(expr):
+    """
+    Compile a (type-checked) expression into a PythonProgram, a function of an Env.
+
+    Raises ValueError if the program is nested too deeply for the Python compiler.
+    """
+    generator = _Generator()
+    try:
+        free_names = sorted(free_vars(expr))
+        scope = {name: generator.fresh(name) for name in free_names}
+        args = ast.arguments(posonlyargs=[], args=[ast.arg(scope[name]) for name in free_names],
+                             vararg=None, kwonlyargs=[], kw_defaults=[], kwarg=None, defaults=[])
+        body = generator.tail(expr, scope, _Function())
+        module = ast.Module([ast.FunctionDef('_program', args, body, [], None, None)], [])
+        ast.fix_missing_locations(module)
+        return PythonProgram(module, free_names)
+    except (RecursionError, MemoryError) as e:
+        raise ValueError("The program is nested too deeply for the Python backend") from e
+
+
+def run_python(expr, env):
+    """Compile an expression to Python and evaluate it in the given environment."""
+    return compile_python(expr)(env)
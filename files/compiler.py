@@ -0,0 +1,266 @@
+# Closure-compilation backend: turn an expression tree into nested Python closures once,
+# so that running it does not re-dispatch on the node type at every step.
+#
+# Applications in tail position (the end of a function body, through if and case
+# branches and let bodies) do not call the function: their code returns a (function,
+# argument) tuple, and the innermost enclosing non-tail application performs the call
+# in a loop. Values are never tuples, so tail-recursive functions run in constant
+# stack space.
+from .expressions import *
+from .value import *
+from .ifcondition import *
+from .binop import *
+from .conjuntiontypes import *
+from .disjunctions import *
+from .recursion import *
+from .interpreter import Env, eval_expr, fix_closure, unfold_fix
+from .resolver import *
+
+
+class FlatClosure(Closure):
+    """A compiled closure holding only the values of its free variables."""
+    __slots__ = ('flat_abs', 'captured', 'code', 'body_code')
+    def __init__(self, flat_abs, captured, code, body_code):
+        self.param_name = flat_abs.param_name
+        self.param_type = flat_abs.param_type
+        self.body = flat_abs.source.body  # The original body, for printing and eval_expr
+        self.flat_abs = flat_abs
+        self.captured = captured          # Values of the captured variables, in slot order
+        self.code = code                  # The compiled body, a function of a frame
+        self.body_code = body_code        # The same, but returning tail calls as tuples
+
+    def new_frame(self, arg):
+        """Build the frame for one application of the closure."""
+        frame = self.captured + [arg]
+        padding = self.flat_abs.frame_size - len(frame)
+        if padding:
+            frame.extend([None] * padding)
+        return frame
+
+    @property
+    def env(self):
+        """An Env holding the captured variables, so that eval_expr can apply the closure."""
+        env = Env()
+        env.env.update(zip(self.flat_abs.captured_names, self.captured))
+        return env
+
+
+def _division(a, b):
+    if b == 0:
+        raise ZeroDivisionError("Division by zero")
+    return a // b
+
+# Operator table: op -> (Python function on the raw values, result wrapper)
+BINOPS = {
+    '+': (lambda a, b: a + b, IntValue),
+    '-': (lambda a, b: a - b, IntValue),
+    '*': (lambda a, b: a * b, IntValue),
+    '/': (_division, IntValue),
+    '&&': (lambda a, b: a and b, BoolValue),
+    '||': (lambda a, b: a or b, BoolValue),
+    '==': (lambda a, b: a == b, BoolValue),
+    '<': (lambda a, b: a < b, BoolValue),
+    '>': (lambda a, b: a > b, BoolValue),
+}
+
+
+def _call(func, arg):
+    """Apply a function value to an argument, running tail calls until a value is produced."""
+    while True:
+        if isinstance(func, FlatClosure):
+            result = func.body_code(func.new_frame(arg))
+            if type(result) is not tuple:
+                return result
+            func, arg = result
+        elif isinstance(func, Closure):
+            # A closure built by eval_expr: fall back to the reference engine
+            extended_env = Env(func.env)
+            extended_env.extend(func.param_name, arg)
+            return eval_expr(func.body, extended_env)
+        else:
+            raise TypeError(f"Expected a function, but got {func}")
+
+
+def _fix(func):
+    """The fixed point of a function value of type (A → B) → (A → B)."""
+    if isinstance(func, FlatClosure) and isinstance(func.flat_abs.body, FlatAbs):
+        # Build the inner closure with the recursive function still unset, then point
+        # its captured copy of the outer parameter at the closure itself
+        closure = func.code(func.new_frame(None))
+        param_slot = len(func.captured)
+        for index, slot in enumerate(closure.flat_abs.captures):
+            if slot == param_slot:
+                closure.captured[index] = closure
+        return closure
+    elif isinstance(func, Closure):
+        if isinstance(func.body, Abs):
+            return fix_closure(func)
+        extended_env = Env(func.env)
+        extended_env.extend(func.param_name, unfold_fix(func))
+        return eval_expr(func.body, extended_env)
+    raise TypeError(f"fix expects a function, but got {func}")
+
+
+def _compile(expr, tail=False):
+    """Compile a resolved expression into a function of a frame. See above for tail."""
+
+    if isinstance(expr, LocalVar):
+        slot = expr.slot
+        def run(frame):
+            return frame[slot]
+        return run
+
+    elif isinstance(expr, FlatAbs):
+        captures = expr.captures
+        body_code = _compile(expr.body, True)
+        def code(frame):
+            result = body_code(frame)
+            if type(result) is tuple:
+                return _call(*result)
+            return result
+        def run(frame):
+            return FlatClosure(expr, [frame[slot] for slot in captures], code, body_code)
+        return run
+
+    elif isinstance(expr, App):
+        func_code = _compile(expr.func)
+        arg_code = _compile(expr.arg)
+        if tail:
+            def run(frame):
+                return (func_code(frame), arg_code(frame))
+            return run
+        def run(frame):
+            func = func_code(frame)
+            arg = arg_code(frame)
+            if isinstance(func, FlatClosure):
+                return func.code(func.new_frame(arg))
+            elif isinstance(func, Closure):
+                # A closure built by eval_expr: fall back to the reference engine
+                extended_env = Env(func.env)
+                extended_env.extend(func.param_name, arg)
+                return eval_expr(func.body, extended_env)
+            else:
+                raise TypeError(f"Expected a function, but got {func}")
+        return run
+
+    elif isinstance(expr, (IntValue, BoolValue)):
+        def run(frame):
+            return expr
+        return run
+
+    elif isinstance(expr, Pair):
+        left_code = _compile(expr.left)
+        right_code = _compile(expr.right)
+        def run(frame):
+            return Pair(left_code(frame), right_code(frame))
+        return run
+
+    elif isinstance(expr, Fst):
+        pair_code = _compile(expr.pair)
+        def run(frame):
+            pair_value = pair_code(frame)
+            if isinstance(pair_value, Pair):
+                return pair_value.left
+            raise TypeError("fst can only be applied to a pair.")
+        return run
+
+    elif isinstance(expr, Snd):
+        pair_code = _compile(expr.pair)
+        def run(frame):
+            pair_value = pair_code(frame)
+            if isinstance(pair_value, Pair):
+                return pair_value.right
+            raise TypeError("snd can only be applied to a pair.")
+        return run
+
+    elif isinstance(expr, Inl):
+        value_code = _compile(expr.value)
+        def run(frame):
+            return InlValue(value_code(frame))
+        return run
+
+    elif isinstance(expr, Inr):
+        value_code = _compile(expr.value)
+        def run(frame):
+            return InrValue(value_code(frame))
+        return run
+
+    elif isinstance(expr, FlatCase):
+        expr_code = _compile(expr.expr)
+        left_code = _compile(expr.left_case, tail)
+        right_code = _compile(expr.right_case, tail)
+        left_slot, right_slot = expr.left_slot, expr.right_slot
+        def run(frame):
+            disjunction_value = expr_code(frame)
+            if isinstance(disjunction_value, InlValue):
+                frame[left_slot] = disjunction_value
+                return left_code(frame)
+            elif isinstance(disjunction_value, InrValue):
+                frame[right_slot] = disjunction_value
+                return right_code(frame)
+            raise TypeError("Expected a disjunction (Inl or Inr).")
+        return run
+
+    elif isinstance(expr, If):
+        condition_code = _compile(expr.condition)
+        then_code = _compile(expr.then_branch, tail)
+        else_code = _compile(expr.else_branch, tail)
+        def run(frame):
+            condition_value = condition_code(frame)
+            if not isinstance(condition_value, BoolValue):
+                raise TypeError(f"Condition must evaluate to a Bool, but got {condition_value}")
+            if condition_value.value:
+                return then_code(frame)
+            return else_code(frame)
+        return run
+
+    elif isinstance(expr, FlatLet):
+        value_code = _compile(expr.value)
+        body_code = _compile(expr.body, tail)
+        slot = expr.slot
+        def run(frame):
+            frame[slot] = value_code(frame)
+            return body_code(frame)
+        return run
+
+    elif isinstance(expr, Fix):
+        func_code = _compile(expr.func)
+        def run(frame):
+            return _fix(func_code(frame))
+        return run
+
+    elif isinstance(expr, BinOp):
+        if expr.op not in BINOPS:
+            raise TypeError(f"Unknown binary operation: {expr.op}")
+        # Operator selection happens here, once, instead of on every evaluation
+        op, wrap = BINOPS[expr.op]
+        left_code = _compile(expr.left)
+        right_code = _compile(expr.right)
+        def run(frame):
+            return wrap(op(left_code(frame).value, right_code(frame).value))
+        return run
+
+    else:
+        raise TypeError(f"Unknown expression type: {expr}")
+
+
+def compile_expr(expr):
+    """
+    Compile a (type-checked) expression into a function of an Env.
+
+    The returned function gives the same result as eval_expr(expr, env). Variables are
+    resolved to frame slots at compile time; the free variables of expr are read from
+    the Env once, when the function is called.
+    """
+    program = resolve(expr)
+    body_code = _compile(program.body)
+    free_names = program.free_names
+    padding = [None] * (program.frame_size - len(free_names))
+    def run(env):
+        return body_code([env.lookup(name) for name in free_names] + padding)
+    return run
+
+
+def run_compiled(expr, env):
+    """Compile an expression and evaluate it in the given environment."""
+    return compile_expr(expr)(env)
@@ -2,6 +2,7 @@ from .expressions import *
 
 class Pair(Expr):
     """Represents a pair (A ∧ B)."""
+    __slots__ = ('left', 'right')
     def __init__(self, left, right):
         self.left = left
         self.right = right
@@ -11,6 +12,7 @@ class Pair(Expr):
 
 class Fst(Expr):
     """Represents the first projection from a pair (fst)."""
+    __slots__ = ('pair',)
     def __init__(self, pair):
         self.pair = pair
 
@@ -19,6 +21,7 @@ class Fst(Expr):
 
 class Snd(Expr):
     """Represents the second projection from a pair (snd)."""
+    __slots__ = ('pair',)
     def __init__(self, pair):
         self.pair = pair
 
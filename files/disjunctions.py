@@ -3,6 +3,7 @@ from .typechecker import *
 
 class Inl(Expr):
     """Represents the left injection (A ∨ B) where the value is of type A."""
+    __slots__ = ('value', 'typ')
     def __init__(self, value, disjunction_type):
         """
         Initialize the left injection.
@@ -22,6 +23,7 @@ class Inl(Expr):
 
 class Inr(Expr):
     """Represents the right injection (A ∨ B) where the value is of type B."""
+    __slots__ = ('value', 'typ')
     def __init__(self, value, disjunction_type):
         """
         Initialize the right injection.
@@ -37,6 +39,7 @@ class Inr(Expr):
 
 class Case(Expr):
     """Represents a case expression (for A ∨ B)."""
+    __slots__ = ('expr', 'left_case', 'right_case')
     def __init__(self, expr, left_case, right_case):
         self.expr = expr          # The disjunction expression
         self.left_case = left_case  # Case for the left type
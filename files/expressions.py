@@ -1,10 +1,11 @@
 # Define a class hierarchy for the expressions
 class Expr:
     """Base class for all expressions."""
-    pass
+    __slots__ = ()
 
 class Var(Expr):
     """A variable."""
+    __slots__ = ('name',)
     def __init__(self, name):
         self.name = name
     
@@ -13,6 +14,7 @@ class Var(Expr):
 
 class Abs(Expr):
     """A lambda abstraction (λx: T. E)."""
+    __slots__ = ('param_name', 'param_type', 'body')
     def __init__(self, param_name, param_type, body):
         self.param_name = param_name  # The parameter name as a string
         self.param_type = param_type  # The type of the parameter
@@ -23,6 +25,7 @@ class Abs(Expr):
 
 class App(Expr):
     """A function application (E1 E2)."""
+    __slots__ = ('func', 'arg')
     def __init__(self, func, arg):
         self.func = func  # The function being applied
         self.arg = arg    # The argument being applied to the function
@@ -0,0 +1,25 @@
+# Fuel-bounded evaluation that can be paused and resumed, for running programs that may
+# not terminate.
+#
+# The CEK machine of machine.py keeps its state (control, environment, continuation
+# stack) in an Evaluation object, so run(fuel) can stop after a number of steps and a
+# later call can carry on from there; eval_machine is the same machine run to the end.
+# A step is one decomposition of the control or one continuation frame, so every step
+# does a bounded amount of work (except applying a BinOp to huge integers, which
+# max_int_bits prevents), and a program that loops uses up any budget.
+from .machine import Evaluation
+
+
+class OutOfFuel(RuntimeError):
+    """Raised by eval_fuel when the program has not finished within its fuel."""
+    def __init__(self, steps):
+        super().__init__(f"Out of fuel after {steps} steps")
+        self.steps = steps
+
+
+def eval_fuel(expr, env, fuel):
+    """Evaluate like eval_machine, but raise OutOfFuel if it takes more than fuel steps."""
+    evaluation = Evaluation(expr, env)
+    if not evaluation.run(fuel):
+        raise OutOfFuel(evaluation.steps)
+    return evaluation.value
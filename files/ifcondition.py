@@ -2,6 +2,7 @@ from .expressions import *
 
 class If(Expr):
     """Represents an if-then-else expression."""
+    __slots__ = ('condition', 'then_branch', 'else_branch')
     def __init__(self, condition, then_branch, else_branch):
         self.condition = condition
         self.then_branch = then_branch
@@ -16,139 +16,237 @@ class Env:
 
     def lookup(self, var):
         """Look up the value of a variable in the current or parent environment."""
-        if var in self.env:
-            return self.env[var]
-        elif self.parent:
-            return self.parent.lookup(var)
-        else:
-            raise NameError(f"Variable '{var}' is not instantiated in the environment")
+        env = self
+        while env is not None:
+            if var in env.env:
+                return env.env[var]
+            env = env.parent
+        raise NameError(f"Variable '{var}' is not instantiated in the environment")
+
+
+class EvalHooks:
+    """
+    Instrumentation for eval_expr. Given hooks, eval_expr calls enter and leave around
+    each of its recursive calls, visit on every node it evaluates and call when it
+    enters a closure's body (frame being what enter returned), and lets the other
+    methods do the work of looking up variables and making closures. The methods here
+    only do that work; a subclass overrides them to observe it (see profiler.py).
+    """
+    def enter(self):
+        return None
+
+    def leave(self, frame):
+        pass
+
+    def visit(self, expr):
+        pass
+
+    def call(self, closure, frame):
+        pass
+
+    def lookup(self, env, name):
+        return env.lookup(name)
+
+    def closure(self, abs_node, env):
+        return Closure(abs_node.param_name, abs_node.param_type, abs_node.body, env)
+
+    def fix_closure(self, func):
+        return fix_closure(func)
+
+    def unfold_fix(self, func):
+        return unfold_fix(func)
 
 
 # Interpreter function
-def eval_expr(expr, env):
-    """Evaluate an expression in a given environment."""
-    
-    if isinstance(expr, Var):
-        return env.lookup(expr.name)
-
-    elif isinstance(expr, Abs):
-        return Closure(expr.param_name, expr.param_type, expr.body, env)
-
-    elif isinstance(expr, App):
-        func = eval_expr(expr.func, env)
-        arg = eval_expr(expr.arg, env)
-
-        if isinstance(func, Abs):
-            func = eval_expr(func, env)
-
-        if isinstance(func, Closure):
-            extended_env = Env(func.env)
-            extended_env.extend(func.param_name, arg)
-            return eval_expr(func.body, extended_env)
-        else:
-            raise TypeError(f"Expected a function, but got {func}")
-
-    elif isinstance(expr, IntValue):
-        return expr
-
-    elif isinstance(expr, BoolValue):
-        return expr
-
-    elif isinstance(expr, Pair):
-        # Evaluate both components of the pair
-        left_value = eval_expr(expr.left, env)
-        right_value = eval_expr(expr.right, env)
-        return Pair(left_value, right_value)
-
-    elif isinstance(expr, Fst):
-        # Evaluate the pair and extract the first element
-        pair_value = eval_expr(expr.pair, env)
-        if isinstance(pair_value, Pair):
-            return pair_value.left
-        else:
-            raise TypeError("fst can only be applied to a pair.")
-
-    elif isinstance(expr, Snd):
-        # Evaluate the pair and extract the second element
-        pair_value = eval_expr(expr.pair, env)
-        if isinstance(pair_value, Pair):
-            return pair_value.right
-        else:
-            raise TypeError("snd can only be applied to a pair.")
-
-    elif isinstance(expr, Inl):
-        # Evaluate the value and wrap it in Inl
-        value = eval_expr(expr.value, env)
-        return InlValue(value)
-
-    elif isinstance(expr, Inr):
-        # Evaluate the value and wrap it in Inr
-        value = eval_expr(expr.value, env)
-        return InrValue(value)
-
-    elif isinstance(expr, Case):
-        disjunction_value = eval_expr(expr.expr, env)
-
-        if isinstance(disjunction_value, InlValue):
-            # Extend environment with the variable bound to the left value
-            extended_env = Env(env)
-            extended_env.extend('a', disjunction_value)
-            return eval_expr(expr.left_case, extended_env)
-
-        elif isinstance(disjunction_value, InrValue):
-            # Extend environment with the variable bound to the right value
-            extended_env = Env(env)
-            extended_env.extend('b', disjunction_value)
-            return eval_expr(expr.right_case, extended_env)
-
-        else:
-            raise TypeError("Expected a disjunction (Inl or Inr).")
-
-    elif isinstance(expr, If):
-        condition_value = eval_expr(expr.condition, env)
-
-        if not isinstance(condition_value, BoolValue):
-            raise TypeError(f"Condition must evaluate to a Bool, but got {condition_value}")
-
-        if condition_value.value:
-            return eval_expr(expr.then_branch, env)
-        else:
-            return eval_expr(expr.else_branch, env)
-
-    elif isinstance(expr, BinOp):
-        left_value = eval_expr(expr.left, env)
-        right_value = eval_expr(expr.right, env)
-
-        if expr.op in ['+', '-', '*', '/']:
-            if isinstance(left_value, IntValue) and isinstance(right_value, IntValue):
-                if expr.op == '+':
-                    return IntValue(left_value.value + right_value.value)
-                elif expr.op == '-':
-                    return IntValue(left_value.value - right_value.value)
-                elif expr.op == '*':
-                    return IntValue(left_value.value * right_value.value)
-                elif expr.op == '/':
-                    if right_value.value == 0:
-                        raise ZeroDivisionError("Division by zero")
-                    return IntValue(left_value.value // right_value.value)
-
-        elif expr.op in ['&&', '||']:
-            if isinstance(left_value, BoolValue) and isinstance(right_value, BoolValue):
-                if expr.op == '&&':
-                    return BoolValue(left_value.value and right_value.value)
-                elif expr.op == '||':
-                    return BoolValue(left_value.value or right_value.value)
-
-        elif expr.op in ['==', '<', '>']:
-            if isinstance(left_value, IntValue) and isinstance(right_value, IntValue):
-                if expr.op == '==':
-                    return BoolValue(left_value.value == right_value.value)
-                elif expr.op == '<':
-                    return BoolValue(left_value.value < right_value.value)
-                elif expr.op == '>':
-                    return BoolValue(left_value.value > right_value.value)
-
-        raise TypeError(f"Invalid operands for binary operation: {expr.op}")
-
-    else:
-        raise TypeError(f"Unknown expression type: {expr}")
+def eval_expr(expr, env, hooks=None):
+    """
+    Evaluate an expression in a given environment.
+
+    Calls in tail position (the body of an applied function, the branches of if and
+    case, and the body of a let) continue the loop below instead of recursing, so
+    tail-recursive functions built with fix run in constant stack space.
+
+    hooks, an EvalHooks, is told about every step; without it, the instrumentation
+    costs a test per node.
+    """
+    if hooks is not None:
+        frame = hooks.enter()
+    try:
+        while True:
+            if hooks is not None:
+                hooks.visit(expr)
+
+            if isinstance(expr, Var):
+                return env.lookup(expr.name) if hooks is None else hooks.lookup(env, expr.name)
+
+            elif isinstance(expr, Abs):
+                if hooks is not None:
+                    return hooks.closure(expr, env)
+                return Closure(expr.param_name, expr.param_type, expr.body, env)
+
+            elif isinstance(expr, App):
+                func = eval_expr(expr.func, env, hooks)
+                arg = eval_expr(expr.arg, env, hooks)
+
+                if isinstance(func, Abs):
+                    func = eval_expr(func, env, hooks)
+
+                if isinstance(func, Closure):
+                    if hooks is not None:
+                        hooks.call(func, frame)
+                    env = Env(func.env)
+                    env.extend(func.param_name, arg)
+                    expr = func.body
+                    continue
+                else:
+                    raise TypeError(f"Expected a function, but got {func}")
+
+            elif isinstance(expr, IntValue):
+                return expr
+
+            elif isinstance(expr, BoolValue):
+                return expr
+
+            elif isinstance(expr, Pair):
+                # Evaluate both components of the pair
+                left_value = eval_expr(expr.left, env, hooks)
+                right_value = eval_expr(expr.right, env, hooks)
+                return Pair(left_value, right_value)
+
+            elif isinstance(expr, Fst):
+                # Evaluate the pair and extract the first element
+                pair_value = eval_expr(expr.pair, env, hooks)
+                if isinstance(pair_value, Pair):
+                    return pair_value.left
+                else:
+                    raise TypeError("fst can only be applied to a pair.")
+
+            elif isinstance(expr, Snd):
+                # Evaluate the pair and extract the second element
+                pair_value = eval_expr(expr.pair, env, hooks)
+                if isinstance(pair_value, Pair):
+                    return pair_value.right
+                else:
+                    raise TypeError("snd can only be applied to a pair.")
+
+            elif isinstance(expr, Inl):
+                # Evaluate the value and wrap it in Inl
+                value = eval_expr(expr.value, env, hooks)
+                return InlValue(value)
+
+            elif isinstance(expr, Inr):
+                # Evaluate the value and wrap it in Inr
+                value = eval_expr(expr.value, env, hooks)
+                return InrValue(value)
+
+            elif isinstance(expr, Case):
+                disjunction_value = eval_expr(expr.expr, env, hooks)
+
+                if isinstance(disjunction_value, InlValue):
+                    # Extend environment with the variable bound to the left value
+                    env = Env(env)
+                    env.extend('a', disjunction_value)
+                    expr = expr.left_case
+                    continue
+
+                elif isinstance(disjunction_value, InrValue):
+                    # Extend environment with the variable bound to the right value
+                    env = Env(env)
+                    env.extend('b', disjunction_value)
+                    expr = expr.right_case
+                    continue
+
+                else:
+                    raise TypeError("Expected a disjunction (Inl or Inr).")
+
+            elif isinstance(expr, If):
+                condition_value = eval_expr(expr.condition, env, hooks)
+
+                if not isinstance(condition_value, BoolValue):
+                    raise TypeError(f"Condition must evaluate to a Bool, but got {condition_value}")
+
+                if condition_value.value:
+                    expr = expr.then_branch
+                else:
+                    expr = expr.else_branch
+                continue
+
+            elif isinstance(expr, BinOp):
+                left_value = eval_expr(expr.left, env, hooks)
+                right_value = eval_expr(expr.right, env, hooks)
+
+                if expr.op in ['+', '-', '*', '/']:
+                    if isinstance(left_value, IntValue) and isinstance(right_value, IntValue):
+                        if expr.op == '+':
+                            return IntValue(left_value.value + right_value.value)
+                        elif expr.op == '-':
+                            return IntValue(left_value.value - right_value.value)
+                        elif expr.op == '*':
+                            return IntValue(left_value.value * right_value.value)
+                        elif expr.op == '/':
+                            if right_value.value == 0:
+                                raise ZeroDivisionError("Division by zero")
+                            return IntValue(left_value.value // right_value.value)
+
+                elif expr.op in ['&&', '||']:
+                    if isinstance(left_value, BoolValue) and isinstance(right_value, BoolValue):
+                        if expr.op == '&&':
+                            return BoolValue(left_value.value and right_value.value)
+                        elif expr.op == '||':
+                            return BoolValue(left_value.value or right_value.value)
+
+                elif expr.op in ['==', '<', '>']:
+                    if isinstance(left_value, IntValue) and isinstance(right_value, IntValue):
+                        if expr.op == '==':
+                            return BoolValue(left_value.value == right_value.value)
+                        elif expr.op == '<':
+                            return BoolValue(left_value.value < right_value.value)
+                        elif expr.op == '>':
+                            return BoolValue(left_value.value > right_value.value)
+
+                raise TypeError(f"Invalid operands for binary operation: {expr.op}")
+
+            elif isinstance(expr, Let):
+                value = eval_expr(expr.value, env, hooks)
+                env = Env(env)
+                env.extend(expr.name, value)
+                expr = expr.body
+                continue
+
+            elif isinstance(expr, Fix):
+                func = eval_expr(expr.func, env, hooks)
+                if not isinstance(func, Closure):
+                    raise TypeError(f"fix expects a function, but got {func}")
+                if isinstance(func.body, Abs):
+                    return fix_closure(func) if hooks is None else hooks.fix_closure(func)
+                # A body that is not an abstraction is evaluated, with the recursive
+                # function unfolded on demand
+                env = Env(func.env)
+                env.extend(func.param_name, unfold_fix(func) if hooks is None else hooks.unfold_fix(func))
+                expr = func.body
+                continue
+
+            else:
+                raise TypeError(f"Unknown expression type: {expr}")
+    finally:
+        if hooks is not None:
+            hooks.leave(frame)
+
+
+def fix_closure(func):
+    """
+    The fixed point of a closure λf: A → B. λx: A. E: the closure λx: A. E in an
+    environment that binds f to that closure itself.
+    """
+    body = func.body
+    env = Env(func.env)
+    closure = Closure(body.param_name, body.param_type, body.body, env)
+    env.extend(func.param_name, closure)
+    return closure
+
+
+def unfold_fix(func):
+    """The closure λx: A. (fix F) x, where F is bound to func, which has type (A → B) → (A → B)."""
+    env = Env()
+    env.extend('F', func)
+    return Closure('x', func.param_type.param_type, App(Fix(Var('F')), Var('x')), env)
@@ -0,0 +1,225 @@
+# Call-by-need evaluation. Function arguments, let-bound values, pair components and
+# injected values are not evaluated where they appear but wrapped in thunks, which are
+# evaluated the first time their value is needed and then remember it. A value that is
+# never needed is never computed, and one that is needed many times is computed once.
+#
+# For a program that terminates without an error under eval_expr, eval_lazy gives the
+# same result. It may also succeed where eval_expr fails, when the failing part (e.g. a
+# division by zero) is never needed.
+import threading
+
+from .expressions import *
+from .value import *
+from .ifcondition import *
+from .binop import *
+from .conjuntiontypes import *
+from .disjunctions import *
+from .recursion import *
+from .letbinding import *
+from .interpreter import Env, eval_expr, fix_closure, unfold_fix
+from .machine import apply_binop
+
+
+# Forces nested inside one another before the innermost is suspended, see Thunk.force
+MAX_NESTED_FORCES = 100
+
+_forces = threading.local()  # .nested: forces in progress in this thread
+
+
+class _Suspended(Exception):
+    """Raised by a force nested too deeply, for the outermost force to evaluate thunk first."""
+    def __init__(self, thunk):
+        super().__init__()
+        self.thunk = thunk
+
+
+class Thunk:
+    """A suspended evaluation of expr in env, forced at most once."""
+    __slots__ = ('expr', 'env', 'value')
+    def __init__(self, expr, env):
+        self.expr = expr
+        self.env = env
+        self.value = None
+
+    def force(self):
+        """
+        Evaluate the expression on first use; afterwards return the remembered value.
+
+        A force inside another evaluates right away, up to MAX_NESTED_FORCES deep. Beyond
+        that it is suspended: the outermost force pushes the thunk on an explicit stack,
+        forces it, and then evaluates again the thunks that needed it, which is safe as
+        evaluation has no effects. A chain of thunks of any shape, such as the one for
+        (n * 1) + acc that a loop accumulating in an argument builds, is so forced from
+        the innermost thunk out, in constant Python stack depth.
+        """
+        if self.expr is None:
+            return self.value
+        nested = getattr(_forces, 'nested', 0)
+        if nested:
+            if nested >= MAX_NESTED_FORCES:
+                raise _Suspended(self)
+            _forces.nested = nested + 1
+            try:
+                self.value = _eval(self.expr, self.env)
+            finally:
+                _forces.nested = nested
+            self.expr = self.env = None  # The environment is no longer needed
+            return self.value
+
+        stack = [self]
+        forcing = {id(self)}
+        _forces.nested = 1
+        try:
+            while stack:
+                top = stack[-1]
+                if top.expr is None:
+                    stack.pop()
+                    continue
+                try:
+                    top.value = _eval(top.expr, top.env)
+                except _Suspended as suspended:
+                    if id(suspended.thunk) in forcing:
+                        raise RecursionError("A thunk needs its own value") from None
+                    stack.append(suspended.thunk)
+                    forcing.add(id(suspended.thunk))
+                    continue
+                top.expr = top.env = None
+                stack.pop()
+        finally:
+            _forces.nested = 0
+        return self.value
+
+    def __repr__(self):
+        return f"<thunk {self.expr}>" if self.expr is not None else f"<thunk = {self.value}>"
+
+
+def _force(value):
+    return value.force() if type(value) is Thunk else value
+
+
+def _delay(expr, env):
+    """A thunk for expr, or its value if that can be had without doing any work."""
+    cls = type(expr)
+    if cls is Var:
+        return env.lookup(expr.name)  # Share the variable's thunk instead of wrapping it
+    elif cls is IntValue or cls is BoolValue:
+        return expr
+    elif cls is Abs:
+        return Closure(expr.param_name, expr.param_type, expr.body, env)
+    return Thunk(expr, env)
+
+
+def _eval(expr, env):
+    """Evaluate expr to weak head normal form: pairs and injections may hold thunks."""
+
+    while True:
+        if isinstance(expr, Var):
+            return _force(env.lookup(expr.name))
+
+        elif isinstance(expr, (IntValue, BoolValue)):
+            return expr
+
+        elif isinstance(expr, Abs):
+            return Closure(expr.param_name, expr.param_type, expr.body, env)
+
+        elif isinstance(expr, App):
+            func = _eval(expr.func, env)
+            if not isinstance(func, Closure):
+                raise TypeError(f"Expected a function, but got {func}")
+            arg = _delay(expr.arg, env)
+            env = Env(func.env)
+            env.extend(func.param_name, arg)
+            expr = func.body
+
+        elif isinstance(expr, Let):
+            value = _delay(expr.value, env)
+            env = Env(env)
+            env.extend(expr.name, value)
+            expr = expr.body
+
+        elif isinstance(expr, BinOp):
+            return apply_binop(expr.op, _eval(expr.left, env), _eval(expr.right, env))
+
+        elif isinstance(expr, If):
+            condition_value = _eval(expr.condition, env)
+            if not isinstance(condition_value, BoolValue):
+                raise TypeError(f"Condition must evaluate to a Bool, but got {condition_value}")
+            expr = expr.then_branch if condition_value.value else expr.else_branch
+
+        elif isinstance(expr, Pair):
+            return Pair(_delay(expr.left, env), _delay(expr.right, env))
+
+        elif isinstance(expr, Fst):
+            pair_value = _eval(expr.pair, env)
+            if not isinstance(pair_value, Pair):
+                raise TypeError("fst can only be applied to a pair.")
+            return _force(pair_value.left)
+
+        elif isinstance(expr, Snd):
+            pair_value = _eval(expr.pair, env)
+            if not isinstance(pair_value, Pair):
+                raise TypeError("snd can only be applied to a pair.")
+            return _force(pair_value.right)
+
+        elif isinstance(expr, Inl):
+            return InlValue(_delay(expr.value, env))
+
+        elif isinstance(expr, Inr):
+            return InrValue(_delay(expr.value, env))
+
+        elif isinstance(expr, Case):
+            disjunction_value = _eval(expr.expr, env)
+            env = Env(env)
+            if isinstance(disjunction_value, InlValue):
+                env.extend('a', disjunction_value)
+                expr = expr.left_case
+            elif isinstance(disjunction_value, InrValue):
+                env.extend('b', disjunction_value)
+                expr = expr.right_case
+            else:
+                raise TypeError("Expected a disjunction (Inl or Inr).")
+
+        elif isinstance(expr, Fix):
+            func = _eval(expr.func, env)
+            if not isinstance(func, Closure):
+                raise TypeError(f"fix expects a function, but got {func}")
+            if isinstance(func.body, Abs):
+                return fix_closure(func)
+            env = Env(func.env)
+            env.extend(func.param_name, unfold_fix(func))
+            expr = func.body
+
+        else:
+            raise TypeError(f"Unknown expression type: {expr}")
+
+
+def _force_all(value):
+    """Force the thunks inside pairs and injections, giving the value eval_expr would."""
+    value = _force(value)
+    if isinstance(value, Pair):
+        return Pair(_force_all(value.left), _force_all(value.right))
+    elif isinstance(value, InlValue):
+        return InlValue(_force_all(value.value))
+    elif isinstance(value, InrValue):
+        return InrValue(_force_all(value.value))
+    return value
+
+
+def eval_lazy(expr, env):
+    """
+    Evaluate an expression call-by-need in a given environment.
+
+    The components of the resulting pairs and injections are evaluated too, so the
+    result compares like the one of eval_expr. Closures in the result capture thunks
+    and must be applied with eval_lazy.
+    """
+    return _force_all(_eval(expr, env))
+
+
+def evaluate(expr, env, strategy='strict'):
+    """Evaluate with eval_expr ('strict') or eval_lazy ('lazy')."""
+    if strategy == 'strict':
+        return eval_expr(expr, env)
+    elif strategy == 'lazy':
+        return eval_lazy(expr, env)
+    raise ValueError(f"Unknown evaluation strategy: {strategy!r}")
@@ -0,0 +1,12 @@
+from .expressions import *
+
+class Let(Expr):
+    """A local definition (let x = E1 in E2), evaluating E1 once and sharing its value."""
+    __slots__ = ('name', 'value', 'body')
+    def __init__(self, name, value, body):
+        self.name = name    # The bound variable name as a string
+        self.value = value  # The expression bound to the name
+        self.body = body    # The expression in which the name is bound
+
+    def __repr__(self):
+        return f"(let {self.name} = {self.value} in {self.body})"
@@ -19,9 +19,6 @@ class AndType(Type):
     def __repr__(self):
         return f"({self.left} ∧ {self.right})"
 
-    def __eq__(self, other):
-        return isinstance(other, AndType) and self.left == other.left and self.right == other.right
-
 class OrType(Type):
     """Represents a disjunction type (A ∨ B)."""
     def __init__(self, left_type, right_type):
@@ -32,6 +29,3 @@ class OrType(Type):
 
     def __repr__(self):
         return f"({self.left} ∨ {self.right})"
-
-    def __eq__(self, other):
-        return isinstance(other, OrType) and self.left == other.left and self.right == other.right
@@ -0,0 +1,260 @@
+# Iterative CEK-style abstract machine: the control is the expression being evaluated,
+# the environment an Env, and the continuation an explicit stack of frames, so the depth
+# of the evaluated term is not limited by Python's recursion limit. The machine's state
+# lives in an Evaluation, which can also be run a number of steps at a time (fuel.py).
+import time
+
+from .expressions import *
+from .value import *
+from .ifcondition import *
+from .binop import *
+from .conjuntiontypes import *
+from .disjunctions import *
+from .recursion import *
+from .letbinding import *
+from .interpreter import Env, fix_closure, unfold_fix
+
+# Continuation frame tags
+APP_ARG, APP_CALL, PAIR_RIGHT, PAIR_MAKE, FST, SND, INL, INR, CASE, IF, BINOP_RIGHT, BINOP_APPLY, FIX, LET = range(14)
+
+# Steps between looks at the clock when Evaluation.run has a deadline
+DEADLINE_INTERVAL = 1000
+
+# Operator table: op -> (operand class, Python function on the raw values, result wrapper)
+MACHINE_BINOPS = {
+    '+': (IntValue, lambda a, b: a + b, IntValue),
+    '-': (IntValue, lambda a, b: a - b, IntValue),
+    '*': (IntValue, lambda a, b: a * b, IntValue),
+    '/': (IntValue, lambda a, b: a // b, IntValue),
+    '&&': (BoolValue, lambda a, b: a and b, BoolValue),
+    '||': (BoolValue, lambda a, b: a or b, BoolValue),
+    '==': (IntValue, lambda a, b: a == b, BoolValue),
+    '<': (IntValue, lambda a, b: a < b, BoolValue),
+    '>': (IntValue, lambda a, b: a > b, BoolValue),
+}
+
+
+def apply_binop(op, left_value, right_value):
+    """Apply a binary operator to two evaluated operands."""
+    if op in MACHINE_BINOPS:
+        operand, fn, wrap = MACHINE_BINOPS[op]
+        if isinstance(left_value, operand) and isinstance(right_value, operand):
+            if op == '/' and right_value.value == 0:
+                raise ZeroDivisionError("Division by zero")
+            return wrap(fn(left_value.value, right_value.value))
+    raise TypeError(f"Invalid operands for binary operation: {op}")
+
+
+def bounded_binop(max_bits):
+    """
+    apply_binop, but raising OverflowError instead of computing an Int that could have
+    more than max_bits bits, so no single operation takes long.
+    """
+    def apply(op, left_value, right_value):
+        if op in ('+', '-', '*') and isinstance(left_value, IntValue) and isinstance(right_value, IntValue):
+            left_bits, right_bits = left_value.value.bit_length(), right_value.value.bit_length()
+            bits = left_bits + right_bits if op == '*' else max(left_bits, right_bits) + 1
+            if bits > max_bits:
+                raise OverflowError(f"Result of {op} could have more than {max_bits} bits")
+        return apply_binop(op, left_value, right_value)
+    return apply
+
+
+class Evaluation:
+    """
+    The machine evaluating expr in env, run in installments with run(fuel): the state
+    (control, environment, continuation stack) is kept in the object, so run can stop
+    after a number of steps and a later call carries on from there. A step is one
+    decomposition of the control or one continuation frame.
+
+    With max_int_bits, an operation whose Int result could be longer raises
+    OverflowError (see bounded_binop).
+    """
+    def __init__(self, expr, env=None, max_int_bits=None):
+        self.control = expr
+        self.env = Env() if env is None else env
+        self.stack = []          # Continuation frames
+        self.value = None        # The result once done, else the value being returned
+        self.evaluating = True   # Whether the next step decomposes control or pops a frame
+        self.done = False
+        self.steps = 0           # Steps taken so far
+        self.apply_binop = apply_binop if max_int_bits is None else bounded_binop(max_int_bits)
+
+    def run(self, fuel=None, deadline=None):
+        """
+        Take at most fuel more steps (no limit if None), stopping early once time.monotonic()
+        passes deadline, if given. Returns True once the value is known.
+        """
+        if self.done:
+            return True
+        stack = self.stack
+        push = stack.append
+        pop = stack.pop
+        control, env, value = self.control, self.env, self.value
+        steps = self.steps
+        stop = -1 if fuel is None else steps + fuel
+        limit = stop if deadline is None else self._next_limit(steps, stop)
+        binop = self.apply_binop
+        evaluating = self.evaluating
+
+        while True:
+            if evaluating:
+                # Eval mode: decompose the control until it produces a value
+                while True:
+                    if steps == limit:
+                        if limit == stop or time.monotonic() > deadline:
+                            self.control, self.env, self.value, self.evaluating, self.steps = control, env, value, True, steps
+                            return False
+                        limit = self._next_limit(steps, stop)
+                    steps += 1
+                    cls = type(control)
+                    if cls is Var:
+                        value = env.lookup(control.name)
+                        break
+                    elif cls is IntValue or cls is BoolValue:
+                        value = control
+                        break
+                    elif cls is Abs:
+                        value = Closure(control.param_name, control.param_type, control.body, env)
+                        break
+                    elif cls is App:
+                        push((APP_ARG, control.arg, env))
+                        control = control.func
+                    elif cls is BinOp:
+                        push((BINOP_RIGHT, control.op, control.right, env))
+                        control = control.left
+                    elif cls is If:
+                        push((IF, control, env))
+                        control = control.condition
+                    elif cls is Pair:
+                        push((PAIR_RIGHT, control.right, env))
+                        control = control.left
+                    elif cls is Fst:
+                        push((FST,))
+                        control = control.pair
+                    elif cls is Snd:
+                        push((SND,))
+                        control = control.pair
+                    elif cls is Inl:
+                        push((INL,))
+                        control = control.value
+                    elif cls is Inr:
+                        push((INR,))
+                        control = control.value
+                    elif cls is Case:
+                        push((CASE, control, env))
+                        control = control.expr
+                    elif cls is Fix:
+                        push((FIX,))
+                        control = control.func
+                    elif cls is Let:
+                        push((LET, control, env))
+                        control = control.value
+                    else:
+                        raise TypeError(f"Unknown expression type: {control}")
+                evaluating = False
+
+            # Continue mode: feed the value to the frames until one needs more evaluation
+            while stack:
+                if steps == limit:
+                    if limit == stop or time.monotonic() > deadline:
+                        self.control, self.env, self.value, self.evaluating, self.steps = control, env, value, False, steps
+                        return False
+                    limit = self._next_limit(steps, stop)
+                steps += 1
+                frame = pop()
+                tag = frame[0]
+                if tag == BINOP_RIGHT:
+                    push((BINOP_APPLY, frame[1], value))
+                    control, env = frame[2], frame[3]
+                    break
+                elif tag == BINOP_APPLY:
+                    value = binop(frame[1], frame[2], value)
+                elif tag == APP_ARG:
+                    push((APP_CALL, value))
+                    control, env = frame[1], frame[2]
+                    break
+                elif tag == APP_CALL:
+                    func = frame[1]
+                    if not isinstance(func, Closure):
+                        raise TypeError(f"Expected a function, but got {func}")
+                    env = Env(func.env)
+                    env.env[func.param_name] = value
+                    control = func.body
+                    break
+                elif tag == IF:
+                    if not isinstance(value, BoolValue):
+                        raise TypeError(f"Condition must evaluate to a Bool, but got {value}")
+                    if_expr, env = frame[1], frame[2]
+                    control = if_expr.then_branch if value.value else if_expr.else_branch
+                    break
+                elif tag == PAIR_RIGHT:
+                    push((PAIR_MAKE, value))
+                    control, env = frame[1], frame[2]
+                    break
+                elif tag == PAIR_MAKE:
+                    value = Pair(frame[1], value)
+                elif tag == FST:
+                    if not isinstance(value, Pair):
+                        raise TypeError("fst can only be applied to a pair.")
+                    value = value.left
+                elif tag == SND:
+                    if not isinstance(value, Pair):
+                        raise TypeError("snd can only be applied to a pair.")
+                    value = value.right
+                elif tag == INL:
+                    value = InlValue(value)
+                elif tag == INR:
+                    value = InrValue(value)
+                elif tag == CASE:
+                    case_expr = frame[1]
+                    env = Env(frame[2])
+                    if isinstance(value, InlValue):
+                        env.env['a'] = value
+                        control = case_expr.left_case
+                    elif isinstance(value, InrValue):
+                        env.env['b'] = value
+                        control = case_expr.right_case
+                    else:
+                        raise TypeError("Expected a disjunction (Inl or Inr).")
+                    break
+                elif tag == LET:
+                    let_expr = frame[1]
+                    env = Env(frame[2])
+                    env.env[let_expr.name] = value
+                    control = let_expr.body
+                    break
+                elif tag == FIX:
+                    if not isinstance(value, Closure):
+                        raise TypeError(f"fix expects a function, but got {value}")
+                    if isinstance(value.body, Abs):
+                        value = fix_closure(value)
+                    else:
+                        env = Env(value.env)
+                        env.env[value.param_name] = unfold_fix(value)
+                        control = value.body
+                        break
+            else:
+                self.control = self.env = None  # Let the environment be collected
+                self.value, self.done, self.steps = value, True, steps
+                return True
+            evaluating = True
+
+    @staticmethod
+    def _next_limit(steps, stop):
+        """Where run next stops to look at the clock: DEADLINE_INTERVAL steps on, or at stop."""
+        limit = steps + DEADLINE_INTERVAL
+        return limit if stop < 0 else min(limit, stop)
+
+
+def eval_machine(expr, env):
+    """
+    Evaluate an expression in a given environment without native recursion.
+
+    Gives the same results as eval_expr(expr, env). Applications, if-branches, case
+    branches and let bodies are entered without pushing a frame, so tail calls run in
+    constant space.
+    """
+    evaluation = Evaluation(expr, env)
+    evaluation.run()
+    return evaluation.value
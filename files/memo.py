@@ -0,0 +1,230 @@
+# Opt-in memoization of closure application: an ApplicationCache evaluates like
+# eval_expr, but remembers the result of applying a closure to an argument, and returns
+# it when an equal closure is applied to an equal argument again.
+#
+# The language is pure, so an application's result depends only on the function's
+# parameter and body, the values it captured and the argument. Entries are keyed on the
+# parameter name, the body (by identity, so two abstractions may share one, as share()
+# makes them) and the value_key (value.py) of every captured free variable and of the
+# argument.
+# A captured closure is keyed the same way, so recursive functions built with fix,
+# which capture themselves, are memoized (a reference back to a closure being keyed is
+# keyed by its depth). An application whose key cannot be built, because the closure
+# captured or the argument is a function of another engine or an unbound name, is
+# evaluated without the cache, so a cached result is never wrong. So is the closure
+# that unfold_fix builds anew, with a new body, at each unfolding of fix applied to a
+# function whose body is not an abstraction: it could never be found again.
+#
+# A memoized call in tail position stays a tail call: on a miss, evaluation goes on with
+# the body in the same loop, and the value the loop finally returns is stored under the
+# keys of all the calls it went through, since each of them has that value. Errors are
+# not cached. Restrict memoization to the helpers that are worth it with functions.
+from collections import OrderedDict
+
+from .expressions import *
+from .value import *
+from .ifcondition import *
+from .binop import *
+from .conjuntiontypes import *
+from .disjunctions import *
+from .recursion import *
+from .letbinding import *
+from .interpreter import Env, fix_closure, unfold_fix
+from .machine import apply_binop
+from .resolver import free_vars
+
+
+class ApplicationCache:
+    """
+    Memo table of closure applications with least-recently-used eviction, see the
+    module comment.
+
+    max_size bounds the number of results kept (None for no limit). functions, if given,
+    is the abstractions whose applications are memoized (for fix(λf. λx. e), λx. e);
+    by default every application is.
+    """
+    def __init__(self, max_size=10_000, functions=None):
+        self.results = OrderedDict()  # ((parameter, body, captured keys), argument key) -> value, least recently used first
+        self.max_size = max_size
+        self.bodies = None if functions is None else {(abs_node.param_name, abs_node.body) for abs_node in functions}
+        self.names = {}               # (parameter, body) -> names of the captured variables
+        self.free = {}                # Memo of free_vars
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.uncacheable = 0          # Applications evaluated without the cache, having no key
+
+    def __len__(self):
+        return len(self.results)
+
+    def hit_rate(self):
+        """Fraction of memoized applications answered from the cache."""
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def clear(self):
+        self.results.clear()
+        self.names.clear()
+        self.free.clear()
+        self.hits = self.misses = self.evictions = self.uncacheable = 0
+
+    def key(self, func, arg):
+        """The key of applying the closure func to arg, or None if there is none."""
+        closure = self._closure_key(func, {})
+        if closure is None:
+            return None
+        argument = value_key(arg, lambda value: self._closure_key(value, {}))
+        return None if argument is None else (closure, argument)
+
+    def _closure_key(self, closure, active):
+        # active: id of each closure being keyed -> its depth
+        if type(closure) is not Closure or _unfolded(closure):
+            return None  # Closures of other engines do not keep their environment in an Env
+        depth = active.get(id(closure))
+        if depth is not None:
+            return ('rec', len(active) - depth)
+        names = self.names.get((closure.param_name, closure.body))
+        if names is None:
+            names = self.names[(closure.param_name, closure.body)] = tuple(
+                sorted(free_vars(closure.body, self.free) - {closure.param_name}))
+        active[id(closure)] = len(active)
+        try:
+            captured = []
+            for name in names:
+                try:
+                    value = closure.env.lookup(name)
+                except NameError:
+                    return None
+                key = value_key(value, lambda inner: self._closure_key(inner, active))
+                if key is None:
+                    return None
+                captured.append(key)
+        finally:
+            del active[id(closure)]
+        return (closure.param_name, closure.body, tuple(captured))
+
+    def _store(self, key, value):
+        self.results[key] = value
+        if self.max_size is not None and len(self.results) > self.max_size:
+            self.results.popitem(last=False)
+            self.evictions += 1
+
+    def summary(self):
+        return (f"{len(self.results)} results cached, {self.hits} hits, {self.misses} misses "
+                f"(hit rate {self.hit_rate():.1%}), {self.evictions} evictions, "
+                f"{self.uncacheable} uncacheable")
+
+    def eval_expr(self, expr, env):
+        """Evaluate expr in env like eval_expr, memoizing applications."""
+        pending = []  # Keys of the applications missed in tail position, whose value this is
+        while True:
+            if isinstance(expr, Var):
+                value = env.lookup(expr.name)
+                break
+
+            elif isinstance(expr, Abs):
+                value = Closure(expr.param_name, expr.param_type, expr.body, env)
+                break
+
+            elif isinstance(expr, App):
+                func = self.eval_expr(expr.func, env)
+                arg = self.eval_expr(expr.arg, env)
+                if not isinstance(func, Closure):
+                    raise TypeError(f"Expected a function, but got {func}")
+                env = Env(func.env)
+                env.extend(func.param_name, arg)
+                expr = func.body
+                if self.bodies is None or (func.param_name, expr) in self.bodies:
+                    key = self.key(func, arg)
+                    if key is None:
+                        self.uncacheable += 1
+                        continue
+                    value = self.results.get(key)
+                    if value is not None:
+                        self.hits += 1
+                        self.results.move_to_end(key)
+                        break
+                    self.misses += 1
+                    pending.append(key)
+
+            elif isinstance(expr, (IntValue, BoolValue)):
+                value = expr
+                break
+
+            elif isinstance(expr, Pair):
+                value = Pair(self.eval_expr(expr.left, env), self.eval_expr(expr.right, env))
+                break
+
+            elif isinstance(expr, (Fst, Snd)):
+                pair = self.eval_expr(expr.pair, env)
+                if not isinstance(pair, Pair):
+                    raise TypeError(f"{'fst' if isinstance(expr, Fst) else 'snd'} can only be applied to a pair.")
+                value = pair.left if isinstance(expr, Fst) else pair.right
+                break
+
+            elif isinstance(expr, Inl):
+                value = InlValue(self.eval_expr(expr.value, env))
+                break
+
+            elif isinstance(expr, Inr):
+                value = InrValue(self.eval_expr(expr.value, env))
+                break
+
+            elif isinstance(expr, Case):
+                value = self.eval_expr(expr.expr, env)
+                env = Env(env)
+                if isinstance(value, InlValue):
+                    env.extend('a', value)
+                    expr = expr.left_case
+                elif isinstance(value, InrValue):
+                    env.extend('b', value)
+                    expr = expr.right_case
+                else:
+                    raise TypeError("Expected a disjunction (Inl or Inr).")
+
+            elif isinstance(expr, If):
+                condition = self.eval_expr(expr.condition, env)
+                if not isinstance(condition, BoolValue):
+                    raise TypeError(f"Condition must evaluate to a Bool, but got {condition}")
+                expr = expr.then_branch if condition.value else expr.else_branch
+
+            elif isinstance(expr, BinOp):
+                left = self.eval_expr(expr.left, env)
+                right = self.eval_expr(expr.right, env)
+                value = apply_binop(expr.op, left, right)
+                break
+
+            elif isinstance(expr, Let):
+                value = self.eval_expr(expr.value, env)
+                env = Env(env)
+                env.extend(expr.name, value)
+                expr = expr.body
+
+            elif isinstance(expr, Fix):
+                func = self.eval_expr(expr.func, env)
+                if not isinstance(func, Closure):
+                    raise TypeError(f"fix expects a function, but got {func}")
+                if isinstance(func.body, Abs):
+                    value = fix_closure(func)
+                    break
+                env = Env(func.env)
+                env.extend(func.param_name, unfold_fix(func))
+                expr = func.body
+
+            else:
+                raise TypeError(f"Unknown expression type: {expr}")
+
+        for key in pending:
+            self._store(key, value)
+        return value
+
+def _unfolded(closure):
+    """Whether closure was made by unfold_fix."""
+    body = closure.body
+    return type(body) is App and type(body.func) is Fix and closure.param_name == 'x' and \
+        type(body.func.func) is Var and body.func.func.name == 'F'
+
+
+def eval_memo(expr, env, cache=None):
+    """Evaluate expr like eval_expr, memoizing closure applications in cache (a new ApplicationCache if None)."""
+    return (ApplicationCache() if cache is None else cache).eval_expr(expr, env)
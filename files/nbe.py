@@ -0,0 +1,290 @@
+# Normalization by evaluation: compute the normal form of an open, well-typed term, as
+# a proof checker does to compare proofs (Curry-Howard).
+#
+# The term is evaluated into a semantic domain where functions are Python functions
+# and free variables are neutral terms (a variable under projections, applications and
+# cases that cannot reduce). The value is then read back (reified) at its type: at a
+# function type by applying it to a fresh variable, at a conjunction by projecting, so
+# the result is β-normal and η-long for → and ∧, and has no let. Injections are not
+# η-expanded, and a case or if on a neutral term stays in the normal form.
+#
+# Following the reduction rules (Eval-Case-Inl, Eval-Case-Inr), a case binds a and b
+# to the payload of the injection, as the type checker assumes; eval_expr binds them
+# to the whole injection instead. Case binders are always named a and b, so in a
+# normal form each branch starts by renaming its binder, let a_7 = a in ..., so that
+# the binder of an inner case cannot capture an outer one.
+#
+# A division by zero is not an error here: it stays in the normal form, as it might be
+# in a branch that is never taken.
+#
+# fix is unfolded only when both the function and its argument are closed values, with
+# no neutral term inside; on anything else, unfolding might never stop, so the
+# application stays in the normal form.
+#
+# Evaluating a let, or an argument, once and reading back each value once gives a
+# normal form that is a DAG: a subterm that occurs many times is one shared node, so a
+# proof that duplicates a large subproof does not blow up in memory.
+from .expressions import *
+from .types import *
+from .value import *
+from .ifcondition import *
+from .binop import *
+from .conjuntiontypes import *
+from .disjunctions import *
+from .logicaltypes import *
+from .recursion import *
+from .letbinding import *
+from .interpreter import Env
+from .typechecker import TypeContext, _type_check
+from .machine import apply_binop
+from .resolver import free_vars
+
+
+class _Neutral:
+    """A term that cannot reduce because it is stuck on a free variable."""
+    __slots__ = ('expr',)
+    def __init__(self, expr):
+        self.expr = expr
+
+
+class _Function:
+    __slots__ = ('apply', 'open')
+    def __init__(self, apply, open=True):
+        self.apply = apply  # Python function from values to values
+        self.open = open    # Whether it may hold a neutral term
+
+
+class _Pair:
+    __slots__ = ('left', 'right', 'open')
+    def __init__(self, left, right):
+        self.left = left
+        self.right = right
+        self.open = _is_open(left) or _is_open(right)
+
+
+class _Injection:
+    __slots__ = ('left', 'value', 'open')
+    def __init__(self, left, value):
+        self.left = left    # True for inl, False for inr
+        self.value = value
+        self.open = _is_open(value)
+
+
+def _is_open(value):
+    """Whether a value has a neutral term inside, so it depends on a free variable."""
+    return type(value) is _Neutral or getattr(value, 'open', False)
+
+
+class _Scope(TypeContext):
+    """
+    A TypeContext whose extend gives back the same context for the same binding, so the
+    contexts evaluation builds are the very ones the type checker built, and a node's
+    type can be looked up by (node, context) even when the node is shared by scopes
+    that give it different types.
+    """
+    def __init__(self, context=None):
+        super().__init__(context)
+        self.children = {}  # (var, type) -> extended _Scope
+
+    def extend(self, var, typ):
+        child = self.children.get((var, typ))
+        if child is None:
+            child = self.children[var, typ] = _Scope()
+            child.bindings[var] = typ
+            child.parent = self
+        return child
+
+
+class _Normalizer:
+    def __init__(self, types, used_names):
+        self.types = types          # (node, _Scope) -> its type, for reading back neutral eliminations
+        self.used = used_names      # Names that fresh names must avoid
+        self.count = 0
+        self.reified = {}           # (id(value), type) -> (value, normal form), for sharing
+        self.free = {}              # Memo of free_vars
+
+    def fresh(self, name):
+        while True:
+            self.count += 1
+            fresh = f"{name}_{self.count}"
+            if fresh not in self.used:
+                return fresh
+
+    # Evaluation
+
+    def eval(self, expr, env, scope):
+        if isinstance(expr, Var):
+            return env.lookup(expr.name)
+
+        elif isinstance(expr, (IntValue, BoolValue)):
+            return expr
+
+        elif isinstance(expr, Abs):
+            body = expr.body
+            name = expr.param_name
+            body_scope = scope.extend(name, expr.param_type)
+            def apply(arg):
+                extended_env = Env(env)
+                extended_env.extend(name, arg)
+                return self.eval(body, extended_env, body_scope)
+            captured = free_vars(expr, self.free)
+            return _Function(apply, any(_is_open(env.lookup(free)) for free in captured))
+
+        elif isinstance(expr, App):
+            func = self.eval(expr.func, env, scope)
+            arg = self.eval(expr.arg, env, scope)
+            if not isinstance(func, _Function):
+                raise TypeError(f"Expected a function, but got {func}")
+            return func.apply(arg)
+
+        elif isinstance(expr, Let):
+            extended_env = Env(env)
+            extended_env.extend(expr.name, self.eval(expr.value, env, scope))
+            return self.eval(expr.body, extended_env, scope.extend(expr.name, self.types[expr.value, scope]))
+
+        elif isinstance(expr, Pair):
+            return _Pair(self.eval(expr.left, env, scope), self.eval(expr.right, env, scope))
+
+        elif isinstance(expr, (Fst, Snd)):
+            pair = self.eval(expr.pair, env, scope)
+            if not isinstance(pair, _Pair):
+                raise TypeError(f"{'fst' if isinstance(expr, Fst) else 'snd'} can only be applied to a pair.")
+            return pair.left if isinstance(expr, Fst) else pair.right
+
+        elif isinstance(expr, (Inl, Inr)):
+            return _Injection(isinstance(expr, Inl), self.eval(expr.value, env, scope))
+
+        elif isinstance(expr, Case):
+            scrutinee = self.eval(expr.expr, env, scope)
+            or_type = self.types[expr.expr, scope]
+            case_scope = scope.extend('a', or_type.left).extend('b', or_type.right)
+            if isinstance(scrutinee, _Injection):
+                extended_env = Env(env)
+                if scrutinee.left:
+                    extended_env.extend('a', scrutinee.value)
+                    return self.eval(expr.left_case, extended_env, case_scope)
+                extended_env.extend('b', scrutinee.value)
+                return self.eval(expr.right_case, extended_env, case_scope)
+            elif isinstance(scrutinee, _Neutral):
+                return self.stuck_case(expr, scrutinee, env, scope, case_scope)
+            raise TypeError("Expected a disjunction (Inl or Inr).")
+
+        elif isinstance(expr, If):
+            condition = self.eval(expr.condition, env, scope)
+            if isinstance(condition, BoolValue):
+                return self.eval(expr.then_branch if condition.value else expr.else_branch, env, scope)
+            elif isinstance(condition, _Neutral):
+                typ = self.types[expr, scope]
+                return self.reflect(typ, If(condition.expr, self.reify(typ, self.eval(expr.then_branch, env, scope)),
+                                            self.reify(typ, self.eval(expr.else_branch, env, scope))))
+            raise TypeError(f"Condition must evaluate to a Bool, but got {condition}")
+
+        elif isinstance(expr, BinOp):
+            left = self.eval(expr.left, env, scope)
+            right = self.eval(expr.right, env, scope)
+            if isinstance(left, _Neutral) or isinstance(right, _Neutral):
+                operand_type = IntType() if expr.op in ('+', '-', '*', '/', '==', '<', '>') else BoolType()
+                return _Neutral(BinOp(self.reify(operand_type, left), expr.op, self.reify(operand_type, right)))
+            try:
+                return apply_binop(expr.op, left, right)
+            except ZeroDivisionError:
+                # Normalizing must not run the error, which may sit in a branch never taken
+                return _Neutral(BinOp(left, expr.op, right))
+
+        elif isinstance(expr, Fix):
+            return self.fixpoint(self.eval(expr.func, env, scope), self.types[expr, scope])
+
+        else:
+            raise TypeError(f"Unknown expression type: {expr}")
+
+    def stuck_case(self, expr, scrutinee, env, scope, case_scope):
+        """case n of (...) on a neutral n: both branches are normalized under their binder."""
+        or_type = self.types[expr.expr, scope]
+        typ = self.types[expr, scope]
+        if {'a', 'b'} & self.used:
+            raise ValueError("A free variable named a or b would be captured by a case binder")
+        branches = []
+        for binder, payload_type, branch in (('a', or_type.left, expr.left_case), ('b', or_type.right, expr.right_case)):
+            name = self.fresh(binder)
+            extended_env = Env(env)
+            extended_env.extend(binder, self.reflect(payload_type, Var(name)))
+            branches.append(Let(name, Var(binder), self.reify(typ, self.eval(branch, extended_env, case_scope))))
+        return self.reflect(typ, Case(scrutinee.expr, *branches))
+
+    def fixpoint(self, func, typ):
+        """fix func at type typ = A → B: unfolded when applied to a closed value, stuck otherwise."""
+        if not isinstance(func, _Function):
+            raise TypeError(f"fix expects a function, but got {func}")
+        def apply(arg):
+            if func.open or _is_open(arg):
+                # Unfolding on an unknown argument, or function, might never stop
+                stuck = App(Fix(self.reify(FuncType(typ, typ), func)), self.reify(typ.param_type, arg))
+                return self.reflect(typ.return_type, stuck)
+            unfolded = func.apply(recursive)
+            if not isinstance(unfolded, _Function):
+                raise TypeError(f"Expected a function, but got {unfolded}")
+            return unfolded.apply(arg)
+        recursive = _Function(apply, func.open)
+        return recursive
+
+    # Read back
+
+    def reflect(self, typ, expr):
+        """The value of neutral term expr at type typ, η-expanded for → and ∧."""
+        if isinstance(typ, FuncType):
+            return _Function(lambda arg: self.reflect(typ.return_type, App(expr, self.reify(typ.param_type, arg))))
+        elif isinstance(typ, AndType):
+            return _Pair(self.reflect(typ.left, Fst(expr)), self.reflect(typ.right, Snd(expr)))
+        return _Neutral(expr)
+
+    def reify(self, typ, value):
+        """The normal form of value at type typ."""
+        if isinstance(value, (IntValue, BoolValue)):
+            return value
+        elif isinstance(value, _Neutral):
+            return value.expr
+        key = (id(value), typ)
+        shared = self.reified.get(key)
+        if shared is not None:
+            return shared[1]
+
+        if isinstance(typ, FuncType) and isinstance(value, _Function):
+            name = self.fresh('x')
+            body = self.reify(typ.return_type, value.apply(self.reflect(typ.param_type, Var(name))))
+            normal = Abs(name, typ.param_type, body)
+        elif isinstance(typ, AndType) and isinstance(value, _Pair):
+            normal = Pair(self.reify(typ.left, value.left), self.reify(typ.right, value.right))
+        elif isinstance(typ, OrType) and isinstance(value, _Injection):
+            if value.left:
+                normal = Inl(self.reify(typ.left, value.value), typ)
+            else:
+                normal = Inr(self.reify(typ.right, value.value), typ)
+        else:
+            raise TypeError(f"Cannot read back a value of type {typ}")
+        self.reified[key] = (value, normal)  # Keeps value alive, so its id is not reused
+        return normal
+
+
+def _annotate(expr, scope):
+    """The type of expr and a dict from every (node, _Scope) it is checked in to its type."""
+    types = {}
+    def check(node, node_scope):
+        typ = types.get((node, node_scope))
+        if typ is None:
+            typ = types[node, node_scope] = _type_check(node, node_scope, check)
+        return typ
+    return check(expr, scope), types
+
+
+def normalize(expr, context=None):
+    """
+    The β-normal, η-long form of a well-typed expression whose free variables have the
+    types given in context (a TypeContext), as an expression that may share subterms.
+    """
+    scope = _Scope(None if context is None else context.context)
+    typ, types = _annotate(expr, scope)
+    normalizer = _Normalizer(types, set(scope.bindings))
+    env = Env()
+    for name, var_type in scope.bindings.items():
+        env.extend(name, normalizer.reflect(var_type, Var(name)))
+    return normalizer.reify(typ, normalizer.eval(expr, env, scope))
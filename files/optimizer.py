@@ -0,0 +1,367 @@
+# Optimizing rewrite pass over expression trees: constant folding, dead-branch
+# elimination, projection and case-of-injection simplification, and beta-reduction (and
+# let-reduction) with inlining of values under a size budget.
+#
+# Every rewrite preserves the type of the expression and the value eval_expr computes
+# for it. Subterms are only discarded or duplicated when they are syntactic values, so
+# a program that raises (e.g. divides by zero) still raises after optimization.
+from .expressions import *
+from .value import *
+from .ifcondition import *
+from .binop import *
+from .conjuntiontypes import *
+from .disjunctions import *
+from .logicaltypes import *
+from .recursion import *
+from .letbinding import *
+from .machine import MACHINE_BINOPS
+from .resolver import free_vars
+
+
+class OptimizerStats:
+    """Counts of the simplifications made by an Optimizer."""
+    def __init__(self):
+        self.folded = 0          # BinOps of two constants replaced by their result
+        self.dead_branches = 0   # Ifs on a constant condition replaced by one branch
+        self.projections = 0     # fst/snd of a pair replaced by the component
+        self.cases = 0           # Cases on a known injection replaced by one branch
+        self.beta = 0            # Applications of an abstraction, and lets, reduced
+        self.inlined = 0         # Of those, reductions that duplicated the argument
+        self.passes = 0
+        self.size_before = 0
+        self.size_after = 0
+
+    def __repr__(self):
+        return (f"OptimizerStats(folded={self.folded}, dead_branches={self.dead_branches}, "
+                f"projections={self.projections}, cases={self.cases}, beta={self.beta}, "
+                f"inlined={self.inlined}, passes={self.passes}, "
+                f"size={self.size_before}->{self.size_after})")
+
+
+class _Capture(Exception):
+    """Raised when a substitution would capture a variable bound by a case branch."""
+
+
+def expr_size(expr):
+    """Number of nodes in an expression."""
+    if isinstance(expr, (Var, IntValue, BoolValue)):
+        return 1
+    elif isinstance(expr, Abs):
+        return 1 + expr_size(expr.body)
+    elif isinstance(expr, App):
+        return 1 + expr_size(expr.func) + expr_size(expr.arg)
+    elif isinstance(expr, (Pair, BinOp)):
+        return 1 + expr_size(expr.left) + expr_size(expr.right)
+    elif isinstance(expr, (Fst, Snd)):
+        return 1 + expr_size(expr.pair)
+    elif isinstance(expr, Fix):
+        return 1 + expr_size(expr.func)
+    elif isinstance(expr, Let):
+        return 1 + expr_size(expr.value) + expr_size(expr.body)
+    elif isinstance(expr, (Inl, Inr)):
+        return 1 + expr_size(expr.value)
+    elif isinstance(expr, Case):
+        return 1 + expr_size(expr.expr) + expr_size(expr.left_case) + expr_size(expr.right_case)
+    elif isinstance(expr, If):
+        return 1 + expr_size(expr.condition) + expr_size(expr.then_branch) + expr_size(expr.else_branch)
+    else:
+        raise TypeError(f"Unknown expression type: {expr}")
+
+
+def is_value(expr):
+    """Whether expr is a syntactic value: evaluating it cannot fail and does no work."""
+    if isinstance(expr, (Var, IntValue, BoolValue, Abs)):
+        return True
+    elif isinstance(expr, Pair):
+        return is_value(expr.left) and is_value(expr.right)
+    elif isinstance(expr, (Inl, Inr)):
+        return is_value(expr.value)
+    return False
+
+
+class Optimizer:
+    """
+    Type- and value-preserving simplifier.
+
+    inline_budget bounds code growth from beta-reduction: an argument used n > 1 times
+    is only substituted if its size times n - 1 is at most the budget.
+    """
+    def __init__(self, inline_budget=32, max_passes=10):
+        self.inline_budget = inline_budget
+        self.max_passes = max_passes
+        self.stats = OptimizerStats()
+        self._fresh = 0
+        self._free = {}  # Memo for free_vars, keyed on node
+
+    def optimize(self, expr):
+        """Rewrite expr until nothing changes, or for at most max_passes passes."""
+        self.stats.size_before = expr_size(expr)
+        for _ in range(self.max_passes):
+            self.stats.passes += 1
+            optimized = self._rewrite(expr)
+            if optimized is expr:
+                break
+            expr = optimized
+        self.stats.size_after = expr_size(expr)
+        return expr
+
+    def _free_vars(self, expr):
+        return free_vars(expr, self._free)
+
+    def _rewrite(self, expr):
+        """One bottom-up pass. Returns expr itself if nothing changed."""
+
+        if isinstance(expr, (Var, IntValue, BoolValue)):
+            return expr
+
+        elif isinstance(expr, Abs):
+            body = self._rewrite(expr.body)
+            if body is expr.body:
+                return expr
+            return Abs(expr.param_name, expr.param_type, body)
+
+        elif isinstance(expr, App):
+            func = self._rewrite(expr.func)
+            arg = self._rewrite(expr.arg)
+            if isinstance(func, Abs):
+                reduced = self._beta(func, arg)
+                if reduced is not None:
+                    return reduced
+            if func is expr.func and arg is expr.arg:
+                return expr
+            return App(func, arg)
+
+        elif isinstance(expr, BinOp):
+            left = self._rewrite(expr.left)
+            right = self._rewrite(expr.right)
+            folded = self._fold(expr.op, left, right)
+            if folded is not None:
+                self.stats.folded += 1
+                return folded
+            if left is expr.left and right is expr.right:
+                return expr
+            return BinOp(left, expr.op, right)
+
+        elif isinstance(expr, If):
+            condition = self._rewrite(expr.condition)
+            if isinstance(condition, BoolValue):
+                # Only the taken branch is ever evaluated, so the other one is dead
+                self.stats.dead_branches += 1
+                return self._rewrite(expr.then_branch if condition.value else expr.else_branch)
+            then_branch = self._rewrite(expr.then_branch)
+            else_branch = self._rewrite(expr.else_branch)
+            if condition is expr.condition and then_branch is expr.then_branch and else_branch is expr.else_branch:
+                return expr
+            return If(condition, then_branch, else_branch)
+
+        elif isinstance(expr, Pair):
+            left = self._rewrite(expr.left)
+            right = self._rewrite(expr.right)
+            if left is expr.left and right is expr.right:
+                return expr
+            return Pair(left, right)
+
+        elif isinstance(expr, (Fst, Snd)):
+            pair = self._rewrite(expr.pair)
+            if isinstance(pair, Pair):
+                # Both components are evaluated, so the dropped one must be a value
+                kept, dropped = (pair.left, pair.right) if isinstance(expr, Fst) else (pair.right, pair.left)
+                if is_value(dropped):
+                    self.stats.projections += 1
+                    return kept
+            if pair is expr.pair:
+                return expr
+            return type(expr)(pair)
+
+        elif isinstance(expr, Fix):
+            func = self._rewrite(expr.func)
+            if func is expr.func:
+                return expr
+            return Fix(func)
+
+        elif isinstance(expr, Let):
+            value = self._rewrite(expr.value)
+            if is_value(value):
+                reduced = self._reduce(expr.name, expr.body, value)
+                if reduced is not None:
+                    return reduced
+            body = self._rewrite(expr.body)
+            if value is expr.value and body is expr.body:
+                return expr
+            return Let(expr.name, value, body)
+
+        elif isinstance(expr, (Inl, Inr)):
+            value = self._rewrite(expr.value)
+            if value is expr.value:
+                return expr
+            return type(expr)(value, expr.typ)
+
+        elif isinstance(expr, Case):
+            scrutinee = self._rewrite(expr.expr)
+            if isinstance(scrutinee, (Inl, Inr)) and is_value(scrutinee.value):
+                # The branch variable is bound to the whole injection, whose type differs
+                # from the one the branch was checked with, so only fire if the branch
+                # uses neither of the names the type checker binds
+                branch = expr.left_case if isinstance(scrutinee, Inl) else expr.right_case
+                if not self._free_vars(branch) & {'a', 'b'}:
+                    self.stats.cases += 1
+                    return self._rewrite(branch)
+            left_case = self._rewrite(expr.left_case)
+            right_case = self._rewrite(expr.right_case)
+            if scrutinee is expr.expr and left_case is expr.left_case and right_case is expr.right_case:
+                return expr
+            return Case(scrutinee, left_case, right_case)
+
+        else:
+            raise TypeError(f"Unknown expression type: {expr}")
+
+    def _fold(self, op, left, right):
+        """The constant result of left op right, or None if it cannot be folded."""
+        if op not in MACHINE_BINOPS:
+            return None
+        operand, fn, wrap = MACHINE_BINOPS[op]
+        if not (type(left) is operand and type(right) is operand):
+            return None
+        if op == '/' and right.value == 0:
+            return None  # Leave the error to run time
+        return wrap(fn(left.value, right.value))
+
+    def _beta(self, func, arg):
+        """Reduce (λx. body) arg, or return None if that is not safe or too large."""
+        if not is_value(arg):
+            return None  # The argument must be evaluated exactly once, before the body
+        if isinstance(func.param_type, OrType) and not (isinstance(arg, (Inl, Inr)) and arg.typ == func.param_type):
+            # The App rule accepts any argument for a disjunction parameter, so the
+            # argument's type may differ from the parameter's
+            return None
+        return self._reduce(func.param_name, func.body, arg)
+
+    def _reduce(self, name, body, arg):
+        """Substitute the value arg for name in body, or return None if that is too large."""
+        uses = _occurrences(body, name)
+        size = expr_size(arg)
+        if uses > 1 and size > 1 and size * (uses - 1) > self.inline_budget:
+            return None
+        try:
+            body = self._subst(body, name, arg, self._free_vars(arg))
+        except _Capture:
+            return None
+
+        self.stats.beta += 1
+        if uses > 1 and size > 1:
+            self.stats.inlined += 1
+        return self._rewrite(body)
+
+    def _fresh_name(self, name, avoid):
+        while True:
+            self._fresh += 1
+            fresh = f"{name}_{self._fresh}"
+            if fresh not in avoid:
+                return fresh
+
+    def _subst(self, expr, name, value, value_fv):
+        """Replace the free occurrences of name in expr by value, avoiding capture."""
+        if name not in self._free_vars(expr):
+            return expr
+
+        if isinstance(expr, Var):
+            return value
+
+        elif isinstance(expr, Abs):
+            param_name, body = expr.param_name, expr.body
+            if param_name in value_fv:
+                # Rename the parameter so it does not capture a free variable of value
+                fresh = self._fresh_name(param_name, value_fv | self._free_vars(body))
+                body = self._subst(body, param_name, Var(fresh), frozenset([fresh]))
+                param_name = fresh
+            return Abs(param_name, expr.param_type, self._subst(body, name, value, value_fv))
+
+        elif isinstance(expr, App):
+            return App(self._subst(expr.func, name, value, value_fv),
+                       self._subst(expr.arg, name, value, value_fv))
+
+        elif isinstance(expr, BinOp):
+            return BinOp(self._subst(expr.left, name, value, value_fv), expr.op,
+                         self._subst(expr.right, name, value, value_fv))
+
+        elif isinstance(expr, If):
+            return If(self._subst(expr.condition, name, value, value_fv),
+                      self._subst(expr.then_branch, name, value, value_fv),
+                      self._subst(expr.else_branch, name, value, value_fv))
+
+        elif isinstance(expr, Pair):
+            return Pair(self._subst(expr.left, name, value, value_fv),
+                        self._subst(expr.right, name, value, value_fv))
+
+        elif isinstance(expr, (Fst, Snd)):
+            return type(expr)(self._subst(expr.pair, name, value, value_fv))
+
+        elif isinstance(expr, Fix):
+            return Fix(self._subst(expr.func, name, value, value_fv))
+
+        elif isinstance(expr, Let):
+            bound_value = self._subst(expr.value, name, value, value_fv)
+            let_name, body = expr.name, expr.body
+            if let_name == name:
+                return Let(let_name, bound_value, body)
+            if let_name in value_fv:
+                # Rename the bound variable so it does not capture a free variable of value
+                fresh = self._fresh_name(let_name, value_fv | self._free_vars(body))
+                body = self._subst(body, let_name, Var(fresh), frozenset([fresh]))
+                let_name = fresh
+            return Let(let_name, bound_value, self._subst(body, name, value, value_fv))
+
+        elif isinstance(expr, (Inl, Inr)):
+            return type(expr)(self._subst(expr.value, name, value, value_fv), expr.typ)
+
+        elif isinstance(expr, Case):
+            # The names 'a' and 'b' are bound by the evaluator in one branch each but by
+            # the type checker in both, and cannot be renamed: give up if they are involved
+            in_branches = (name in self._free_vars(expr.left_case)
+                           or name in self._free_vars(expr.right_case))
+            if in_branches and (name in ('a', 'b') or value_fv & {'a', 'b'}):
+                raise _Capture(name)
+            return Case(self._subst(expr.expr, name, value, value_fv),
+                        self._subst(expr.left_case, name, value, value_fv),
+                        self._subst(expr.right_case, name, value, value_fv))
+
+        else:
+            raise TypeError(f"Unknown expression type: {expr}")
+
+
+def _occurrences(expr, name):
+    """Number of free occurrences of name in expr."""
+    if isinstance(expr, Var):
+        return 1 if expr.name == name else 0
+    elif isinstance(expr, (IntValue, BoolValue)):
+        return 0
+    elif isinstance(expr, Abs):
+        return 0 if expr.param_name == name else _occurrences(expr.body, name)
+    elif isinstance(expr, App):
+        return _occurrences(expr.func, name) + _occurrences(expr.arg, name)
+    elif isinstance(expr, (Pair, BinOp)):
+        return _occurrences(expr.left, name) + _occurrences(expr.right, name)
+    elif isinstance(expr, (Fst, Snd)):
+        return _occurrences(expr.pair, name)
+    elif isinstance(expr, Fix):
+        return _occurrences(expr.func, name)
+    elif isinstance(expr, Let):
+        return _occurrences(expr.value, name) + (0 if expr.name == name else _occurrences(expr.body, name))
+    elif isinstance(expr, (Inl, Inr)):
+        return _occurrences(expr.value, name)
+    elif isinstance(expr, Case):
+        return (_occurrences(expr.expr, name)
+                + (0 if name == 'a' else _occurrences(expr.left_case, name))
+                + (0 if name == 'b' else _occurrences(expr.right_case, name)))
+    elif isinstance(expr, If):
+        return (_occurrences(expr.condition, name)
+                + _occurrences(expr.then_branch, name)
+                + _occurrences(expr.else_branch, name))
+    else:
+        raise TypeError(f"Unknown expression type: {expr}")
+
+
+def optimize(expr, inline_budget=32, max_passes=10):
+    """Optimize an expression. Returns the optimized expression and an OptimizerStats."""
+    optimizer = Optimizer(inline_budget, max_passes)
+    return optimizer.optimize(expr), optimizer.stats
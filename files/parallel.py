@@ -0,0 +1,296 @@
+# Parallel evaluation: independent closed subterms that are expensive enough are
+# evaluated in a pool of worker processes while this process evaluates the rest.
+#
+# The language is pure, so the operands of a BinOp, the components of a Pair and the
+# function and argument of an App can be evaluated in any order, and a closed subterm
+# has the same value wherever it occurs. A subterm is farmed out when it is
+#
+#   - closed, and of a first-order type (Int, Bool, pairs and sums of them), so that it
+#     is sent as an encoded program (serialize.py) and its value comes back as plain
+#     Python data (the unboxed values of unboxed.py);
+#   - always evaluated when the program is: reached from the root through operands,
+#     components, function and argument, projections, injections, the condition of an
+#     if, the scrutinee of a case and both parts of a let, but not through branches or
+#     abstraction bodies;
+#   - expensive, by the cost model: a probe runs it as an Evaluation (machine.py) for at
+#     most `threshold` steps. A probe that finishes gives the value, which is kept, so
+#     a cheap subterm is never evaluated twice, and one that does not marks it as
+#     expensive. Step counts do not depend on timing, so neither does the plan.
+#
+# Planning starts at the root and divides expensive subterms into their expensive
+# parts, breadth first, until there is one for each worker and one for this process, or
+# nothing more can be divided. The first part in evaluation order is left to this
+# process, which reaches it first, and the others are farmed out; so a lone expensive
+# part is never sent. Farmed subterms are submitted before evaluation starts and their
+# results are awaited where evaluation reaches them, in the order eval_expr would
+# compute them, so the result, or the error raised, is the one eval_expr gives. When
+# evaluation raises while farmed subterms are still running, possibly forever, the
+# worker processes are terminated and a new pool is started on next use.
+import os
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+
+from .expressions import *
+from .value import *
+from .types import *
+from .logicaltypes import *
+from .ifcondition import *
+from .binop import *
+from .conjuntiontypes import *
+from .disjunctions import *
+from .recursion import *
+from .letbinding import *
+from .typechecker import TypeCache, TypeContext, type_check
+from .resolver import free_vars
+from .serialize import decode_program, encode_program
+from .machine import Evaluation
+from .unboxed import (Binding, UnboxedClosure, UnboxedInl, UnboxedInr, UNBOXED_BINOPS,
+                      _fix, _lookup, _unfold, box, eval_unboxed, unbox)
+
+
+def _strict_children(expr):
+    """The subterms that are evaluated whenever expr is."""
+    cls = type(expr)
+    if cls is App:
+        return (expr.func, expr.arg)
+    elif cls is BinOp or cls is Pair:
+        return (expr.left, expr.right)
+    elif cls is Fst or cls is Snd:
+        return (expr.pair,)
+    elif cls is Inl or cls is Inr:
+        return (expr.value,)
+    elif cls is If:
+        return (expr.condition,)
+    elif cls is Case:
+        return (expr.expr,)
+    elif cls is Let:
+        return (expr.value, expr.body)
+    elif cls is Fix:
+        return (expr.func,)
+    return ()
+
+
+def _first_order(typ):
+    if isinstance(typ, (AndType, OrType)):
+        return _first_order(typ.left) and _first_order(typ.right)
+    return isinstance(typ, (IntType, BoolType, TrueType, FalseType))
+
+
+def _evaluate_encoded(buffer):
+    """Worker: decode a program and evaluate it to an unboxed value."""
+    arena, root = decode_program(buffer)
+    return eval_unboxed(arena.to_expr(root))
+
+
+class ParallelPlan:
+    """
+    How one program is evaluated in parallel: the farmed subterms, and the values of
+    the subterms whose probes finished.
+    """
+    def __init__(self):
+        self.farmed = []       # Subterms to evaluate in the workers, in evaluation order
+        self.known = {}        # Subterm -> unboxed value computed by its probe
+        self.probes = 0        # Subterms probed
+        self.probe_steps = 0   # Steps the probes took in all
+
+
+class ParallelEvaluator:
+    """
+    Evaluates programs like eval_expr, farming expensive independent subterms out to a
+    pool of worker processes, see the module comment. The pool is started on first use
+    and kept until close(); use the evaluator as a context manager to close it.
+    """
+    def __init__(self, workers=None, threshold=20_000):
+        self.workers = workers or os.cpu_count() or 1
+        self.threshold = threshold  # Steps a subterm must take to be worth sending to a worker
+        self._pool = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.shutdown(cancel_futures=True)
+            self._pool = None
+
+    def _terminate(self):
+        """Kill the worker processes, whatever they are running, and drop the pool."""
+        pool, self._pool = self._pool, None
+        # A running task cannot be cancelled, and shutdown waits for it to finish
+        processes = list((pool._processes or {}).values())
+        for process in processes:
+            process.terminate()
+        pool.shutdown(wait=False, cancel_futures=True)
+        for process in processes:
+            process.join()
+
+    def plan(self, expr):
+        """The ParallelPlan for expr."""
+        plan = ParallelPlan()
+        memo = {}
+        cache = TypeCache()
+
+        def farmable(node):
+            if free_vars(node, memo):
+                return False
+            try:
+                return _first_order(type_check(node, TypeContext(), cache))
+            except (TypeError, RecursionError):
+                return False
+
+        def expensive(node):
+            """Probe node; True if it takes at least threshold steps."""
+            evaluation = Evaluation(node)
+            plan.probes += 1
+            try:
+                done = evaluation.run(self.threshold)
+            except Exception:
+                done = False  # It raises: leave it to be raised where eval_expr would raise it
+            plan.probe_steps += evaluation.steps
+            if done:
+                plan.known[node] = unbox(evaluation.value)
+                return False
+            return evaluation.steps >= self.threshold
+
+        def parts(node):
+            """The expensive farmable subterms that node divides into."""
+            found = []
+            stack = list(reversed(_strict_children(node)))
+            while stack:
+                child = stack.pop()
+                if child in plan.known:
+                    continue
+                if farmable(child):
+                    if expensive(child):
+                        found.append(child)
+                else:
+                    stack.extend(reversed(_strict_children(child)))
+            return found
+
+        if farmable(expr) and not expensive(expr):
+            return plan
+        tasks = parts(expr)
+        divisible = deque(tasks)
+        while divisible and len(tasks) <= self.workers:
+            task = divisible.popleft()
+            divided = parts(task)
+            if divided:
+                position = tasks.index(task)
+                tasks[position:position + 1] = divided
+                divisible.extend(divided)
+        plan.farmed = tasks[1:]
+        return plan
+
+    def evaluate(self, expr, env=None, plan=None):
+        """Evaluate expr in env (an Env), returning a Value as eval_expr does."""
+        plan = self.plan(expr) if plan is None else plan
+        results = dict(plan.known)
+        if plan.farmed:
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(self.workers)
+            for node in plan.farmed:
+                results[node] = self._pool.submit(_evaluate_encoded, encode_program(node))
+        try:
+            return box(_eval(expr, None if env is None else unbox(env), results))
+        except BaseException:
+            if any(isinstance(result, Future) and not result.done() for result in results.values()):
+                self._terminate()
+            raise
+        finally:
+            for result in results.values():
+                if isinstance(result, Future):
+                    result.cancel()
+
+
+def eval_parallel(expr, env=None, workers=None, threshold=20_000):
+    """Evaluate expr like eval_expr with a new ParallelEvaluator, closing its pool afterwards."""
+    with ParallelEvaluator(workers, threshold) as evaluator:
+        return evaluator.evaluate(expr, env)
+
+
+def _eval(expr, scope, results):
+    """eval_unboxed, taking the values of the subterms in results from there."""
+    while True:
+        if expr in results:
+            value = results[expr]
+            if isinstance(value, Future):
+                value = results[expr] = value.result()
+            return value
+
+        cls = type(expr)
+        if cls is Var:
+            return _lookup(scope, expr.name)
+
+        elif cls is IntValue or cls is BoolValue:
+            return expr.value
+
+        elif cls is Abs:
+            return UnboxedClosure(expr, scope)
+
+        elif cls is App:
+            func = _eval(expr.func, scope, results)
+            arg = _eval(expr.arg, scope, results)
+            if type(func) is not UnboxedClosure:
+                raise TypeError(f"Expected a function, but got {box(func)}")
+            expr = func.abs
+            scope = Binding(expr.param_name, arg, func.scope)
+            expr = expr.body
+
+        elif cls is BinOp:
+            left = _eval(expr.left, scope, results)
+            right = _eval(expr.right, scope, results)
+            entry = UNBOXED_BINOPS.get(expr.op)
+            if entry is None or type(left) is not entry[0] or type(right) is not entry[0]:
+                raise TypeError(f"Invalid operands for binary operation: {expr.op}")
+            return entry[1](left, right)
+
+        elif cls is If:
+            condition = _eval(expr.condition, scope, results)
+            if type(condition) is not bool:
+                raise TypeError(f"Condition must evaluate to a Bool, but got {box(condition)}")
+            expr = expr.then_branch if condition else expr.else_branch
+
+        elif cls is Pair:
+            return (_eval(expr.left, scope, results), _eval(expr.right, scope, results))
+
+        elif cls is Fst or cls is Snd:
+            pair = _eval(expr.pair, scope, results)
+            if type(pair) is not tuple:
+                raise TypeError(f"{'fst' if cls is Fst else 'snd'} can only be applied to a pair.")
+            return pair[0] if cls is Fst else pair[1]
+
+        elif cls is Inl:
+            return UnboxedInl(_eval(expr.value, scope, results))
+
+        elif cls is Inr:
+            return UnboxedInr(_eval(expr.value, scope, results))
+
+        elif cls is Case:
+            value = _eval(expr.expr, scope, results)
+            if type(value) is UnboxedInl:
+                scope = Binding('a', value, scope)
+                expr = expr.left_case
+            elif type(value) is UnboxedInr:
+                scope = Binding('b', value, scope)
+                expr = expr.right_case
+            else:
+                raise TypeError("Expected a disjunction (Inl or Inr).")
+
+        elif cls is Let:
+            scope = Binding(expr.name, _eval(expr.value, scope, results), scope)
+            expr = expr.body
+
+        elif cls is Fix:
+            func = _eval(expr.func, scope, results)
+            if type(func) is not UnboxedClosure:
+                raise TypeError(f"fix expects a function, but got {box(func)}")
+            if type(func.abs.body) is Abs:
+                return _fix(func)
+            scope = Binding(func.abs.param_name, _unfold(func), func.scope)
+            expr = func.abs.body
+
+        else:
+            raise TypeError(f"Unknown expression type: {expr}")
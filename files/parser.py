@@ -0,0 +1,458 @@
+# Textual surface syntax for programs, following the grammar in the README:
+#
+#   t ::= x | n | true | false | λx: T. t | t1 t2 | t1 op t2 | if t1 then t2 else t3
+#       | (t1, t2) | ⟨t1, t2⟩ | fst(t) | snd(t) | inl[T](t) | inr[T](t) | fix(t)
+#       | case t of (inl[T](a) ⇒ t1 | inr[T](b) ⇒ t2) | let x = t1 in t2
+#   T ::= Int | Bool | True | False | T1 → T2 | T1 ∧ T2 | T1 ∨ T2 | (T)
+#
+# ASCII spellings are accepted too: \ for λ, -> for →, /\ for ∧, \/ for ∨ and => for ⇒.
+# The subscript of inl/inr in a case is optional, and the case binders must be a and b,
+# the names Case binds. Application binds tightest, then * /, + -, == < >, && and ||;
+# λ, if and let extend as far to the right as possible. In types ∧ binds tighter than ∨,
+# which binds tighter than the right-associative →.
+#
+# The parser makes a single pass over the tokens with explicit operator and operand
+# stacks, so arbitrarily deep programs parse without recursion.
+import re
+
+from .expressions import *
+from .types import *
+from .value import *
+from .ifcondition import *
+from .binop import *
+from .conjuntiontypes import *
+from .disjunctions import *
+from .logicaltypes import *
+from .recursion import *
+from .letbinding import *
+
+
+def _line_column(text, offset):
+    """The line and column, both from 1, of an offset into text."""
+    return text.count('\n', 0, offset) + 1, offset - (text.rfind('\n', 0, offset) + 1) + 1
+
+
+class ParseError(SyntaxError):
+    """A syntax error in program text, with its line and column."""
+    def __init__(self, message, text, offset):
+        line, column = _line_column(text, offset)
+        super().__init__(f"{message} at line {line}, column {column}")
+        self.lineno = line
+        self.offset = column
+
+    def __str__(self):
+        return self.msg
+
+
+_TOKEN = re.compile(r"""
+    (?P<space>\s+|\#[^\n]*)
+  | (?P<int>\d+)
+  | (?P<name>[A-Za-z_][A-Za-z0-9_']*)
+  | (?P<symbol>->|=>|==|&&|\|\||/\\|\\/|[λ\\→∧∨⇒⟨⟩()\[\],.:|+\-*/<>=])
+  | (?P<error>.)
+""", re.VERBOSE)
+
+# ASCII spellings of symbols
+_ALIASES = {'\\': 'λ', '->': '→', '/\\': '∧', '\\/': '∨', '=>': '⇒'}
+
+_KEYWORDS = {'if', 'then', 'else', 'case', 'of', 'fst', 'snd', 'inl', 'inr', 'fix', 'let', 'in', 'true', 'false'}
+
+# Binary operators of terms: op -> precedence. 'app' is application by juxtaposition.
+_PRECEDENCE = {'||': 1, '&&': 2, '==': 3, '<': 3, '>': 3, '+': 4, '-': 4, '*': 5, '/': 5, 'app': 6}
+
+# Type operators: op -> (precedence, right associative)
+_TYPE_OPERATORS = {'→': (1, True), '∨': (2, False), '∧': (3, False)}
+_TYPE_NAMES = {'Int': IntType, 'Bool': BoolType, 'True': TrueType, 'False': FalseType}
+
+# Names of the constructs the markers of the operator stack belong to, for errors
+_MARKER_NAMES = {'pair': '(', '⟨pair': '⟨', 'case_left': 'case', 'case_right': 'case'}
+
+
+def tokenize(text):
+    """Split program text into a list of (kind, value, offset) tokens, ending with (None, None, len)."""
+    tokens = []
+    append = tokens.append
+    aliases = _ALIASES
+    keywords = _KEYWORDS
+    for m in _TOKEN.finditer(text):
+        kind = m.lastgroup
+        if kind == 'space':
+            continue
+        value = m.group()
+        if kind == 'symbol':
+            append(('symbol', aliases.get(value, value), m.start()))
+        elif kind == 'name':
+            append(('keyword' if value in keywords else 'name', value, m.start()))
+        elif kind == 'int':
+            append(('int', int(value), m.start()))
+        else:
+            raise ParseError(f"Unexpected character {value!r}", text, m.start())
+    append((None, None, len(text)))
+    return tokens
+
+
+class _Parser:
+    def __init__(self, text, locations=None):
+        self.text = text
+        self.locations = locations
+        self.tokens = tokenize(text)
+        self.position = 0
+
+    def error(self, message, token=None):
+        token = token or self.tokens[self.position]
+        found = 'end of input' if token[0] is None else repr(str(token[1]))
+        raise ParseError(f"{message}, found {found}", self.text, token[2])
+
+    def next(self):
+        token = self.tokens[self.position]
+        self.position += 1
+        return token
+
+    def peek(self):
+        return self.tokens[self.position]
+
+    def expect(self, value, what=None):
+        token = self.next()
+        if token[1] != value or token[0] not in ('symbol', 'keyword'):
+            self.position -= 1
+            self.error(f"Expected {what or repr(value)}")
+        return token
+
+    def expect_name(self):
+        token = self.next()
+        if token[0] != 'name':
+            self.position -= 1
+            self.error("Expected a variable name")
+        return token[1]
+
+    def parse_type(self):
+        """Parse a type, stopping at the first token that cannot continue it."""
+        operands = []
+        operators = []  # Entries: operator symbol, or '(' for an open parenthesis
+
+        def reduce():
+            op = operators.pop()
+            right = operands.pop()
+            left = operands.pop()
+            operands.append(FuncType(left, right) if op == '→' else
+                            AndType(left, right) if op == '∧' else OrType(left, right))
+
+        expect_operand = True
+        while True:
+            kind, value, offset = token = self.peek()
+            if expect_operand:
+                if kind == 'name' and value in _TYPE_NAMES:
+                    operands.append(_TYPE_NAMES[value]())
+                    expect_operand = False
+                elif value == '(' and kind == 'symbol':
+                    operators.append('(')
+                else:
+                    self.error("Expected a type")
+            elif kind == 'symbol' and value in _TYPE_OPERATORS:
+                precedence, right_associative = _TYPE_OPERATORS[value]
+                while operators and operators[-1] != '(':
+                    top_precedence = _TYPE_OPERATORS[operators[-1]][0]
+                    if top_precedence > precedence or (top_precedence == precedence and not right_associative):
+                        reduce()
+                    else:
+                        break
+                operators.append(value)
+                expect_operand = True
+            elif kind == 'symbol' and value == ')' and '(' in operators:
+                while operators[-1] != '(':
+                    reduce()
+                operators.pop()
+            else:
+                break
+            self.position += 1
+
+        while operators:
+            if operators[-1] == '(':
+                self.error("Expected ')' to close the type")
+            reduce()
+        return operands[0]
+
+    def parse_injection_type(self):
+        """Parse the optional [T] subscript of inl/inr."""
+        if self.peek()[1] == '[':
+            self.next()
+            typ = self.parse_type()
+            self.expect(']')
+            return typ
+        return None
+
+    def parse_case_header(self, side, binder):
+        """Parse 'inl[T](a) ⇒' or 'inr[T](b) ⇒' of a case branch."""
+        self.expect(side, f"'{side}'")
+        self.parse_injection_type()
+        self.expect('(')
+        token = self.peek()
+        if self.expect_name() != binder:
+            self.error(f"The {side} branch of a case binds '{binder}'", token)
+        self.expect(')')
+        self.expect('⇒', "'⇒'")
+
+    def parse(self):
+        """Parse the whole text as one term."""
+        values = []
+        # Operator stack entries are tuples whose first item is their tag:
+        #   ('bin', op, precedence, token)      binary operator or application
+        #   ('lam', name, type, token)          λ whose body is being parsed
+        #   ('let', name, token)                let whose value is being parsed
+        #   ('let_in', name, token)             let whose body is being parsed
+        #   ('if', token) ('then', token) ('else', token)
+        #   ('(', token) ('pair', token) ('⟨', token) ('⟨pair', token)
+        #   ('fst', token) ('snd', token) ('fix', token) ('inl', type, token) ('inr', type, token)
+        #   ('case', token) ('case_left', token) ('case_right', token)
+        ops = []
+
+        def reduce_to_marker():
+            """Reduce binary operators, λs and complete ifs down to the nearest other marker."""
+            while ops:
+                tag = ops[-1][0]
+                if tag == 'bin':
+                    op = ops.pop()[1]
+                    right = values.pop()
+                    left = values.pop()
+                    values.append(App(left, right) if op == 'app' else BinOp(left, op, right))
+                elif tag == 'lam':
+                    _, name, typ, token = ops.pop()
+                    values.append(Abs(name, typ, values.pop()))
+                    if self.locations is not None:
+                        self.locations[values[-1]] = _line_column(self.text, token[2])
+                elif tag == 'let_in':
+                    name = ops.pop()[1]
+                    body = values.pop()
+                    values.append(Let(name, values.pop(), body))
+                elif tag == 'else':
+                    ops.pop()
+                    else_branch = values.pop()
+                    then_branch = values.pop()
+                    values.append(If(values.pop(), then_branch, else_branch))
+                else:
+                    return ops[-1]
+            return None
+
+        def marker_error(marker, token):
+            if marker is not None and marker[0] == 'if':
+                self.error("Expected 'then'", token)
+            elif marker is not None and marker[0] == 'then':
+                self.error("Expected 'else'", token)
+            elif marker is not None and marker[0] == 'case':
+                self.error("Expected 'of'", token)
+            elif marker is not None and marker[0] == 'let':
+                self.error("Expected 'in'", token)
+            elif marker is not None and token[0] is None:
+                name = _MARKER_NAMES.get(marker[0], marker[0])
+                raise ParseError(f"Unclosed {name!r}", self.text, marker[-1][2])
+            self.error("Unexpected token", token)
+
+        def close(expected, token):
+            """Reduce down to a marker whose tag is in expected and pop it."""
+            marker = reduce_to_marker()
+            if marker is None or marker[0] not in expected:
+                marker_error(marker, token)
+            return ops.pop()
+
+        expect_operand = True
+        while True:
+            token = self.next()
+            kind, value, offset = token
+
+            if expect_operand:
+                if kind == 'name':
+                    values.append(Var(value))
+                    expect_operand = False
+                elif kind == 'int':
+                    values.append(IntValue(value))
+                    expect_operand = False
+                elif kind == 'keyword' and value in ('true', 'false'):
+                    values.append(BoolValue(value == 'true'))
+                    expect_operand = False
+                elif kind == 'symbol' and value == '-' and self.peek()[0] == 'int':
+                    values.append(IntValue(-self.next()[1]))
+                    expect_operand = False
+                elif kind == 'symbol' and value in ('(', '⟨'):
+                    ops.append((value, token))
+                elif kind == 'symbol' and value == 'λ':
+                    name = self.expect_name()
+                    self.expect(':')
+                    typ = self.parse_type()
+                    self.expect('.')
+                    ops.append(('lam', name, typ, token))
+                elif kind == 'keyword' and value in ('fst', 'snd', 'fix'):
+                    self.expect('(')
+                    ops.append((value, token))
+                elif kind == 'keyword' and value in ('inl', 'inr'):
+                    typ = self.parse_injection_type()
+                    if typ is None:
+                        self.error(f"Expected '[' and the disjunction type of {value}")
+                    self.expect('(')
+                    ops.append((value, typ, token))
+                elif kind == 'keyword' and value in ('if', 'case'):
+                    ops.append((value, token))
+                elif kind == 'keyword' and value == 'let':
+                    name = self.expect_name()
+                    self.expect('=')
+                    ops.append(('let', name, token))
+                else:
+                    self.position -= 1
+                    self.error("Expected a term")
+                continue
+
+            # Expecting an operator or the end of the current term
+            if kind == 'symbol' and value in _PRECEDENCE or (
+                    kind in ('name', 'int') or
+                    kind == 'keyword' and value in ('true', 'false', 'fst', 'snd', 'fix', 'inl', 'inr', 'if', 'case', 'let') or
+                    kind == 'symbol' and value in ('(', '⟨', 'λ')):
+                if kind == 'symbol' and value in _PRECEDENCE:
+                    op = value
+                else:
+                    op = 'app'
+                    self.position -= 1  # The token starts the argument
+                precedence = _PRECEDENCE[op]
+                while ops and ops[-1][0] == 'bin' and ops[-1][2] >= precedence:
+                    _, top, _, _ = ops.pop()
+                    right = values.pop()
+                    left = values.pop()
+                    values.append(App(left, right) if top == 'app' else BinOp(left, top, right))
+                ops.append(('bin', op, precedence, token))
+                expect_operand = True
+
+            elif value == 'then' and kind == 'keyword':
+                marker = close(('if',), token)
+                ops.append(('then', marker[-1]))
+                expect_operand = True
+
+            elif value == 'else' and kind == 'keyword':
+                marker = close(('then',), token)
+                ops.append(('else', marker[-1]))
+                expect_operand = True
+
+            elif value == 'in' and kind == 'keyword':
+                marker = close(('let',), token)
+                ops.append(('let_in', marker[1], marker[-1]))
+                expect_operand = True
+
+            elif value == 'of' and kind == 'keyword':
+                marker = close(('case',), token)
+                self.expect('(')
+                self.parse_case_header('inl', 'a')
+                ops.append(('case_left', marker[-1]))
+                expect_operand = True
+
+            elif value == '|' and kind == 'symbol':
+                marker = close(('case_left',), token)
+                self.parse_case_header('inr', 'b')
+                ops.append(('case_right', marker[-1]))
+                expect_operand = True
+
+            elif value == ',' and kind == 'symbol':
+                marker = close(('(', '⟨'), token)
+                ops.append(('pair' if marker[0] == '(' else '⟨pair', marker[-1]))
+                expect_operand = True
+
+            elif value == ')' and kind == 'symbol':
+                marker = close(('(', 'pair', 'fst', 'snd', 'fix', 'inl', 'inr', 'case_right'), token)
+                tag = marker[0]
+                if tag == 'pair':
+                    right = values.pop()
+                    values.append(Pair(values.pop(), right))
+                elif tag == 'fst':
+                    values.append(Fst(values.pop()))
+                elif tag == 'snd':
+                    values.append(Snd(values.pop()))
+                elif tag == 'fix':
+                    values.append(Fix(values.pop()))
+                elif tag == 'inl':
+                    values.append(Inl(values.pop(), marker[1]))
+                elif tag == 'inr':
+                    values.append(Inr(values.pop(), marker[1]))
+                elif tag == 'case_right':
+                    right_case = values.pop()
+                    left_case = values.pop()
+                    values.append(Case(values.pop(), left_case, right_case))
+
+            elif value == '⟩' and kind == 'symbol':
+                close(('⟨pair',), token)
+                right = values.pop()
+                values.append(Pair(values.pop(), right))
+
+            elif kind is None:
+                marker = reduce_to_marker()
+                if marker is not None:
+                    marker_error(marker, token)
+                return values.pop()
+
+            else:
+                self.position -= 1
+                self.error("Expected an operator or the end of the term")
+
+
+def parse(text, locations=None):
+    """
+    Parse program text into an expression. Raises ParseError with the location of an error.
+
+    If a dict is given as locations, it receives the (line, column) of every Abs.
+    """
+    return _Parser(text, locations).parse()
+
+
+def parse_type(text):
+    """Parse a type."""
+    parser = _Parser(text)
+    typ = parser.parse_type()
+    if parser.peek()[0] is not None:
+        parser.error("Expected the end of the type")
+    return typ
+
+
+def format_expr(expr):
+    """Print an expression in the surface syntax, fully parenthesized, so that parse reads it back."""
+    pieces = []
+    stack = [expr]
+    while stack:
+        item = stack.pop()
+        if isinstance(item, str):
+            pieces.append(item)
+        elif isinstance(item, Var):
+            pieces.append(item.name)
+        elif isinstance(item, BoolValue):
+            pieces.append('true' if item.value else 'false')
+        elif isinstance(item, IntValue):
+            # Parenthesized when negative, so that f (-1) is not read as f - 1
+            pieces.append(str(item.value) if item.value >= 0 else f"({item.value})")
+        else:
+            # Push the parts of a compound node in reverse order
+            parts = _format_parts(item)
+            stack.extend(reversed(parts))
+    return ''.join(pieces)
+
+
+def _format_parts(expr):
+    if isinstance(expr, Abs):
+        return [f"(λ{expr.param_name}: {expr.param_type!r}. ", expr.body, ")"]
+    elif isinstance(expr, App):
+        return ["(", expr.func, " ", expr.arg, ")"]
+    elif isinstance(expr, BinOp):
+        return ["(", expr.left, f" {expr.op} ", expr.right, ")"]
+    elif isinstance(expr, If):
+        return ["(if ", expr.condition, " then ", expr.then_branch, " else ", expr.else_branch, ")"]
+    elif isinstance(expr, Pair):
+        return ["(", expr.left, ", ", expr.right, ")"]
+    elif isinstance(expr, Fst):
+        return ["fst(", expr.pair, ")"]
+    elif isinstance(expr, Snd):
+        return ["snd(", expr.pair, ")"]
+    elif isinstance(expr, Fix):
+        return ["fix(", expr.func, ")"]
+    elif isinstance(expr, Let):
+        return [f"(let {expr.name} = ", expr.value, " in ", expr.body, ")"]
+    elif isinstance(expr, Inl):
+        return [f"inl[{expr.typ!r}](", expr.value, ")"]
+    elif isinstance(expr, Inr):
+        return [f"inr[{expr.typ!r}](", expr.value, ")"]
+    elif isinstance(expr, Case):
+        return ["(case ", expr.expr, " of (inl(a) ⇒ ", expr.left_case, " | inr(b) ⇒ ", expr.right_case, "))"]
+    else:
+        raise TypeError(f"Unknown expression type: {expr}")
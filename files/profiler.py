@@ -0,0 +1,284 @@
+# Opt-in instrumentation of evaluation and type checking.
+#
+# A Profiler runs the real evaluator and type checker with instrumentation plugged in:
+# eval_expr with EvalHooks that count and time what it does, and type_check with a
+# counting check function. Programs that are not profiled pass no hooks.
+#
+# Time is attributed to function bodies. Each application of a closure enters a frame
+# labelled after its Abs: a user-supplied label, the source location recorded by
+# parse(text, locations), or λx#n (the n-th abstraction seen with parameter x). A tail
+# call replaces the caller's frame, as it replaces the Python frame in eval_expr.
+import time
+
+from .expressions import *
+from .value import *
+from .ifcondition import *
+from .binop import *
+from .conjuntiontypes import *
+from .disjunctions import *
+from .recursion import *
+from .letbinding import *
+from .interpreter import Env, EvalHooks, eval_expr, unfold_fix
+from .typechecker import _type_check
+
+
+class _ProfiledClosure(Closure):
+    """A closure that remembers the Abs it was made from, for its label."""
+    __slots__ = ('abs',)
+    def __init__(self, abs_node, env):
+        super().__init__(abs_node.param_name, abs_node.param_type, abs_node.body, env)
+        self.abs = abs_node
+
+
+class ProfileStats:
+    """Counters and timings for one kind of run (evaluation or type checking)."""
+    def __init__(self, root):
+        self.nodes = {}         # Node class name -> number of nodes visited
+        self.lookups = {}       # Env.lookup chain length (1 = found in the innermost Env) -> count
+        self.closures = 0       # Closures allocated
+        self.max_depth = 0      # Deepest nesting of the recursive evaluator or checker
+        self.calls = {}         # Label -> number of times its body was entered
+        self.total = {}         # Label -> seconds inside its body, counting recursion once
+        self.seconds = 0.0
+        # Call stacks form a tree: node id -> (parent id, label), with self time per node
+        self._tree = [(None, root)]
+        self._children = {}     # (parent id, label) -> node id
+        self._self_time = [0.0]
+        self._frames = []       # (tree node, label, start time) of the active bodies
+        self._active = {}       # Label -> number of active frames with that label
+        self._node = 0          # Tree node of the innermost frame
+        self._last = 0.0        # When time was last attributed
+
+    def _charge(self, now):
+        self._self_time[self._node] += now - self._last
+        self._last = now
+
+    def push(self, label):
+        now = time.perf_counter()
+        self._charge(now)
+        key = (self._node, label)
+        node = self._children.get(key)
+        if node is None:
+            node = self._children[key] = len(self._tree)
+            self._tree.append(key)
+            self._self_time.append(0.0)
+        self._frames.append((self._node, label, now))
+        self._node = node
+        self.calls[label] = self.calls.get(label, 0) + 1
+        self._active[label] = self._active.get(label, 0) + 1
+
+    def pop(self):
+        now = time.perf_counter()
+        self._charge(now)
+        self._node, label, start = self._frames.pop()
+        self._active[label] -= 1
+        if not self._active[label]:
+            self.total[label] = self.total.get(label, 0.0) + now - start
+
+    def active_frames(self):
+        return len(self._frames)
+
+    def start(self):
+        self._last = time.perf_counter()
+        return self._last
+
+    def stop(self, started):
+        while self._frames:
+            self.pop()
+        self._charge(time.perf_counter())
+        self.seconds += self._last - started
+
+    def self_times(self):
+        """Label -> seconds spent in its body itself, excluding the bodies it called."""
+        result = {}
+        for node, (_, label) in enumerate(self._tree):
+            result[label] = result.get(label, 0.0) + self._self_time[node]
+        return result
+
+    def collapsed(self, scale=1e6):
+        """Lines 'root;f;g count' of self time per call stack, in units of 1/scale seconds."""
+        lines = []
+        for node, seconds in enumerate(self._self_time):
+            count = round(seconds * scale)
+            if not count:
+                continue
+            path = []
+            while node is not None:
+                parent, label = self._tree[node]
+                path.append(label.replace(';', ',').replace(' ', '_'))
+                node = parent
+            lines.append(f"{';'.join(reversed(path))} {count}")
+        return lines
+
+
+class _ProfilingHooks(EvalHooks):
+    """What eval_expr does, recorded into a Profiler's eval_stats."""
+    def __init__(self, profiler):
+        self.profiler = profiler
+        self.stats = profiler.eval_stats
+
+    def enter(self):
+        profiler, stats = self.profiler, self.stats
+        profiler._depth += 1
+        if profiler._depth > stats.max_depth:
+            stats.max_depth = profiler._depth
+        return stats.active_frames()  # Frames above this are entered by this call
+
+    def leave(self, base):
+        stats = self.stats
+        while stats.active_frames() > base:
+            stats.pop()
+        self.profiler._depth -= 1
+
+    def visit(self, expr):
+        nodes = self.stats.nodes
+        name = type(expr).__name__
+        nodes[name] = nodes.get(name, 0) + 1
+
+    def call(self, closure, base):
+        stats = self.stats
+        if stats.active_frames() > base:
+            stats.pop()  # A tail call replaces the current frame
+        stats.push(self.profiler._body_label(closure))
+
+    def lookup(self, env, name):
+        length = 1
+        while name not in env.env:
+            env = env.parent
+            if env is None:
+                raise NameError(f"Variable '{name}' is not instantiated in the environment")
+            length += 1
+        lookups = self.stats.lookups
+        lookups[length] = lookups.get(length, 0) + 1
+        return env.env[name]
+
+    def closure(self, abs_node, env):
+        self.stats.closures += 1
+        return _ProfiledClosure(abs_node, env)
+
+    def fix_closure(self, func):
+        # As fix_closure does, keeping the Abs for the label
+        self.stats.closures += 1
+        env = Env(func.env)
+        closure = _ProfiledClosure(func.body, env)
+        env.extend(func.param_name, closure)
+        return closure
+
+    def unfold_fix(self, func):
+        self.stats.closures += 1
+        return unfold_fix(func)
+
+
+class Profiler:
+    """
+    Collects ProfileStats for programs run through its eval_expr and type_check methods.
+
+    labels maps Abs nodes to names for their bodies, and locations maps Abs nodes to
+    (line, column), as filled in by parse(text, locations).
+    """
+    def __init__(self, labels=None, locations=None):
+        self.labels = {} if labels is None else labels
+        self.locations = {} if locations is None else locations
+        self.eval_stats = ProfileStats('eval_expr')
+        self.check_stats = ProfileStats('type_check')
+        self._generated = {}  # Abs -> generated label
+        self._numbers = {}    # Parameter name -> number of generated labels
+        self._depth = 0
+
+    def label(self, abs_node, name=None):
+        """The label of an Abs, or set it to name."""
+        if name is not None:
+            self.labels[abs_node] = name
+            return name
+        if abs_node in self.labels:
+            return self.labels[abs_node]
+        if abs_node in self.locations:
+            line, column = self.locations[abs_node]
+            return f"λ{abs_node.param_name} (line {line}, column {column})"
+        label = self._generated.get(abs_node)
+        if label is None:
+            number = self._numbers[abs_node.param_name] = self._numbers.get(abs_node.param_name, 0) + 1
+            label = self._generated[abs_node] = f"λ{abs_node.param_name}#{number}"
+        return label
+
+    def _body_label(self, closure):
+        # Closures made by other evaluators (e.g. passed in env) do not know their Abs
+        if type(closure) is not _ProfiledClosure:
+            return f"λ{closure.param_name}"
+        return self.label(closure.abs)
+
+    # Evaluation
+
+    def eval_expr(self, expr, env):
+        """Evaluate like eval_expr(expr, env), recording into eval_stats."""
+        stats = self.eval_stats
+        self._depth = 0
+        started = stats.start()
+        try:
+            return eval_expr(expr, env, _ProfilingHooks(self))
+        finally:
+            stats.stop(started)
+
+    # Type checking
+
+    def type_check(self, expr, context):
+        """Type-check like type_check(expr, context), recording into check_stats."""
+        stats = self.check_stats
+        self._depth = 0
+        started = stats.start()
+        try:
+            return self._check(expr, context)
+        finally:
+            stats.stop(started)
+
+    def _check(self, expr, context):
+        stats = self.check_stats
+        name = type(expr).__name__
+        stats.nodes[name] = stats.nodes.get(name, 0) + 1
+        self._depth += 1
+        if self._depth > stats.max_depth:
+            stats.max_depth = self._depth
+        is_abs = isinstance(expr, Abs)
+        if is_abs:
+            stats.push(self.label(expr))
+        try:
+            return _type_check(expr, context, self._check)
+        finally:
+            if is_abs:
+                stats.pop()
+            self._depth -= 1
+
+    # Reports
+
+    def summary(self):
+        """A text table of the collected statistics."""
+        lines = []
+        for title, stats in (("eval_expr", self.eval_stats), ("type_check", self.check_stats)):
+            visited = sum(stats.nodes.values())
+            if not visited:
+                continue
+            lines.append(f"{title}: {visited} nodes in {stats.seconds:.6f}s, max depth {stats.max_depth}"
+                         + (f", {stats.closures} closures" if title == "eval_expr" else ""))
+            lines.append(f"  {'node':<24}{'count':>12}")
+            for name, count in sorted(stats.nodes.items(), key=lambda item: -item[1]):
+                lines.append(f"  {name:<24}{count:>12}")
+            if stats.lookups:
+                count = sum(stats.lookups.values())
+                mean = sum(length * n for length, n in stats.lookups.items()) / count
+                lines.append(f"  Env.lookup: {count} lookups, mean chain length {mean:.2f}, "
+                             f"max {max(stats.lookups)}")
+            if stats.calls:
+                self_times = stats.self_times()
+                lines.append(f"  {'function':<40}{'calls':>10}{'total s':>12}{'self s':>12}")
+                for label in sorted(stats.calls, key=lambda label: -stats.total.get(label, 0.0)):
+                    lines.append(f"  {label:<40}{stats.calls[label]:>10}"
+                                 f"{stats.total.get(label, 0.0):>12.6f}{self_times.get(label, 0.0):>12.6f}")
+        return '\n'.join(lines)
+
+    def collapsed(self):
+        """Collapsed stacks ('frame;frame;frame microseconds' per line) for flamegraph tools."""
+        return '\n'.join(self.eval_stats.collapsed() + self.check_stats.collapsed()) + '\n'
+
+    def write_collapsed(self, path):
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(self.collapsed())
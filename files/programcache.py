@@ -0,0 +1,289 @@
+# Content-addressed cache of type-checked and compiled programs.
+#
+# A program is keyed by a structural hash of its tree, a Merkle hash built bottom-up
+# from each node's children's digests: two separately parsed copies of the same text
+# get the same key, and a program that shares subterms is hashed once per node. A
+# submission that hits the cache skips type_check, optimize and compile_expr and goes
+# straight to running the compiled code.
+#
+# Entries live in an in-memory LRU bounded by the total number of nodes it holds, and,
+# if a directory is given, in one file per program there, which survives the process.
+# A file holds a checksum, the program's type and its binary encoding (see
+# serialize.py); the compiled form cannot be stored, so it is rebuilt on a disk hit, but
+# type checking is still skipped. A file that fails its checksum, cannot be decoded or
+# decodes to a program with another key is a miss, and is overwritten. The checksum
+# catches damage, not tampering: only trust a cache directory you would trust to hold
+# your programs.
+import hashlib
+import os
+import struct
+import tempfile
+from collections import OrderedDict
+from weakref import WeakKeyDictionary
+
+from .expressions import *
+from .types import *
+from .logicaltypes import *
+from .value import *
+from .ifcondition import *
+from .binop import *
+from .conjuntiontypes import *
+from .disjunctions import *
+from .recursion import *
+from .letbinding import *
+from .interpreter import Env
+from .typechecker import TypeCache, TypeContext, type_check
+from .compiler import compile_expr
+from .optimizer import optimize
+from .parser import parse_type
+from .serialize import decode_program, encode_program
+
+DIGEST_SIZE = 16
+
+_TYPE_TAGS = {IntType: b'I', BoolType: b'B', TrueType: b'T', FalseType: b'F',
+              FuncType: b'>', AndType: b'&', OrType: b'|'}
+
+_type_digests = WeakKeyDictionary()  # Types are interned, so each is hashed once
+
+
+def _text(name):
+    data = name.encode('utf-8')
+    return struct.pack('<I', len(data)) + data
+
+
+def type_digest(typ):
+    """Structural hash of a type, as bytes."""
+    digest = _type_digests.get(typ)
+    if digest is None:
+        h = hashlib.blake2b(_TYPE_TAGS[type(typ)], digest_size=DIGEST_SIZE)
+        if isinstance(typ, FuncType):
+            h.update(type_digest(typ.param_type) + type_digest(typ.return_type))
+        elif isinstance(typ, (AndType, OrType)):
+            h.update(type_digest(typ.left) + type_digest(typ.right))
+        digest = _type_digests[typ] = h.digest()
+    return digest
+
+
+# Node class -> (tag, function giving everything but the children that distinguishes a
+# node, function giving its children)
+_NODE_ENCODINGS = {
+    Var: (b'v', lambda node: _text(node.name), None),
+    Abs: (b'l', lambda node: _text(node.param_name) + type_digest(node.param_type), lambda node: (node.body,)),
+    App: (b'a', None, lambda node: (node.func, node.arg)),
+    IntValue: (b'i', lambda node: _text(str(node.value)), None),
+    BoolValue: (b'b', lambda node: b'1' if node.value else b'0', None),
+    BinOp: (b'o', lambda node: _text(node.op), lambda node: (node.left, node.right)),
+    If: (b'?', None, lambda node: (node.condition, node.then_branch, node.else_branch)),
+    Pair: (b'p', None, lambda node: (node.left, node.right)),
+    Fst: (b'1', None, lambda node: (node.pair,)),
+    Snd: (b'2', None, lambda node: (node.pair,)),
+    Inl: (b'<', lambda node: type_digest(node.typ), lambda node: (node.value,)),
+    Inr: (b'>', lambda node: type_digest(node.typ), lambda node: (node.value,)),
+    Case: (b'c', None, lambda node: (node.expr, node.left_case, node.right_case)),
+    Fix: (b'f', None, lambda node: (node.func,)),
+    Let: (b'=', lambda node: _text(node.name), lambda node: (node.value, node.body)),
+}
+
+
+def _merkle_hash(expr):
+    """
+    The structural hash of expr and its number of distinct nodes. Each node's digest
+    hashes its tag, its payload and its children's digests, and is computed once per
+    node object, so a program that shares subterms is hashed in time linear in its
+    distinct nodes, not in the size of the tree it stands for.
+    """
+    digests = {}  # id(node) -> digest; expr keeps every node alive meanwhile
+    leaves = {}   # Encoding of a leaf -> its digest
+    stack = [(expr, None)]  # (node, its children once they are on the stack above it)
+    while stack:
+        node, children = stack.pop()
+        if id(node) in digests:
+            continue
+        encoding = _NODE_ENCODINGS.get(type(node))
+        if encoding is None:
+            raise TypeError(f"Unknown expression type: {node}")
+        tag, payload, get_children = encoding
+        if get_children is None:
+            # A leaf: equal leaves, such as the uses of one variable, are hashed once
+            data = tag + payload(node)
+            digest = leaves.get(data)
+            if digest is None:
+                digest = leaves[data] = hashlib.blake2b(data, digest_size=DIGEST_SIZE).digest()
+            digests[id(node)] = digest
+        elif children is None:
+            children = get_children(node)
+            stack.append((node, children))
+            stack.extend([(child, None) for child in children if id(child) not in digests])
+        else:
+            h = hashlib.blake2b(tag, digest_size=DIGEST_SIZE)
+            if payload is not None:
+                h.update(payload(node))
+            # Every tag has a fixed number of children and digests a fixed size, so the
+            # concatenation is unambiguous
+            for child in children:
+                h.update(digests[id(child)])
+            digests[id(node)] = h.digest()
+    return digests[id(expr)], len(digests)
+
+
+def structural_hash(expr):
+    """
+    Hash of an expression's structure, as bytes: equal trees get equal hashes, whichever
+    objects they are made of and however they share subterms. Bound variable names
+    count, so λx. x and λy. y differ.
+    """
+    return _merkle_hash(expr)[0]
+
+
+class CachedProgram:
+    """A closed, type-checked program with its optimized and compiled forms, built on first use."""
+    __slots__ = ('key', 'expr', 'type', 'size', 'optimize', '_optimized', '_code')
+    def __init__(self, key, expr, typ, size, optimize=False):
+        self.key = key              # Hex structural hash
+        self.expr = expr
+        self.type = typ
+        self.size = size            # Number of distinct nodes, what the memory budget counts
+        self.optimize = optimize    # Whether to compile the optimized program
+        self._optimized = None
+        self._code = None
+
+    @property
+    def optimized(self):
+        if self._optimized is None:
+            self._optimized, _ = optimize(self.expr)
+        return self._optimized
+
+    @property
+    def code(self):
+        """The program compiled by compile_expr: a function of an Env."""
+        if self._code is None:
+            self._code = compile_expr(self.optimized if self.optimize else self.expr)
+        return self._code
+
+    def run(self, env=None):
+        return self.code(Env() if env is None else env)
+
+    def __repr__(self):
+        return f"<CachedProgram {self.key[:12]} : {self.type}, {self.size} nodes>"
+
+
+class ProgramCache:
+    """
+    Cache of closed programs keyed by structural hash, see the module comment.
+
+    max_nodes bounds the total size of the programs kept in memory; the least recently
+    used are evicted first (a single program larger than the bound is still kept until
+    the next one arrives). A program's size is its number of distinct node objects,
+    the memory it holds, so a DAG counts each shared subterm once. Programs are
+    type-checked through a TypeCache, which checks each shared subterm once and
+    subterms already seen in other programs not at all. If directory is given,
+    programs are also stored there.
+    With optimize=True, the compiled form is compiled from the optimized program.
+    """
+    def __init__(self, max_nodes=1_000_000, directory=None, optimize=False):
+        self.max_nodes = max_nodes
+        self.directory = directory
+        self.optimize = optimize
+        self.entries = OrderedDict()  # Hex key -> CachedProgram, least recently used first
+        self.nodes = 0                # Total size of the entries
+        self.hits = 0                 # Found in memory
+        self.disk_hits = 0            # Found in the directory
+        self.misses = 0               # Type-checked
+        self.evictions = 0
+        self.type_cache = TypeCache(max_size=max_nodes)
+        if directory is not None:
+            os.makedirs(directory, exist_ok=True)
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __contains__(self, expr):
+        return structural_hash(expr).hex() in self.entries
+
+    def get(self, expr):
+        """
+        The CachedProgram for a closed expression, type-checking it on a miss. Raises
+        TypeError if the program is ill-typed (which is not cached).
+        """
+        digest, size = _merkle_hash(expr)
+        key = digest.hex()
+        entry = self.entries.get(key)
+        if entry is not None:
+            self.hits += 1
+            self.entries.move_to_end(key)
+            return entry
+
+        entry = self._load(key)
+        if entry is not None:
+            self.disk_hits += 1
+        else:
+            self.misses += 1
+            entry = CachedProgram(key, expr, type_check(expr, TypeContext(), self.type_cache), size, self.optimize)
+            self._store(entry)
+        self._insert(entry)
+        return entry
+
+    def run(self, expr, env=None):
+        """Evaluate a closed expression with its cached compiled code."""
+        return self.get(expr).run(env)
+
+    def _insert(self, entry):
+        self.entries[entry.key] = entry
+        self.nodes += entry.size
+        while self.nodes > self.max_nodes and len(self.entries) > 1:
+            _, evicted = self.entries.popitem(last=False)
+            self.nodes -= evicted.size
+            self.evictions += 1
+
+    def _path(self, key):
+        return os.path.join(self.directory, key + '.stlc')
+
+    def _store(self, entry):
+        if self.directory is None:
+            return
+        type_text = repr(entry.type).encode('utf-8')
+        data = struct.pack('<I', len(type_text)) + type_text + encode_program(entry.expr)
+        data = hashlib.blake2b(data, digest_size=DIGEST_SIZE).digest() + data
+        # Write to a temporary file and rename, so readers never see a partial file
+        fd, temporary = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.replace(temporary, self._path(entry.key))
+        except BaseException:
+            os.unlink(temporary)
+            raise
+
+    def _load(self, key):
+        if self.directory is None:
+            return None
+        try:
+            with open(self._path(key), 'rb') as f:
+                data = f.read()
+        except FileNotFoundError:
+            return None
+        checksum, data = data[:DIGEST_SIZE], data[DIGEST_SIZE:]
+        if hashlib.blake2b(data, digest_size=DIGEST_SIZE).digest() != checksum:
+            return None
+        try:
+            (length,) = struct.unpack_from('<I', data, 0)
+            typ = parse_type(data[4:4 + length].decode('utf-8'))
+            arena, root = decode_program(data[4 + length:])
+            expr = arena.to_expr(root)
+            digest, size = _merkle_hash(expr)
+        except Exception:
+            return None  # Whatever the damage, the file is a miss
+        if digest.hex() != key:
+            return None
+        return CachedProgram(key, expr, typ, size, self.optimize)
+
+    def clear(self):
+        """Empty the in-memory cache and reset the counters. The directory is kept."""
+        self.entries.clear()
+        self.nodes = 0
+        self.hits = self.disk_hits = self.misses = self.evictions = 0
+        self.type_cache = TypeCache(max_size=self.max_nodes)
+
+    def stats(self):
+        return {'entries': len(self.entries), 'nodes': self.nodes, 'hits': self.hits,
+                'disk_hits': self.disk_hits, 'misses': self.misses, 'evictions': self.evictions}
@@ -0,0 +1,393 @@
+# Proof search: find a term of a given type, so that a proposition built from →, ∧, ∨,
+# True and False is proved rather than only checked (Curry-Howard).
+#
+# The search is Dyckhoff's contraction-free sequent calculus (G4ip, also called LJT).
+# Hypotheses are decomposed eagerly: a conjunction into its two halves, A → B together
+# with A into B, (C ∧ D) → B into C → D → B, and (C ∨ D) → B into C → B and D → B.
+# Each of these uses up the hypothesis it decomposes, so no rule copies a hypothesis
+# and the search terminates without a depth bound. The only choices left are which
+# side of a disjunctive goal to prove and which hypothesis (C → D) → B to use, and
+# those are backtracked over.
+#
+# A sequent is the set of its hypotheses' types and the goal, so its proof does not
+# depend on variable names. Proved and unprovable sequents are tabled in a ProofSearch,
+# which can be kept across queries, and a sequent met again while it is being searched
+# fails instead of looping (G4ip never does this; it guards the tables).
+#
+# Int, Bool and True are atoms, proved only by an assumption: Int and Bool are read as
+# propositional variables, not through their literals, and the language has no term of
+# type True. False is eliminated by fix (λf: False → C. f), a function that can never
+# be applied, as no value has type False. Case binders are always named a and b, so
+# each branch renames its binder, let h_7 = a in ..., as normalize does.
+from .expressions import *
+from .types import *
+from .conjuntiontypes import *
+from .disjunctions import *
+from .logicaltypes import *
+from .recursion import *
+from .letbinding import *
+from .typechecker import TypeContext
+
+_FALSE = FalseType()
+
+# Proofs are tuples whose first element names the last rule:
+#   ('hyp',)                                  the goal is a hypothesis
+#   ('absurd',)                               False is a hypothesis
+#   ('lam', steps, body)                      goal A → B, body proves B from A
+#   ('pair', left, right)                     goal A ∧ B
+#   ('inl', proof), ('inr', proof)            goal A ∨ B
+#   ('case', A ∨ B, left_steps, left, right_steps, right)
+#   ('imp', (C → D) → B, steps, proof of D, rest_steps, rest)
+# where steps are the hypotheses derived when new ones are added, as
+# (derived type, operation, parent types...).
+_HYP = ('hyp',)
+_ABSURD = ('absurd',)
+
+
+def _saturate(context, new):
+    """
+    Add the types in new to the hypotheses in context (a dict used as an ordered set),
+    decomposing them. Returns (steps, hypotheses); the hypotheses left are atoms,
+    disjunctions and implications that cannot fire yet.
+    """
+    hypotheses = dict(context)
+    steps = []
+    pending = list(reversed(new))
+    while pending:
+        typ = pending.pop()
+        if typ in hypotheses:
+            continue
+        if typ is _FALSE:
+            return tuple(steps), {_FALSE: None}  # Proves anything, the rest does not matter
+
+        if isinstance(typ, AndType):
+            steps.append((typ.left, 'fst', typ))
+            steps.append((typ.right, 'snd', typ))
+            pending.extend((typ.right, typ.left))
+            continue
+        if isinstance(typ, FuncType):
+            param = typ.param_type
+            if param in hypotheses:
+                steps.append((typ.return_type, 'app', typ, param))
+                pending.append(typ.return_type)
+                continue
+            elif isinstance(param, AndType):
+                curried = FuncType(param.left, FuncType(param.right, typ.return_type))
+                steps.append((curried, 'curry', typ))
+                pending.append(curried)
+                continue
+            elif isinstance(param, OrType):
+                left = FuncType(param.left, typ.return_type)
+                right = FuncType(param.right, typ.return_type)
+                steps.append((left, 'left', typ))
+                steps.append((right, 'right', typ))
+                pending.extend((right, left))
+                continue
+            elif param is _FALSE:
+                continue  # False → B always holds, so it adds nothing
+
+        hypotheses[typ] = None
+        # Implications waiting for typ can now fire
+        fired = [f for f in hypotheses if isinstance(f, FuncType) and f.param_type is typ]
+        for func in fired:
+            del hypotheses[func]
+            if func.return_type not in hypotheses:
+                steps.append((func.return_type, 'app', func, typ))
+                pending.append(func.return_type)
+    return tuple(steps), hypotheses
+
+
+def _without(hypotheses, typ):
+    rest = dict(hypotheses)
+    del rest[typ]
+    return rest
+
+
+class ProofSearch:
+    """
+    Tables of searched sequents, shared across calls to prove: a sequent proved or
+    refuted once is answered from the table by every later query that reaches it.
+    """
+    def __init__(self):
+        self.table = {}       # (frozenset of hypothesis types, goal) -> proof, or None if unprovable
+        self.active = set()   # Sequents being searched, for loop detection
+        self.hits = 0
+        self.misses = 0
+
+    def search(self, hypotheses, goal):
+        """A proof of goal from hypotheses (saturated, see _saturate), or None."""
+        key = (frozenset(hypotheses), goal)
+        if key in self.table:
+            self.hits += 1
+            return self.table[key]
+        if key in self.active:
+            return None
+        self.misses += 1
+        self.active.add(key)
+        try:
+            proof = self._search(hypotheses, goal)
+        finally:
+            self.active.discard(key)
+        self.table[key] = proof
+        return proof
+
+    def _search(self, hypotheses, goal):
+        if _FALSE in hypotheses:
+            return _ABSURD
+        if goal in hypotheses:
+            return _HYP
+
+        # Invertible rules: applying them never loses a proof
+        if isinstance(goal, FuncType):
+            steps, extended = _saturate(hypotheses, [goal.param_type])
+            body = self.search(extended, goal.return_type)
+            return None if body is None else ('lam', steps, body)
+
+        if isinstance(goal, AndType):
+            left = self.search(hypotheses, goal.left)
+            if left is None:
+                return None
+            right = self.search(hypotheses, goal.right)
+            return None if right is None else ('pair', left, right)
+
+        for disjunction in hypotheses:
+            if isinstance(disjunction, OrType):
+                rest = _without(hypotheses, disjunction)
+                left_steps, left_hypotheses = _saturate(rest, [disjunction.left])
+                left = self.search(left_hypotheses, goal)
+                if left is None:
+                    return None
+                right_steps, right_hypotheses = _saturate(rest, [disjunction.right])
+                right = self.search(right_hypotheses, goal)
+                if right is None:
+                    return None
+                return ('case', disjunction, left_steps, left, right_steps, right)
+
+        # Choices, backtracked over
+        if isinstance(goal, OrType):
+            left = self.search(hypotheses, goal.left)
+            if left is not None:
+                return ('inl', left)
+            right = self.search(hypotheses, goal.right)
+            if right is not None:
+                return ('inr', right)
+
+        for implication in hypotheses:
+            if isinstance(implication, FuncType) and isinstance(implication.param_type, FuncType):
+                # From (C → D) → B: prove D from C and D → B, then go on with B
+                rest = _without(hypotheses, implication)
+                inner = implication.param_type
+                steps, extended = _saturate(rest, [inner.param_type,
+                                                   FuncType(inner.return_type, implication.return_type)])
+                proof = self.search(extended, inner.return_type)
+                if proof is None:
+                    continue
+                rest_steps, rest_hypotheses = _saturate(rest, [implication.return_type])
+                rest_proof = self.search(rest_hypotheses, goal)
+                if rest_proof is not None:
+                    return ('imp', implication, steps, proof, rest_steps, rest_proof)
+        return None
+
+    def clear(self):
+        self.table.clear()
+        self.hits = self.misses = 0
+
+    def stats(self):
+        return {'sequents': len(self.table), 'hits': self.hits, 'misses': self.misses}
+
+
+def _subproofs(proof):
+    rule = proof[0]
+    if rule == 'lam':
+        return (proof[2],)
+    elif rule in ('pair', 'inl', 'inr'):
+        return proof[1:]
+    elif rule in ('case', 'imp'):
+        return (proof[3], proof[5])
+    return ()
+
+
+def _shared(proof):
+    """The ids of the subproofs that the proof DAG reaches more than once."""
+    seen, shared = set(), set()
+    stack = [proof]
+    while stack:
+        for subproof in _subproofs(stack.pop()):
+            if subproof is _HYP or subproof is _ABSURD:
+                continue
+            if id(subproof) in seen:
+                shared.add(id(subproof))
+            else:
+                seen.add(id(subproof))
+                stack.append(subproof)
+    return shared
+
+
+class _Extractor:
+    """
+    Builds the term of a proof, naming each hypothesis it uses with a let. A tabled
+    subproof that the proof reaches more than once becomes a lemma, a function of the
+    hypotheses it uses defined once at the top, so the term stays as small as the DAG.
+    """
+    def __init__(self, avoid, shared):
+        self.avoid = avoid    # Names that fresh names must avoid
+        self.count = 0
+        self.used = set()     # Names of hypotheses the term refers to
+        self.shared = shared  # Ids of the subproofs to make lemmas of
+        self.lemmas = {}      # id(proof) -> (name, types of its parameters)
+        self.definitions = [] # (name, term) of each lemma, each after those it uses
+
+    def fresh(self, name):
+        while True:
+            self.count += 1
+            fresh = f"{name}_{self.count}"
+            if fresh not in self.avoid:
+                return fresh
+
+    def var(self, env, typ):
+        name = env[typ]
+        self.used.add(name)
+        return Var(name)
+
+    def block(self, steps, proof, goal, env):
+        """The term of proof, under lets binding the derived hypotheses it uses."""
+        env = dict(env)
+        derived = []
+        for typ, op, *parents in steps:
+            # Parents are looked up now: a later step may derive the same type again
+            names = [env[parent] for parent in parents]
+            name = env[typ] = self.fresh('h')
+            derived.append((name, typ, op, names, parents))
+        body = self.term(proof, goal, env)
+        for name, typ, op, names, parents in reversed(derived):
+            if name in self.used:
+                self.used.update(names)
+                body = Let(name, self.step(typ, op, names, parents), body)
+        return body
+
+    def step(self, typ, op, names, parents):
+        if op == 'fst':
+            return Fst(Var(names[0]))
+        elif op == 'snd':
+            return Snd(Var(names[0]))
+        elif op == 'app':
+            return App(Var(names[0]), Var(names[1]))
+        func = Var(names[0])
+        conjunction_or_disjunction = parents[0].param_type
+        if op == 'curry':
+            # (C ∧ D) → B as λc: C. λd: D. f (c, d)
+            c, d = self.fresh('x'), self.fresh('x')
+            return Abs(c, conjunction_or_disjunction.left, Abs(d, conjunction_or_disjunction.right,
+                       App(func, Pair(Var(c), Var(d)))))
+        # (C ∨ D) → B as λc: C. f inl(c) or λd: D. f inr(d)
+        x = self.fresh('x')
+        injection = Inl if op == 'left' else Inr
+        return Abs(x, typ.param_type, App(func, injection(Var(x), conjunction_or_disjunction)))
+
+    def root(self, steps, proof, goal, env):
+        body = self.block(steps, proof, goal, env)
+        for name, definition in reversed(self.definitions):
+            body = Let(name, definition, body)
+        return body
+
+    def lemma(self, proof, goal, env):
+        lemma = self.lemmas.get(id(proof))
+        if lemma is None:
+            params = {typ: self.fresh('h') for typ in env}
+            body = self.rule(proof, goal, params)
+            used = [(typ, name) for typ, name in params.items() if name in self.used]
+            for typ, name in reversed(used):
+                body = Abs(name, typ, body)
+            name = self.fresh('lemma')
+            self.definitions.append((name, body))
+            lemma = self.lemmas[id(proof)] = (name, [typ for typ, _ in used])
+        name, param_types = lemma
+        expr = Var(name)
+        for typ in param_types:
+            expr = App(expr, self.var(env, typ))
+        return expr
+
+    def term(self, proof, goal, env):
+        if id(proof) in self.shared:
+            return self.lemma(proof, goal, env)
+        return self.rule(proof, goal, env)
+
+    def rule(self, proof, goal, env):
+        rule = proof[0]
+        if rule == 'hyp':
+            return self.var(env, goal)
+
+        elif rule == 'absurd':
+            f = self.fresh('f')
+            absurd = Fix(Abs(f, FuncType(_FALSE, goal), Var(f)))
+            return App(absurd, self.var(env, _FALSE))
+
+        elif rule == 'lam':
+            _, steps, body = proof
+            x = self.fresh('x')
+            env = {**env, goal.param_type: x}
+            return Abs(x, goal.param_type, self.block(steps, body, goal.return_type, env))
+
+        elif rule == 'pair':
+            return Pair(self.term(proof[1], goal.left, env), self.term(proof[2], goal.right, env))
+
+        elif rule == 'inl':
+            return Inl(self.term(proof[1], goal.left, env), goal)
+
+        elif rule == 'inr':
+            return Inr(self.term(proof[1], goal.right, env), goal)
+
+        elif rule == 'case':
+            _, disjunction, left_steps, left, right_steps, right = proof
+            scrutinee = self.var(env, disjunction)
+            branches = []
+            for binder, payload, steps, branch in (('a', disjunction.left, left_steps, left),
+                                                   ('b', disjunction.right, right_steps, right)):
+                name = self.fresh('h')
+                body = self.block(steps, branch, goal, {**env, payload: name})
+                branches.append(Let(name, Var(binder), body) if name in self.used else body)
+            return Case(scrutinee, *branches)
+
+        elif rule == 'imp':
+            # f : (C → D) → B. With g = λd: D. f (λc: C. d) : D → B, the proof of D from
+            # c : C and g gives f (λc: C. ...) : B
+            _, implication, steps, inner_proof, rest_steps, rest = proof
+            inner = implication.param_type
+            f = self.var(env, implication)
+            c, g = self.fresh('x'), self.fresh('h')
+            body = self.block(steps, inner_proof, inner.return_type,
+                              {**env, inner.param_type: c, FuncType(inner.return_type, implication.return_type): g})
+            if g in self.used:
+                d, unused = self.fresh('x'), self.fresh('x')
+                g_term = Abs(d, inner.return_type, App(f, Abs(unused, inner.param_type, Var(d))))
+                body = Let(g, g_term, body)
+            b = self.fresh('h')
+            rest_term = self.block(rest_steps, rest, goal, {**env, implication.return_type: b})
+            if b not in self.used:
+                return rest_term
+            return Let(b, App(f, Abs(c, inner.param_type, body)), rest_term)
+
+        raise ValueError(f"Unknown proof rule: {rule}")
+
+
+def prove(goal, context=None, search=None):
+    """
+    A term of type goal whose free variables are the assumptions in context (a
+    TypeContext), or None if there is none (see the module comment for how atoms are
+    read). Pass a ProofSearch to reuse its tables across calls.
+    """
+    context = TypeContext() if context is None else context
+    search = ProofSearch() if search is None else search
+    if {'a', 'b'} & set(context.context):
+        raise ValueError("An assumption named a or b would be captured by a case binder")
+    env = {}
+    for name, typ in context.context.items():
+        env[typ] = name
+    steps, hypotheses = _saturate({}, list(env))
+    try:
+        proof = search.search(hypotheses, goal)
+        if proof is None:
+            return None
+        return _Extractor(set(context.context), _shared(proof)).root(steps, proof, goal, env)
+    except RecursionError as e:
+        raise ValueError("Proposition too deeply nested to search") from e
@@ -0,0 +1,10 @@
+from .expressions import *
+
+class Fix(Expr):
+    """The fixed point of a function (fix E), where E has type (A → B) → (A → B)."""
+    __slots__ = ('func',)
+    def __init__(self, func):
+        self.func = func  # A function from the recursive function to itself
+
+    def __repr__(self):
+        return f"fix({self.func})"
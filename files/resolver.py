@@ -0,0 +1,207 @@
+# Lexical addressing: resolve variable names to slots in flat, array-backed frames.
+#
+# Every function body gets one frame (a Python list) laid out as
+#     [captured free variables..., parameter, case-bound variables...]
+# so a variable access is a single list index, and a closure only keeps the values of
+# its own free variables alive instead of the whole chain of environments.
+from .expressions import *
+from .value import *
+from .ifcondition import *
+from .binop import *
+from .conjuntiontypes import *
+from .disjunctions import *
+from .recursion import *
+from .letbinding import *
+
+
+class LocalVar(Expr):
+    """A variable resolved to a slot of the current frame."""
+    __slots__ = ('name', 'slot')
+    def __init__(self, name, slot):
+        self.name = name  # The original variable name, kept for printing
+        self.slot = slot  # Index into the current frame
+
+    def __repr__(self):
+        return f"{self.name}@{self.slot}"
+
+class FlatAbs(Expr):
+    """A lambda abstraction that captures only its free variables."""
+    __slots__ = ('param_name', 'param_type', 'body', 'captures', 'captured_names', 'frame_size', 'source')
+    def __init__(self, param_name, param_type, body, captures, captured_names, frame_size, source):
+        self.param_name = param_name
+        self.param_type = param_type
+        self.body = body                        # The resolved body
+        self.captures = captures                # Slots of the enclosing frame to copy, in order
+        self.captured_names = captured_names    # Names of the captured variables, same order
+        self.frame_size = frame_size            # Number of slots in the body's frame
+        self.source = source                    # The original Abs
+
+    def __repr__(self):
+        return f"(λ {self.param_name}: {self.param_type}. {self.body})"
+
+class FlatCase(Expr):
+    """A case expression whose bound variables 'a' and 'b' live in frame slots."""
+    __slots__ = ('expr', 'left_case', 'right_case', 'left_slot', 'right_slot')
+    def __init__(self, expr, left_case, right_case, left_slot, right_slot):
+        self.expr = expr
+        self.left_case = left_case
+        self.right_case = right_case
+        self.left_slot = left_slot    # Slot receiving the Inl value in the left case
+        self.right_slot = right_slot  # Slot receiving the Inr value in the right case
+
+    def __repr__(self):
+        return f"case {self.expr} of ({self.left_case}, {self.right_case})"
+
+class FlatLet(Expr):
+    """A let expression whose bound variable lives in a slot of the current frame."""
+    __slots__ = ('name', 'value', 'body', 'slot')
+    def __init__(self, name, value, body, slot):
+        self.name = name
+        self.value = value
+        self.body = body
+        self.slot = slot  # Slot receiving the value
+
+    def __repr__(self):
+        return f"(let {self.name}@{self.slot} = {self.value} in {self.body})"
+
+class ResolvedProgram:
+    """The result of resolving a whole expression."""
+    def __init__(self, body, free_names, frame_size):
+        self.body = body                # The resolved expression
+        self.free_names = free_names    # Free variables, in the order of their top-level slots
+        self.frame_size = frame_size    # Number of slots in the top-level frame
+
+    def __repr__(self):
+        return f"<resolved {self.body} free={self.free_names}>"
+
+
+class Scope:
+    """The slot layout of one frame while it is being resolved."""
+    def __init__(self, names):
+        self.bindings = {name: slot for slot, name in enumerate(names)}  # Visible name -> slot
+        self.size = len(names)
+
+    def new_slot(self):
+        self.size += 1
+        return self.size - 1
+
+
+def free_vars(expr, memo=None):
+    """Return the set of free variable names of an expression, memoized per node in memo."""
+    if memo is None:
+        memo = {}
+    if expr in memo:
+        return memo[expr]
+
+    if isinstance(expr, Var):
+        result = frozenset([expr.name])
+    elif isinstance(expr, Abs):
+        result = free_vars(expr.body, memo) - {expr.param_name}
+    elif isinstance(expr, App):
+        result = free_vars(expr.func, memo) | free_vars(expr.arg, memo)
+    elif isinstance(expr, (IntValue, BoolValue)):
+        result = frozenset()
+    elif isinstance(expr, (Pair, BinOp)):
+        result = free_vars(expr.left, memo) | free_vars(expr.right, memo)
+    elif isinstance(expr, (Fst, Snd)):
+        result = free_vars(expr.pair, memo)
+    elif isinstance(expr, (Inl, Inr)):
+        result = free_vars(expr.value, memo)
+    elif isinstance(expr, Case):
+        result = (free_vars(expr.expr, memo)
+                  | (free_vars(expr.left_case, memo) - {'a'})
+                  | (free_vars(expr.right_case, memo) - {'b'}))
+    elif isinstance(expr, Fix):
+        result = free_vars(expr.func, memo)
+    elif isinstance(expr, Let):
+        result = free_vars(expr.value, memo) | (free_vars(expr.body, memo) - {expr.name})
+    elif isinstance(expr, If):
+        result = (free_vars(expr.condition, memo)
+                  | free_vars(expr.then_branch, memo)
+                  | free_vars(expr.else_branch, memo))
+    else:
+        raise TypeError(f"Unknown expression type: {expr}")
+
+    memo[expr] = result
+    return result
+
+
+def _resolve(expr, scope, memo):
+    if isinstance(expr, Var):
+        # Every free variable of a frame was given a slot when the frame was laid out
+        return LocalVar(expr.name, scope.bindings[expr.name])
+
+    elif isinstance(expr, Abs):
+        captured = sorted(free_vars(expr.body, memo) - {expr.param_name})
+        inner = Scope(captured + [expr.param_name])
+        body = _resolve(expr.body, inner, memo)
+        captures = tuple(scope.bindings[name] for name in captured)
+        return FlatAbs(expr.param_name, expr.param_type, body, captures, tuple(captured), inner.size, expr)
+
+    elif isinstance(expr, App):
+        return App(_resolve(expr.func, scope, memo), _resolve(expr.arg, scope, memo))
+
+    elif isinstance(expr, (IntValue, BoolValue)):
+        return expr
+
+    elif isinstance(expr, Pair):
+        return Pair(_resolve(expr.left, scope, memo), _resolve(expr.right, scope, memo))
+
+    elif isinstance(expr, Fst):
+        return Fst(_resolve(expr.pair, scope, memo))
+
+    elif isinstance(expr, Snd):
+        return Snd(_resolve(expr.pair, scope, memo))
+
+    elif isinstance(expr, Inl):
+        return Inl(_resolve(expr.value, scope, memo), expr.typ)
+
+    elif isinstance(expr, Inr):
+        return Inr(_resolve(expr.value, scope, memo), expr.typ)
+
+    elif isinstance(expr, Case):
+        scrutinee = _resolve(expr.expr, scope, memo)
+        left_case, left_slot = _resolve_bound(expr.left_case, 'a', scope, memo)
+        right_case, right_slot = _resolve_bound(expr.right_case, 'b', scope, memo)
+        return FlatCase(scrutinee, left_case, right_case, left_slot, right_slot)
+
+    elif isinstance(expr, If):
+        return If(_resolve(expr.condition, scope, memo),
+                  _resolve(expr.then_branch, scope, memo),
+                  _resolve(expr.else_branch, scope, memo))
+
+    elif isinstance(expr, BinOp):
+        return BinOp(_resolve(expr.left, scope, memo), expr.op, _resolve(expr.right, scope, memo))
+
+    elif isinstance(expr, Fix):
+        return Fix(_resolve(expr.func, scope, memo))
+
+    elif isinstance(expr, Let):
+        value = _resolve(expr.value, scope, memo)
+        body, slot = _resolve_bound(expr.body, expr.name, scope, memo)
+        return FlatLet(expr.name, value, body, slot)
+
+    else:
+        raise TypeError(f"Unknown expression type: {expr}")
+
+
+def _resolve_bound(expr, name, scope, memo):
+    """Resolve expr with name bound to a fresh slot of the current frame."""
+    slot = scope.new_slot()
+    shadowed = scope.bindings.get(name)
+    scope.bindings[name] = slot
+    resolved = _resolve(expr, scope, memo)
+    if shadowed is None:
+        del scope.bindings[name]
+    else:
+        scope.bindings[name] = shadowed
+    return resolved, slot
+
+
+def resolve(expr):
+    """Resolve every variable of an expression to a frame slot."""
+    memo = {}
+    free_names = sorted(free_vars(expr, memo))
+    scope = Scope(free_names)
+    body = _resolve(expr, scope, memo)
+    return ResolvedProgram(body, free_names, scope.size)
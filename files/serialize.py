@@ -0,0 +1,180 @@
+# Compact binary encoding of programs, laid out so that a file can be memory-mapped and
+# used as an Arena without decoding the nodes.
+#
+# All integers are little-endian. The layout is
+#
+#     b'STLC', version (u8), 3 zero bytes
+#     node count, root, name count, constant count, type table size, arena type count (u32 each)
+#     names:      u32 byte length + UTF-8 bytes, per name
+#     constants:  u32 byte length + signed two's complement bytes, per constant
+#     type table: u8 tag + two u32 indices of earlier entries, per type, children first
+#     arena types: u32 index into the type table, per type of the arena
+#     zero padding to a multiple of 4 bytes
+#     ops: one byte per node, zero padding to a multiple of 4 bytes
+#     first, second, third: one i32 per node each
+import mmap
+import struct
+import sys
+from array import array
+
+from .types import *
+from .logicaltypes import *
+from .arena import *
+
+MAGIC = b'STLC'
+VERSION = 1
+
+_HEADER = struct.Struct('<4sB3x6I')
+_U32 = struct.Struct('<I')
+_TYPE_ENTRY = struct.Struct('<BII')
+
+# Type table tags
+_TYPE_TAGS = {IntType: 0, BoolType: 1, TrueType: 2, FalseType: 3, FuncType: 4, AndType: 5, OrType: 6}
+_TAG_TYPES = {tag: cls for cls, tag in _TYPE_TAGS.items()}
+
+
+def _type_children(typ):
+    if isinstance(typ, FuncType):
+        return (typ.param_type, typ.return_type)
+    elif isinstance(typ, (AndType, OrType)):
+        return (typ.left, typ.right)
+    return ()
+
+
+def _type_table(types):
+    """Flatten types and all their components into a list with children before parents."""
+    table = []
+    index = {}
+    for root in types:
+        stack = [root]
+        while stack:
+            typ = stack[-1]
+            if typ in index:
+                stack.pop()
+                continue
+            pending = [child for child in _type_children(typ) if child not in index]
+            if pending:
+                stack.extend(pending)
+                continue
+            stack.pop()
+            index[typ] = len(table)
+            table.append(typ)
+    return table, index
+
+
+def _padding(length):
+    return b'\0' * (-length % 4)
+
+
+def encode_arena(arena, root):
+    """Encode the program rooted at node root of an arena as bytes."""
+    table, type_index = _type_table(arena.types)
+    parts = [_HEADER.pack(MAGIC, VERSION, len(arena), root, len(arena.names), len(arena.consts),
+                          len(table), len(arena.types))]
+
+    for name in arena.names:
+        data = name.encode('utf-8')
+        parts.append(_U32.pack(len(data)))
+        parts.append(data)
+    for const in arena.consts:
+        data = const.to_bytes((const.bit_length() + 8) // 8, 'little', signed=True)
+        parts.append(_U32.pack(len(data)))
+        parts.append(data)
+    for typ in table:
+        if type(typ) not in _TYPE_TAGS:
+            raise TypeError(f"Cannot encode type {typ}")
+        children = [type_index[child] for child in _type_children(typ)] + [0, 0]
+        parts.append(_TYPE_ENTRY.pack(_TYPE_TAGS[type(typ)], children[0], children[1]))
+    for typ in arena.types:
+        parts.append(_U32.pack(type_index[typ]))
+    parts.append(_padding(sum(len(part) for part in parts)))
+
+    parts.append(bytes(arena.ops))
+    parts.append(_padding(len(arena)))
+    for field in (arena.first, arena.second, arena.third):
+        field = array('i', field)
+        if sys.byteorder != 'little':
+            field.byteswap()
+        parts.append(field.tobytes())
+    return b''.join(parts)
+
+
+def encode_program(expr):
+    """Encode an expression as bytes."""
+    arena, root = arena_from_expr(expr)
+    return encode_arena(arena, root)
+
+
+def decode_program(buffer):
+    """
+    Decode bytes (or any buffer, e.g. an mmap) produced by encode_program.
+
+    Returns an Arena and the index of the root. The names, constants and types are
+    decoded eagerly; the node arrays of the arena are views of the buffer, so nodes are
+    only read when they are used, and the arena cannot be extended.
+    """
+    view = memoryview(buffer)
+    if len(view) < _HEADER.size:
+        raise ValueError("Not an encoded program: too short")
+    magic, version, nodes, root, name_count, const_count, table_size, type_count = _HEADER.unpack_from(view, 0)
+    if magic != MAGIC:
+        raise ValueError("Not an encoded program: bad magic number")
+    if version != VERSION:
+        raise ValueError(f"Unsupported encoding version {version}")
+    offset = _HEADER.size
+
+    arena = Arena()
+    for _ in range(name_count):
+        (length,) = _U32.unpack_from(view, offset)
+        offset += 4
+        arena.names.append(str(view[offset:offset + length], 'utf-8'))
+        offset += length
+    for _ in range(const_count):
+        (length,) = _U32.unpack_from(view, offset)
+        offset += 4
+        arena.consts.append(int.from_bytes(view[offset:offset + length], 'little', signed=True))
+        offset += length
+    table = []
+    for _ in range(table_size):
+        tag, first, second = _TYPE_ENTRY.unpack_from(view, offset)
+        offset += _TYPE_ENTRY.size
+        cls = _TAG_TYPES[tag]
+        if cls in (FuncType, AndType, OrType):
+            table.append(cls(table[first], table[second]))
+        else:
+            table.append(cls())
+    for _ in range(type_count):
+        (index,) = _U32.unpack_from(view, offset)
+        offset += 4
+        arena.types.append(table[index])
+    offset += -offset % 4
+
+    arena.ops = view[offset:offset + nodes]
+    offset += nodes + (-nodes % 4)
+    fields = []
+    for _ in range(3):
+        field = view[offset:offset + 4 * nodes]
+        if len(field) != 4 * nodes:
+            raise ValueError("Not an encoded program: truncated")
+        if sys.byteorder == 'little':
+            field = field.cast('i')
+        else:
+            field = array('i', field.tobytes())
+            field.byteswap()
+        fields.append(field)
+        offset += 4 * nodes
+    arena.first, arena.second, arena.third = fields
+    return arena, root
+
+
+def save_program(expr, path):
+    """Write the binary encoding of an expression to a file."""
+    with open(path, 'wb') as f:
+        f.write(encode_program(expr))
+
+
+def load_program(path):
+    """Memory-map a file written by save_program. Returns an Arena and the index of the root."""
+    with open(path, 'rb') as f:
+        mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    return decode_program(mapped)
@@ -0,0 +1,341 @@
+# Evaluation service for untrusted programs: an asyncio front end that runs many
+# programs at once, each within a fuel budget (steps, see fuel.py) and a deadline.
+#
+#     python -m files.service                       JSON lines on stdin and stdout
+#     python -m files.service --socket /tmp/eval    the same protocol on a Unix socket
+#
+# A request is a JSON object {"id": ..., "program": "...", "fuel": n, "deadline": s},
+# where fuel and deadline are optional and capped by the service's limits; {"cancel":
+# id} cancels a request and {"stats": true} asks for the service statistics. Each
+# request gets one response {"id", "status", "type", "result", "steps", "seconds"}, in
+# completion order, where status is ok, parse_error, type_error, error (evaluation
+# raised), out_of_fuel, deadline, cancelled or rejected (a malformed request, over a
+# limit, or the service is full). Ids are strings or integers; a program is a string,
+# fuel an integer and deadline a number.
+#
+# Programs are parsed and type-checked, then queued as Evaluations. Workers take an
+# evaluation from the front of the queue, run one slice of slice_steps steps in a
+# thread pool and put it back at the end unless it finished, ran out of fuel or passed
+# its deadline, so a long program cannot hold up short ones. A slice also stops at the
+# deadline, and Ints are capped at max_int_bits bits (an error beyond), so that no step
+# runs long and every program is stopped soon after its limits. Slices run under the
+# GIL, one at a time; the pool keeps the event loop free to take requests while they run.
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from .interpreter import Env
+from .typechecker import TypeContext, type_check
+from .parser import ParseError, parse
+from .machine import Evaluation
+from .cli import _percentile
+
+
+class _Job:
+    __slots__ = ('request_id', 'evaluation', 'type', 'fuel', 'deadline', 'start', 'future', 'cancelled')
+    def __init__(self, request_id, evaluation, typ, fuel, deadline, start, future):
+        self.request_id = request_id
+        self.evaluation = evaluation
+        self.type = typ
+        self.fuel = fuel          # Total steps allowed
+        self.deadline = deadline  # time.monotonic() by which it must finish
+        self.start = start
+        self.future = future      # Resolved with the response
+        self.cancelled = False
+
+
+def _is_id(value):
+    """Whether value can identify a request: a string or an integer (not a bool)."""
+    return type(value) is str or type(value) is int
+
+
+def _prepare(text):
+    """Parse and type-check a program. Returns (expr, type) or (None, (status, message))."""
+    try:
+        expr = parse(text)
+    except (ParseError, RecursionError) as e:
+        return None, ('parse_error', str(e))
+    try:
+        return expr, type_check(expr, TypeContext())
+    except (TypeError, RecursionError) as e:
+        return None, ('type_error', str(e))
+
+
+class EvaluationService:
+    """
+    Runs submitted programs fairly across a pool of workers, see the module comment.
+
+    fuel and deadline are the defaults for a request, max_fuel and max_deadline the
+    most a request may ask for. At most max_pending programs are admitted at a time;
+    later ones are rejected until some finish. An operation whose Int result could have
+    more than max_int_bits bits raises OverflowError. Latencies of the last `window`
+    requests are kept for stats.
+    """
+    def __init__(self, workers=None, slice_steps=10_000, fuel=1_000_000, max_fuel=100_000_000,
+                 deadline=10.0, max_deadline=60.0, max_pending=1000, window=10_000,
+                 max_int_bits=1 << 16):
+        self.workers = workers or os.cpu_count() or 1
+        self.slice_steps = slice_steps
+        self.fuel = fuel
+        self.max_fuel = max_fuel
+        self.deadline = deadline
+        self.max_deadline = max_deadline
+        self.max_pending = max_pending
+        self.max_int_bits = max_int_bits
+        self.queue = None        # asyncio.Queue of _Jobs waiting for a slice
+        self.jobs = {}           # Request id -> _Job, for cancellation
+        self.pending = 0         # Programs admitted and not yet answered
+        self.statuses = {}       # Status -> number of responses
+        self.latencies = deque(maxlen=window)
+        self._executor = None
+        self._tasks = []
+        self._count = 0
+
+    async def __aenter__(self):
+        self.start()
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    def start(self):
+        self.queue = asyncio.Queue()
+        self._executor = ThreadPoolExecutor(self.workers)
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def close(self):
+        """Stop the workers. Programs still queued are answered as cancelled."""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        for job in list(self.jobs.values()):
+            self._finish(job, 'cancelled', "Service stopped")
+        self._executor.shutdown()
+
+    async def submit(self, text, fuel=None, deadline=None, request_id=None):
+        """Run a program given as text and return its response (a dict, see the module comment)."""
+        start = time.monotonic()
+        if request_id is None:
+            self._count += 1
+            request_id = self._count
+        fuel = self.fuel if fuel is None else fuel
+        deadline = self.deadline if deadline is None else deadline
+
+        def respond(status, result, typ=None):
+            return self._respond(request_id, status, result, typ, 0, start)
+
+        if not _is_id(request_id):
+            return respond('rejected', "id must be a string or an integer")
+        if type(text) is not str:
+            return respond('rejected', "program must be a string")
+        if not (type(fuel) is int and 0 < fuel <= self.max_fuel):
+            return respond('rejected', f"fuel must be an integer from 1 to {self.max_fuel}")
+        if not (type(deadline) in (int, float) and 0 < deadline <= self.max_deadline):
+            return respond('rejected', f"deadline must be more than 0 and at most {self.max_deadline}s")
+        if self.pending >= self.max_pending or request_id in self.jobs:
+            return respond('rejected', "Too many programs pending" if request_id not in self.jobs
+                           else f"Request {request_id} is already running")
+
+        self.pending += 1
+        try:
+            loop = asyncio.get_running_loop()
+            expr, typ = await loop.run_in_executor(self._executor, _prepare, text)
+        except BaseException:
+            self.pending -= 1
+            raise
+        if expr is None or not self._tasks:
+            self.pending -= 1
+            return respond(*typ) if expr is None else respond('cancelled', "Service stopped")
+
+        job = _Job(request_id, Evaluation(expr, Env(), self.max_int_bits), typ, fuel, start + deadline, start,
+                   loop.create_future())
+        self.jobs[request_id] = job
+        self.queue.put_nowait(job)
+        try:
+            return await asyncio.shield(job.future)
+        except asyncio.CancelledError:
+            job.cancelled = True  # The caller went away; the worker drops the job
+            raise
+
+    def cancel(self, request_id):
+        """Cancel a queued or running program. Returns whether there was one."""
+        job = self.jobs.get(request_id) if _is_id(request_id) else None
+        if job is None:
+            return False
+        job.cancelled = True
+        return True
+
+    async def _worker(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            job = await self.queue.get()
+            if job.cancelled:
+                self._finish(job, 'cancelled', "Cancelled")
+                continue
+            if time.monotonic() > job.deadline:
+                self._finish(job, 'deadline', f"Deadline passed after {job.evaluation.steps} steps")
+                continue
+            steps = min(self.slice_steps, job.fuel - job.evaluation.steps)
+            try:
+                done = await loop.run_in_executor(self._executor, job.evaluation.run, steps,
+                                                  job.deadline)
+                # Formatting can fail too, e.g. on an Int over the int-to-str digit limit
+                result = repr(job.evaluation.value) if done else None
+            except Exception as e:  # The program's error, e.g. a division by zero
+                self._finish(job, 'error', f"{type(e).__name__}: {e}")
+                continue
+            if done:
+                self._finish(job, 'ok', result)
+            elif job.evaluation.steps >= job.fuel:
+                self._finish(job, 'out_of_fuel', f"Out of fuel after {job.evaluation.steps} steps")
+            elif time.monotonic() > job.deadline:
+                self._finish(job, 'deadline', f"Deadline passed after {job.evaluation.steps} steps")
+            else:
+                self.queue.put_nowait(job)  # To the back: round robin
+
+    def _finish(self, job, status, result):
+        del self.jobs[job.request_id]
+        self.pending -= 1
+        typ = str(job.type) if status in ('ok', 'error') else None
+        response = self._respond(job.request_id, status, result, typ, job.evaluation.steps, job.start)
+        if not job.future.done():
+            job.future.set_result(response)
+
+    def _respond(self, request_id, status, result, typ, steps, start):
+        seconds = time.monotonic() - start
+        self.statuses[status] = self.statuses.get(status, 0) + 1
+        self.latencies.append(seconds)
+        return {'id': request_id, 'status': status, 'type': typ, 'result': result,
+                'steps': steps, 'seconds': round(seconds, 6)}
+
+    def stats(self):
+        """Queue depth, programs pending, response counts and latency percentiles in seconds."""
+        ordered = sorted(self.latencies)
+        percentiles = {f"p{p}": round(_percentile(ordered, p / 100), 6) if ordered else None
+                       for p in (50, 90, 99)}
+        return {'queue_depth': self.queue.qsize() if self.queue is not None else 0,
+                'pending': self.pending, 'statuses': dict(self.statuses),
+                'latency': percentiles}
+
+    # The JSON lines protocol
+
+    async def handle(self, reader, write):
+        """Answer requests read from an asyncio StreamReader, passing response lines to write."""
+        tasks = set()
+
+        async def answer(request):
+            response = await self.submit(request.get('program', ''), request.get('fuel'),
+                                         request.get('deadline'), request.get('id'))
+            write(json.dumps(response, ensure_ascii=False) + '\n')
+
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                if not line.strip():
+                    continue
+                try:
+                    request = json.loads(line)
+                    if not isinstance(request, dict):
+                        raise ValueError("a request must be a JSON object")
+                    if 'cancel' in request and not _is_id(request['cancel']):
+                        raise ValueError("the id to cancel must be a string or an integer")
+                except ValueError as e:
+                    write(json.dumps({'status': 'rejected', 'result': f"Bad request: {e}"}) + '\n')
+                    continue
+                if 'cancel' in request:
+                    self.cancel(request['cancel'])
+                elif 'stats' in request:
+                    write(json.dumps({'stats': self.stats()}) + '\n')
+                else:
+                    task = asyncio.create_task(answer(request))
+                    tasks.add(task)
+                    task.add_done_callback(tasks.discard)
+            if tasks:
+                await asyncio.wait(tasks)
+        finally:
+            for task in tasks:
+                task.cancel()
+
+
+async def _serve_stdio(service):
+    loop = asyncio.get_running_loop()
+    reader = asyncio.StreamReader()
+    await loop.connect_read_pipe(lambda: asyncio.StreamReaderProtocol(reader), sys.stdin)
+
+    def write(line):
+        sys.stdout.write(line)
+        sys.stdout.flush()
+
+    await service.handle(reader, write)
+
+
+async def _serve_socket(service, path):
+    async def connection(reader, writer):
+        try:
+            await service.handle(reader, lambda line: writer.write(line.encode('utf-8')))
+            await writer.drain()
+        finally:
+            writer.close()
+
+    server = await asyncio.start_unix_server(connection, path)
+    async with server:
+        await server.serve_forever()
+
+
+async def _serve(args):
+    async with EvaluationService(args.workers, args.slice, args.fuel, args.max_fuel, args.deadline,
+                                 args.max_deadline, args.max_pending,
+                                 max_int_bits=args.max_int_bits) as service:
+        if args.socket:
+            await _serve_socket(service, args.socket)
+        else:
+            await _serve_stdio(service)
+        print(json.dumps({'stats': service.stats()}), file=sys.stderr)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog='python -m files.service',
+        description="Serve fuel- and deadline-bounded evaluation of programs as JSON lines.")
+    parser.add_argument('--socket', default=None,
+                        help="serve on this Unix socket path instead of stdin and stdout")
+    parser.add_argument('-j', '--workers', type=int, default=None,
+                        help="number of workers (default: one per CPU)")
+    parser.add_argument('--slice', type=int, default=10_000,
+                        help="steps a program runs before the next one gets a turn (default: 10000)")
+    parser.add_argument('--fuel', type=int, default=1_000_000,
+                        help="default steps allowed per program (default: 1000000)")
+    parser.add_argument('--max-fuel', type=int, default=100_000_000,
+                        help="most steps a request may ask for (default: 100000000)")
+    parser.add_argument('--deadline', type=float, default=10.0,
+                        help="default seconds allowed per program (default: 10)")
+    parser.add_argument('--max-deadline', type=float, default=60.0,
+                        help="most seconds a request may ask for (default: 60)")
+    parser.add_argument('--max-pending', type=int, default=1000,
+                        help="programs admitted at once before new ones are rejected (default: 1000)")
+    parser.add_argument('--max-int-bits', type=int, default=1 << 16,
+                        help="most bits an Int may have before evaluation raises (default: 65536)")
+    args = parser.parse_args(argv)
+    if args.workers is not None and args.workers < 1:
+        parser.error("--workers must be at least 1")
+    if args.slice < 1:
+        parser.error("--slice must be at least 1")
+    if args.max_int_bits < 1:
+        parser.error("--max-int-bits must be at least 1")
+    try:
+        asyncio.run(_serve(args))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
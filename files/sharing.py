@@ -0,0 +1,323 @@
+# Hash-consing of expressions, common-subexpression elimination, and evaluation that
+# computes each shared closed subterm once.
+#
+# A NodeTable builds nodes through a table keyed on the class and the constructor
+# arguments, children included, so structurally equal subterms are one object and a
+# tree becomes a DAG. Nodes still compare by identity, so the other passes work on the
+# DAG unchanged: type_check with a TypeCache checks a shared node once (per typing of
+# its free variables), and Arena.add_expr stores it once. A shared open node may stand
+# for subterms under different bindings, so a table keyed on nodes alone must not
+# assume one type or value per node.
+#
+# eval_shared evaluates like eval_expr, but keeps the value of each closed node that
+# occurs more than once, computed where eval_expr would first compute it, for the rest
+# of the run. A subterm that raises or loops still does so at the same point.
+#
+# cse rewrites a program so that every engine shares the work: a repeated closed
+# subterm is bound once by a let, at the nearest node that all its occurrences lie
+# under. The let evaluates it even if no occurrence would have been reached, so only
+# subterms that cannot fail or loop are bound: no fix, no division and no case (which
+# may fail in eval_expr, as it binds a and b to the whole injection).
+from .expressions import *
+from .value import *
+from .ifcondition import *
+from .binop import *
+from .conjuntiontypes import *
+from .disjunctions import *
+from .recursion import *
+from .letbinding import *
+from .interpreter import Env, fix_closure, unfold_fix
+from .machine import apply_binop
+from .resolver import free_vars
+
+# Node class -> its constructor arguments, in order
+_ARGUMENTS = {
+    Var: ('name',),
+    Abs: ('param_name', 'param_type', 'body'),
+    App: ('func', 'arg'),
+    IntValue: ('value',),
+    BoolValue: ('value',),
+    BinOp: ('left', 'op', 'right'),
+    If: ('condition', 'then_branch', 'else_branch'),
+    Pair: ('left', 'right'),
+    Fst: ('pair',),
+    Snd: ('pair',),
+    Inl: ('value', 'typ'),
+    Inr: ('value', 'typ'),
+    Case: ('expr', 'left_case', 'right_case'),
+    Fix: ('func',),
+    Let: ('name', 'value', 'body'),
+}
+
+
+_NODES = (Expr, IntValue, BoolValue)  # Literals are values, not Exprs
+
+
+def _arguments(node):
+    fields = _ARGUMENTS.get(type(node))
+    if fields is None:
+        raise TypeError(f"Unknown expression type: {node}")
+    return [getattr(node, field) for field in fields]
+
+
+def _postorder(expr):
+    """The distinct nodes of expr, each after its children, and each node's children."""
+    order = []
+    children = {}
+    stack = [(expr, False)]
+    while stack:
+        node, expanded = stack.pop()
+        if expanded:
+            order.append(node)
+        elif node not in children:
+            node_children = children[node] = [argument for argument in _arguments(node)
+                                              if isinstance(argument, _NODES)]
+            stack.append((node, True))
+            stack.extend((child, False) for child in node_children if child not in children)
+    return order, children
+
+
+class NodeTable:
+    """
+    Hash-consing constructor for expression nodes: make returns the one node with the
+    given class and constructor arguments, building it on first request. Nodes made
+    through the table must not be mutated.
+    """
+    def __init__(self):
+        self.nodes = {}  # (class, constructor arguments) -> node
+        self.hits = 0    # Requests answered with an existing node
+
+    def __len__(self):
+        return len(self.nodes)
+
+    def make(self, cls, *args):
+        key = (cls, *args)
+        node = self.nodes.get(key)
+        if node is None:
+            node = self.nodes[key] = cls(*args)
+        else:
+            self.hits += 1
+        return node
+
+    def share(self, expr):
+        """The copy of expr (a tree or a DAG) made through the table: equal subterms are one node."""
+        shared = {}
+        order, _ = _postorder(expr)
+        for node in order:
+            args = [shared[arg] if isinstance(arg, _NODES) else arg for arg in _arguments(node)]
+            shared[node] = self.make(type(node), *args)
+        return shared[expr]
+
+
+def share(expr):
+    """The maximally shared copy of expr, built in a new NodeTable."""
+    return NodeTable().share(expr)
+
+
+def _occurrences(order, children):
+    """Node -> number of times it occurs in the tree the DAG stands for."""
+    counts = {node: 0 for node in order}
+    counts[order[-1]] = 1
+    for node in reversed(order):  # Parents before children
+        for child in children[node]:
+            counts[child] += counts[node]
+    return counts
+
+
+def _closed_nodes(order):
+    """The nodes of order with no free variables, leaving out constants."""
+    memo = {}
+    closed = set()
+    for node in order:  # Children first, so free_vars never recurses far
+        if not free_vars(node, memo) and not isinstance(node, (IntValue, BoolValue)):
+            closed.add(node)
+    return closed
+
+
+# Computing the value of a shared closed node
+
+_UNSET = object()
+
+
+def eval_shared(expr, env=None):
+    """
+    Evaluate expr like eval_expr, computing each closed subterm that occurs more than
+    once a single time. Subterms are shared when they are the same node, so build the
+    program with a NodeTable, or pass it through share, first.
+    """
+    order, children = _postorder(expr)
+    counts = _occurrences(order, children)
+    memo = {node: _UNSET for node in _closed_nodes(order) if counts[node] > 1}
+    return _eval(expr, Env() if env is None else env, memo)
+
+
+def _eval(expr, env, memo, lookup=True):
+    """eval_expr, with the values of the nodes in memo computed once."""
+    while True:
+        if lookup and expr in memo:
+            value = memo[expr]
+            if value is _UNSET:
+                value = memo[expr] = _eval(expr, env, memo, False)
+            return value
+        lookup = True
+
+        if isinstance(expr, Var):
+            return env.lookup(expr.name)
+
+        elif isinstance(expr, Abs):
+            return Closure(expr.param_name, expr.param_type, expr.body, env)
+
+        elif isinstance(expr, App):
+            func = _eval(expr.func, env, memo)
+            arg = _eval(expr.arg, env, memo)
+            if not isinstance(func, Closure):
+                raise TypeError(f"Expected a function, but got {func}")
+            env = Env(func.env)
+            env.extend(func.param_name, arg)
+            expr = func.body
+
+        elif isinstance(expr, (IntValue, BoolValue)):
+            return expr
+
+        elif isinstance(expr, Pair):
+            return Pair(_eval(expr.left, env, memo), _eval(expr.right, env, memo))
+
+        elif isinstance(expr, (Fst, Snd)):
+            pair = _eval(expr.pair, env, memo)
+            if not isinstance(pair, Pair):
+                raise TypeError(f"{'fst' if isinstance(expr, Fst) else 'snd'} can only be applied to a pair.")
+            return pair.left if isinstance(expr, Fst) else pair.right
+
+        elif isinstance(expr, Inl):
+            return InlValue(_eval(expr.value, env, memo))
+
+        elif isinstance(expr, Inr):
+            return InrValue(_eval(expr.value, env, memo))
+
+        elif isinstance(expr, Case):
+            value = _eval(expr.expr, env, memo)
+            env = Env(env)
+            if isinstance(value, InlValue):
+                env.extend('a', value)
+                expr = expr.left_case
+            elif isinstance(value, InrValue):
+                env.extend('b', value)
+                expr = expr.right_case
+            else:
+                raise TypeError("Expected a disjunction (Inl or Inr).")
+
+        elif isinstance(expr, If):
+            condition = _eval(expr.condition, env, memo)
+            if not isinstance(condition, BoolValue):
+                raise TypeError(f"Condition must evaluate to a Bool, but got {condition}")
+            expr = expr.then_branch if condition.value else expr.else_branch
+
+        elif isinstance(expr, BinOp):
+            left = _eval(expr.left, env, memo)
+            right = _eval(expr.right, env, memo)
+            return apply_binop(expr.op, left, right)
+
+        elif isinstance(expr, Let):
+            value = _eval(expr.value, env, memo)
+            env = Env(env)
+            env.extend(expr.name, value)
+            expr = expr.body
+
+        elif isinstance(expr, Fix):
+            func = _eval(expr.func, env, memo)
+            if not isinstance(func, Closure):
+                raise TypeError(f"fix expects a function, but got {func}")
+            if isinstance(func.body, Abs):
+                return fix_closure(func)
+            env = Env(func.env)
+            env.extend(func.param_name, unfold_fix(func))
+            expr = func.body
+
+        else:
+            raise TypeError(f"Unknown expression type: {expr}")
+
+
+# Common-subexpression elimination
+
+def _total(order, children):
+    """The nodes whose evaluation cannot fail or loop (given that they are well typed)."""
+    total = set()
+    for node in order:
+        if isinstance(node, (Fix, Case)) or (isinstance(node, BinOp) and node.op == '/'):
+            continue
+        if all(child in total for child in children[node]):
+            total.add(node)
+    return total
+
+
+def _dominators(order, children):
+    """Node -> the nearest other node that every path from the root to it goes through."""
+    parents = {node: [] for node in order}
+    for node in order:
+        for child in children[node]:
+            parents[child].append(node)
+    root = order[-1]
+    idom = {root: None}
+    depth = {root: 0}
+    for node in reversed(order[:-1]):  # Parents before children
+        dominator = None
+        for parent in parents[node]:
+            if dominator is None:
+                dominator = parent
+                continue
+            # The nearest common ancestor of dominator and parent in the dominator tree
+            while dominator is not parent:
+                if depth[dominator] >= depth[parent]:
+                    dominator = idom[dominator]
+                else:
+                    parent = idom[parent]
+        idom[node] = dominator
+        depth[node] = depth[dominator] + 1
+    return idom
+
+
+def cse(expr, table=None):
+    """
+    The program expr with each repeated closed subterm that cannot fail or loop bound
+    once by a let (named cse_1, cse_2, ...), see the module comment. The result is
+    built in table (a NodeTable, a new one if not given) and is a DAG.
+    """
+    table = NodeTable() if table is None else table
+    expr = table.share(expr)
+    order, children = _postorder(expr)
+    candidates = _closed_nodes(order) & _total(order, children)
+
+    # A subterm is bound if it would still be evaluated more than once, counting a
+    # bound subterm as evaluated once
+    uses = {node: 0 for node in order}
+    uses[expr] = 1
+    bound = set()
+    for node in reversed(order):
+        if node in candidates and uses[node] > 1:
+            bound.add(node)
+        for child in children[node]:
+            uses[child] += 1 if node in bound else uses[node]
+    if not bound:
+        return expr
+
+    names = {node.name for node in order if isinstance(node, (Var, Let))}
+    names |= {node.param_name for node in order if isinstance(node, Abs)}
+    fresh = (f"cse_{n}" for n in range(1, len(names) + len(bound) + 1) if f"cse_{n}" not in names)
+    position = {node: i for i, node in enumerate(order)}
+    idom = _dominators(order, children)
+    lets = {}  # Node -> the bound subterms whose let wraps it, innermost first
+    variables = {}
+    for node in sorted(bound, key=position.get, reverse=True):
+        variables[node] = table.make(Var, next(fresh))
+        lets.setdefault(idom[node], []).append(node)
+
+    rewritten = {}
+    for node in order:
+        args = [(variables[arg] if arg in bound else rewritten[arg]) if isinstance(arg, _NODES) else arg
+                for arg in _arguments(node)]
+        result = table.make(type(node), *args)
+        # Subterms bound here come after their own subterms in order, so they are rewritten
+        for subterm in lets.get(node, ()):
+            result = table.make(Let, variables[subterm].name, rewritten[subterm], result)
+        rewritten[node] = result
+    return rewritten[expr]
@@ -6,72 +6,184 @@ from .binop import *
 from .conjuntiontypes import *
 from .disjunctions import *
 from .logicaltypes import *
+from .recursion import *
+from .letbinding import *
+from .resolver import free_vars
+from collections import OrderedDict
+
+# Types are interned (see types.py), so these are the only Int and Bool type objects
+_INT = IntType()
+_BOOL = BoolType()
 
 # Type context to map variables to types
 class TypeContext:
-    def __init__(self):
-        self.context = {}
+    """
+    Variables and their types. extend returns a new context that refers to this one
+    instead of copying it, so binding a variable takes constant time and the contexts of
+    nested binders share their outer bindings. add binds in place, for building an
+    initial context; contexts extended from this one see the change.
+    """
+    def __init__(self, context=None):
+        self.bindings = {} if context is None else dict(context)  # This level's variables -> types
+        self.parent = None  # The context this one extends
+
+    @property
+    def context(self):
+        """All the bindings as a new dict, inner bindings shadowing outer ones."""
+        levels = []
+        node = self
+        while node is not None:
+            levels.append(node.bindings)
+            node = node.parent
+        merged = {}
+        for bindings in reversed(levels):
+            merged.update(bindings)
+        return merged
 
     def add(self, var, typ):
         """Add a variable with its type to the context."""
         if not isinstance(typ, Type):
             raise TypeError(f"Second argument must be of type Type, got type {type(typ)}")
-        self.context[var] = typ
+        self.bindings[var] = typ
+
+    def get(self, var):
+        """The type of a variable, or None if it is not bound."""
+        node = self
+        while node is not None:
+            typ = node.bindings.get(var)
+            if typ is not None:
+                return typ
+            node = node.parent
+        return None
 
     def lookup(self, var):
         """Return the type of a variable, or raise an error if it's not found."""
-        if var not in self.context:
+        typ = self.get(var)
+        if typ is None:
             raise TypeError(f"Variable {var} not found in context")
-        return self.context[var]
+        return typ
+
+    def extend(self, var, typ):
+        """Return a new context with var bound to typ, leaving this context unchanged."""
+        if not isinstance(typ, Type):
+            raise TypeError(f"Second argument must be of type Type, got type {type(typ)}")
+        extended = TypeContext()
+        extended.bindings[var] = typ
+        extended.parent = self
+        return extended
+
+
+class TypeCache:
+    """
+    Memo table of subterm types, shared across calls to type_check.
+
+    Entries are keyed on the node and the types its free variables have in the context,
+    so an unchanged subtree is not re-checked, even inside a different program. After an
+    edit that rebuilds the spine from the changed node to the root, only the spine is
+    re-checked. Nodes must not be mutated in place while they are cached. With max_size,
+    the free variables remembered for evicted nodes are dropped with them, so the cache
+    does not keep every node it has seen alive.
+    """
+    def __init__(self, max_size=None):
+        self.types = OrderedDict()  # (node, types of its free variables) -> type
+        self.names = {}             # node -> sorted free variable names
+        self.free = {}              # node -> set of free variable names, memo of free_vars
+        self.max_size = max_size    # Maximum number of cached types, None for no limit
+        self.hits = 0
+        self.misses = 0
+
+    def check(self, expr, context):
+        """Type-check expr, reusing and filling the cache."""
+        if isinstance(expr, (Var, IntValue, BoolValue)):
+            return _type_check(expr, context, self.check)
+
+        names = self.names.get(expr)
+        if names is None:
+            names = self.names[expr] = tuple(sorted(free_vars(expr, self.free)))
+        key = (expr, tuple([context.get(name) for name in names]))
+
+        typ = self.types.get(key)
+        if typ is not None:
+            self.hits += 1
+            self.types.move_to_end(key)
+            return typ
+
+        self.misses += 1
+        typ = _type_check(expr, context, self.check)
+        self.types[key] = typ
+        if self.max_size is not None and len(self.types) > self.max_size:
+            (node, _), _ = self.types.popitem(last=False)
+            self.names.pop(node, None)
+            self.free.pop(node, None)
+            # The free_vars memo also holds subterms that have no type entry (variables,
+            # constants); it is only a memo, so start it afresh when it outgrows the bound
+            if len(self.free) > 2 * self.max_size:
+                self.free.clear()
+        return typ
+
+    def clear(self):
+        self.types.clear()
+        self.names.clear()
+        self.free.clear()
+        self.hits = self.misses = 0
+
 
 # Type checker function
-def type_check(expr, context):
-    """Recursively type-check an expression given a type context."""
-    
+def type_check(expr, context, cache=None):
+    """
+    Recursively type-check an expression given a type context.
+
+    The context is not modified. If a TypeCache is given, subterm types are memoized in it.
+    """
+    if cache is not None:
+        return cache.check(expr, context)
+    return _type_check(expr, context, type_check)
+
+
+def _type_check(expr, context, check):
+    """Apply the typing rule for expr, type-checking subterms with check."""
 
     if isinstance(expr, Pair):
-        left_type = type_check(expr.left, context)
-        right_type = type_check(expr.right, context)
+        left_type = check(expr.left, context)
+        right_type = check(expr.right, context)
         return AndType(left_type, right_type)
 
     elif isinstance(expr, Fst):
-        pair_type = type_check(expr.pair, context)
+        pair_type = check(expr.pair, context)
         if isinstance(pair_type, AndType):
             return pair_type.left
         else:
             raise TypeError("fst can only be applied to a conjunction (A ∧ B).")
 
     elif isinstance(expr, Snd):
-        pair_type = type_check(expr.pair, context)
+        pair_type = check(expr.pair, context)
         if isinstance(pair_type, AndType):
             return pair_type.right
         else:
             raise TypeError("snd can only be applied to a conjunction (A ∧ B).")
 
     if isinstance(expr, Inl):
-        value_type = type_check(expr.value, context)
+        value_type = check(expr.value, context)
         if isinstance(expr.typ, OrType) and value_type == expr.typ.left:
             return expr.typ
         else:
             raise TypeError("The value for inl must match the left type of the disjunction.")
 
     elif isinstance(expr, Inr):
-        value_type = type_check(expr.value, context)
+        value_type = check(expr.value, context)
         if isinstance(expr.typ, OrType) and value_type == expr.typ.right:
             return expr.typ
         else:
             raise TypeError("The value for inr must match the right type of the disjunction.")
 
     if isinstance(expr, Case):
-        disjunction_type = type_check(expr.expr, context)
+        disjunction_type = check(expr.expr, context)
 
         if isinstance(disjunction_type, OrType):
-            context.add('a', disjunction_type.left)
+            case_context = context.extend('a', disjunction_type.left).extend('b', disjunction_type.right)
 
-            context.add('b', disjunction_type.right)
-
-            left_type = type_check(expr.left_case, context)
-            right_type = type_check(expr.right_case, context)
+            left_type = check(expr.left_case, case_context)
+            right_type = check(expr.right_case, case_context)
 
             if left_type == right_type:
                 return left_type
@@ -86,21 +198,15 @@ def type_check(expr, context):
     
 
     elif isinstance(expr, Abs):
-        # Add the parameter type to the context using the parameter name
-        context.add(expr.param_name, expr.param_type)
-
-        # Type-check the body
-        body_type = type_check(expr.body, context)
-
-        # Remove the parameter from the context after type-checking the body
-        context.context.pop(expr.param_name, None)
+        # Type-check the body in a context extended with the parameter
+        body_type = check(expr.body, context.extend(expr.param_name, expr.param_type))
 
         return FuncType(expr.param_type, body_type)
 
     elif isinstance(expr, App):
         # For an application (E1 E2), check that E1 is a function and E2 matches its argument type
-        func_type = type_check(expr.func, context)
-        arg_type = type_check(expr.arg, context)
+        func_type = check(expr.func, context)
+        arg_type = check(expr.arg, context)
 
         if isinstance(func_type, FuncType):
             if func_type.param_type == arg_type:
@@ -112,26 +218,40 @@ def type_check(expr, context):
         else:
             raise TypeError(f"Expected a function, but got {func_type}")
         
+    elif isinstance(expr, Fix):
+        # fix E has type A → B if E maps functions of that type to themselves
+        func_type = check(expr.func, context)
+        if (isinstance(func_type, FuncType) and isinstance(func_type.param_type, FuncType)
+                and func_type.param_type == func_type.return_type):
+            return func_type.return_type
+        else:
+            raise TypeError(f"fix requires a function of type (A → B) → (A → B), but got {func_type}")
+
+    elif isinstance(expr, Let):
+        # The body is checked with the name bound to the type of the value
+        value_type = check(expr.value, context)
+        return check(expr.body, context.extend(expr.name, value_type))
+
     # elif isinstance(expr, PairValue):
-    #     return PairValue(type_check(expr.left, context), type_check(expr.right, context))
+    #     return PairValue(check(expr.left, context), check(expr.right, context))
 
     elif isinstance(expr, IntValue):
         # Return IntType when evaluating an integer value
-        return IntType()
+        return _INT
 
     elif isinstance(expr, BoolValue):
         # Return BoolType when evaluating a boolean value
-        return BoolType()
+        return _BOOL
     
     elif isinstance(expr, If):
         # Type-check the condition
-        condition_type = type_check(expr.condition, context)
-        if condition_type != BoolType():
+        condition_type = check(expr.condition, context)
+        if condition_type is not _BOOL:
             raise TypeError(f"Condition in if must be Bool, but got {condition_type}")
 
         # Type-check the then and else branches
-        then_type = type_check(expr.then_branch, context)
-        else_type = type_check(expr.else_branch, context)
+        then_type = check(expr.then_branch, context)
+        else_type = check(expr.else_branch, context)
 
         if then_type != else_type:
             raise TypeError(f"Type mismatch in branches: {then_type} vs {else_type}")
@@ -139,24 +259,24 @@ def type_check(expr, context):
         return then_type
     
     elif isinstance(expr, BinOp):
-        left_type = type_check(expr.left, context)
-        right_type = type_check(expr.right, context)
+        left_type = check(expr.left, context)
+        right_type = check(expr.right, context)
         
         if expr.op in ['+', '-', '*', '/']:
-            if left_type == IntType() and right_type == IntType():
-                return IntType()
+            if left_type is _INT and right_type is _INT:
+                return _INT
             else:
                 raise TypeError(f"Arithmetic operations require Int types, but got {left_type} and {right_type}")
 
         elif expr.op in ['&&', '||']:
-            if left_type == BoolType() and right_type == BoolType():
-                return BoolType()
+            if left_type is _BOOL and right_type is _BOOL:
+                return _BOOL
             else:
                 raise TypeError(f"Boolean operations require Bool types, but got {left_type} and {right_type}")
 
         elif expr.op in ['==', '<', '>']:
-            if left_type == IntType() and right_type == IntType():
-                return BoolType()
+            if left_type is _INT and right_type is _INT:
+                return _BOOL
             else:
                 raise TypeError(f"Comparison operations require Int types, but got {left_type} and {right_type}")
 
@@ -1,42 +1,49 @@
-# Base class for types
-class Type:
-    """Base class for types."""
-    def __eq__(self, other):
-        return isinstance(other, self.__class__)
+import inspect
+from weakref import WeakValueDictionary
+
+# Global table of interned types, keyed on (class, constructor arguments)
+_TYPE_TABLE = WeakValueDictionary()
+
+class InternedType(type):
+    """
+    Metaclass that hash-conses types through a global table.
+
+    Constructing a type that is structurally equal to an existing one returns the
+    existing object, so type equality is an identity check and hashing is O(1).
+    """
+    def __call__(cls, *args, **kwargs):
+        if kwargs:
+            args = tuple(inspect.signature(cls.__init__).bind(None, *args, **kwargs).args[1:])
+        key = (cls, *args)
+        typ = _TYPE_TABLE.get(key)
+        if typ is None:
+            typ = super().__call__(*args)
+            typ._args = args  # The constructor arguments, for pickling and copying
+            typ = _TYPE_TABLE.setdefault(key, typ)
+        return typ
 
-    def __hash__(self):
-        return hash(self.__class__)
+# Base class for types
+class Type(metaclass=InternedType):
+    """Base class for types. Equality and hashing are by identity, see InternedType."""
+    def __reduce__(self):
+        # Rebuild through the constructor so that unpickled types are interned too
+        return (self.__class__, self._args)
 
 class BoolType(Type):
     """Boolean type."""
     def __repr__(self):
         return "Bool"
-    
-    def __eq__(self, other):
-        return isinstance(other, BoolType)
 
 class IntType(Type):
     """Integer type."""
     def __repr__(self):
         return "Int"
-    
-    def __eq__(self, other):
-        return isinstance(other, IntType)
 
 class FuncType(Type):
     """Function type: A -> B."""
     def __init__(self, param_type, return_type):
         self.param_type = param_type  # Type of the function's parameter
         self.return_type = return_type  # Type of the function's return value
-    
+
     def __repr__(self):
         return f"({self.param_type} -> {self.return_type})"
-
-    def __eq__(self, other):
-        # Two function types are equal if both their parameter and return types are equal
-        return (isinstance(other, FuncType) and 
-                self.param_type == other.param_type and 
-                self.return_type == other.return_type)
-
-    def __hash__(self):
-        return hash((self.param_type, self.return_type))
@@ -0,0 +1,276 @@
+# Unboxed value representation: an interpreter like eval_expr whose values allocate as
+# little as possible.
+#
+# Int and Bool are plain Python ints and the bools True and False (singletons), so
+# arithmetic allocates nothing beyond the int itself, and a comparison allocates
+# nothing. A pair is a 2-tuple, inl v and inr v are UnboxedInl(v) and UnboxedInr(v),
+# and a function is an UnboxedClosure: the abstraction and the scope it was created in.
+# A scope is a chain of Bindings, one variable each, in place of an Env and its dict.
+#
+# box and unbox convert between these and the Value classes at the boundary; run_unboxed
+# takes and returns Values like the other engines. Results are the same as eval_expr's,
+# including its quirks (case binds a and b to the whole injection), and ill-typed
+# programs raise the same errors. Since bool is a subclass of int, operand checks test
+# the exact class.
+from .expressions import *
+from .value import *
+from .ifcondition import *
+from .binop import *
+from .conjuntiontypes import *
+from .disjunctions import *
+from .recursion import *
+from .letbinding import *
+from .interpreter import Env
+
+
+class UnboxedInl:
+    """inl v, unboxed."""
+    __slots__ = ('value',)
+    def __init__(self, value):
+        self.value = value
+
+    def __repr__(self):
+        return f"UnboxedInl({self.value!r})"
+
+
+class UnboxedInr:
+    """inr v, unboxed."""
+    __slots__ = ('value',)
+    def __init__(self, value):
+        self.value = value
+
+    def __repr__(self):
+        return f"UnboxedInr({self.value!r})"
+
+
+class Binding:
+    """One variable of a scope, and the rest of the scope (None at the outermost)."""
+    __slots__ = ('name', 'value', 'parent')
+    def __init__(self, name, value, parent):
+        self.name = name
+        self.value = value
+        self.parent = parent
+
+
+class UnboxedClosure:
+    """A function value: an abstraction and the scope it was evaluated in."""
+    __slots__ = ('abs', 'scope')
+    def __init__(self, abs, scope):
+        self.abs = abs
+        self.scope = scope
+
+    def __repr__(self):
+        return f"<closure λ{self.abs.param_name}: {self.abs.param_type}. {self.abs.body}>"
+
+
+def _lookup(scope, name):
+    while scope is not None:
+        if scope.name == name:
+            return scope.value
+        scope = scope.parent
+    raise NameError(f"Variable '{name}' is not instantiated in the environment")
+
+
+def _fix(func):
+    """fix for a closure whose body is an abstraction: that abstraction, with itself bound."""
+    binding = Binding(func.abs.param_name, None, func.scope)
+    closure = binding.value = UnboxedClosure(func.abs.body, binding)
+    return closure
+
+
+def _unfold(func):
+    """The closure λx: A. (fix F) x with F bound to func, as unfold_fix."""
+    return UnboxedClosure(Abs('x', func.abs.param_type.param_type, App(Fix(Var('F')), Var('x'))),
+                          Binding('F', func, None))
+
+
+def _division(a, b):
+    if b == 0:
+        raise ZeroDivisionError("Division by zero")
+    return a // b
+
+# Operator table: op -> (operand class, Python function on the operands)
+UNBOXED_BINOPS = {
+    '+': (int, int.__add__),
+    '-': (int, int.__sub__),
+    '*': (int, int.__mul__),
+    '/': (int, _division),
+    '&&': (bool, lambda a, b: a and b),
+    '||': (bool, lambda a, b: a or b),
+    '==': (int, int.__eq__),
+    '<': (int, int.__lt__),
+    '>': (int, int.__gt__),
+}
+
+
+def _eval(expr, scope):
+    while True:
+        cls = type(expr)
+        if cls is Var:
+            return _lookup(scope, expr.name)
+
+        elif cls is IntValue or cls is BoolValue:
+            return expr.value
+
+        elif cls is Abs:
+            return UnboxedClosure(expr, scope)
+
+        elif cls is App:
+            func = _eval(expr.func, scope)
+            arg = _eval(expr.arg, scope)
+            if type(func) is not UnboxedClosure:
+                raise TypeError(f"Expected a function, but got {box(func)}")
+            expr = func.abs
+            scope = Binding(expr.param_name, arg, func.scope)
+            expr = expr.body
+
+        elif cls is BinOp:
+            left = _eval(expr.left, scope)
+            right = _eval(expr.right, scope)
+            entry = UNBOXED_BINOPS.get(expr.op)
+            if entry is None or type(left) is not entry[0] or type(right) is not entry[0]:
+                raise TypeError(f"Invalid operands for binary operation: {expr.op}")
+            return entry[1](left, right)
+
+        elif cls is If:
+            condition = _eval(expr.condition, scope)
+            if type(condition) is not bool:
+                raise TypeError(f"Condition must evaluate to a Bool, but got {box(condition)}")
+            expr = expr.then_branch if condition else expr.else_branch
+
+        elif cls is Pair:
+            return (_eval(expr.left, scope), _eval(expr.right, scope))
+
+        elif cls is Fst or cls is Snd:
+            pair = _eval(expr.pair, scope)
+            if type(pair) is not tuple:
+                raise TypeError(f"{'fst' if cls is Fst else 'snd'} can only be applied to a pair.")
+            return pair[0] if cls is Fst else pair[1]
+
+        elif cls is Inl:
+            return UnboxedInl(_eval(expr.value, scope))
+
+        elif cls is Inr:
+            return UnboxedInr(_eval(expr.value, scope))
+
+        elif cls is Case:
+            value = _eval(expr.expr, scope)
+            if type(value) is UnboxedInl:
+                scope = Binding('a', value, scope)
+                expr = expr.left_case
+            elif type(value) is UnboxedInr:
+                scope = Binding('b', value, scope)
+                expr = expr.right_case
+            else:
+                raise TypeError("Expected a disjunction (Inl or Inr).")
+
+        elif cls is Let:
+            scope = Binding(expr.name, _eval(expr.value, scope), scope)
+            expr = expr.body
+
+        elif cls is Fix:
+            func = _eval(expr.func, scope)
+            if type(func) is not UnboxedClosure:
+                raise TypeError(f"fix expects a function, but got {box(func)}")
+            if type(func.abs.body) is Abs:
+                return _fix(func)
+            scope = Binding(func.abs.param_name, _unfold(func), func.scope)
+            expr = func.abs.body
+
+        else:
+            raise TypeError(f"Unknown expression type: {expr}")
+
+
+def eval_unboxed(expr, env=None):
+    """Evaluate expr like eval_expr, in env (an Env, converted by unbox), to an unboxed value."""
+    return _eval(expr, None if env is None else unbox(env))
+
+
+def run_unboxed(expr, env):
+    """Evaluate expr in env (an Env) with unboxed values, and return the result as a Value."""
+    return box(eval_unboxed(expr, env))
+
+
+# Converting at the boundary. Closures and environments may be cyclic (fix binds a
+# function in its own scope), so both directions remember what they have converted in
+# memo: id -> (the object, its conversion), holding the object so the id stays its own.
+
+def unbox(value, memo=None):
+    """The unboxed form of a Value (Pair and PairValue both give tuples), or of an Env (a scope)."""
+    memo = {} if memo is None else memo
+    cls = type(value)
+    if cls is IntValue or cls is BoolValue:
+        return value.value
+    elif cls is Pair or cls is PairValue:
+        return (unbox(value.left, memo), unbox(value.right, memo))
+    elif cls is InlValue:
+        return UnboxedInl(unbox(value.value, memo))
+    elif cls is InrValue:
+        return UnboxedInr(unbox(value.value, memo))
+    elif isinstance(value, Closure):
+        if id(value) not in memo:
+            closure = UnboxedClosure(Abs(value.param_name, value.param_type, value.body), None)
+            memo[id(value)] = (value, closure)
+            closure.scope = unbox(value.env, memo)
+        return memo[id(value)][1]
+    elif isinstance(value, Env):
+        return _unbox_env(value, memo)
+    raise TypeError(f"Cannot unbox {value}")
+
+
+def _unbox_env(env, memo):
+    # Bindings for every variable of the Env chain, innermost first; made before their
+    # values are converted, so that a closure bound in its own scope finds them
+    new = []
+    while env is not None and id(env) not in memo:
+        new.append(env)
+        env = env.parent
+    scope = None if env is None else memo[id(env)][1]
+    bindings = []
+    for env in reversed(new):  # Outermost first
+        for name in env.env:
+            scope = Binding(name, None, scope)
+            bindings.append((scope, env.env[name]))
+        memo[id(env)] = (env, scope)
+    for binding, value in bindings:
+        binding.value = unbox(value, memo)
+    return scope
+
+
+def box(value, memo=None):
+    """The Value for an unboxed value: pairs are boxed as Pair, like eval_expr's."""
+    memo = {} if memo is None else memo
+    cls = type(value)
+    if cls is bool:
+        return BoolValue(value)
+    elif cls is int:
+        return IntValue(value)
+    elif cls is tuple:
+        return Pair(box(value[0], memo), box(value[1], memo))
+    elif cls is UnboxedInl:
+        return InlValue(box(value.value, memo))
+    elif cls is UnboxedInr:
+        return InrValue(box(value.value, memo))
+    elif cls is UnboxedClosure:
+        if id(value) not in memo:
+            func = value.abs
+            closure = Closure(func.param_name, func.param_type, func.body, None)
+            memo[id(value)] = (value, closure)
+            closure.env = _box_scope(value.scope, memo)
+        return memo[id(value)][1]
+    raise TypeError(f"Cannot box {value!r}")
+
+
+def _box_scope(scope, memo):
+    # One Env per binding, as eval_expr builds them
+    new = []
+    while scope is not None and id(scope) not in memo:
+        new.append(scope)
+        scope = scope.parent
+    env = Env() if scope is None else memo[id(scope)][1]
+    for binding in reversed(new):
+        env = Env(env)
+        memo[id(binding)] = (binding, env)
+    for binding in new:
+        memo[id(binding)][1].env[binding.name] = box(binding.value, memo)
+    return env
@@ -1,11 +1,14 @@
 
 # Base class for values
+from .conjuntiontypes import Pair
+
 class Value:
     """Base class for all values in the interpreter."""
-    pass
+    __slots__ = ()
 
 class BoolValue(Value):
     """Boolean values."""
+    __slots__ = ('value',)
     def __init__(self, value):
         self.value = value
     
@@ -14,6 +17,7 @@ class BoolValue(Value):
 
 class IntValue(Value):
     """Integer values."""
+    __slots__ = ('value',)
     def __init__(self, value):
         self.value = value
     
@@ -22,6 +26,7 @@ class IntValue(Value):
 
 class Closure(Value):
     """A closure represents a lambda abstraction with an environment."""
+    __slots__ = ('param_name', 'param_type', 'body', 'env')
     def __init__(self, param_name, param_type, body, env):
         self.param_name = param_name  # The parameter (a variable)
         self.param_type = param_type  # The parameter (a variable)
@@ -34,6 +39,7 @@ class Closure(Value):
 
 class PairValue(Value):
     """Represents an evaluated value of a pair (A ∧ B)."""
+    __slots__ = ('left', 'right')
     def __init__(self, left, right):
         self.left = left
         self.right = right
@@ -43,6 +49,7 @@ class PairValue(Value):
     
 class InlValue(Value):
     """Represents the left injection value of a disjunction (A ∨ B)."""
+    __slots__ = ('value',)
     def __init__(self, value):
         self.value = value
 
@@ -52,9 +59,32 @@ class InlValue(Value):
 
 class InrValue(Value):
     """Represents the right injection value of a disjunction (A ∨ B)."""
+    __slots__ = ('value',)
     def __init__(self, value):
         self.value = value
 
     def __repr__(self):
         return f"InrValue({self.value})"
 
+
+
+def value_key(value, closure_key=None):
+    """
+    A hashable key for a value, equal for structurally equal values (an Int and a Bool
+    are never equal). Pairs may be Pair or PairValue. A closure has no key of its own:
+    closure_key(closure) gives it if passed, else the value has none and None is
+    returned, as it is for any value containing one.
+    """
+    cls = type(value)
+    if cls is IntValue or cls is BoolValue:
+        return (cls, value.value)
+    elif cls is InlValue or cls is InrValue:
+        inner = value_key(value.value, closure_key)
+        return None if inner is None else (cls, inner)
+    elif cls is PairValue or cls is Pair:
+        left = value_key(value.left, closure_key)
+        right = value_key(value.right, closure_key)
+        return None if left is None or right is None else (PairValue, left, right)
+    elif isinstance(value, Closure) and closure_key is not None:
+        return closure_key(value)
+    return None